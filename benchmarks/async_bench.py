@@ -0,0 +1,206 @@
+"""Compare the threadpool and asyncio Spotify paths under many slow upstream calls.
+
+Starts `benchmarks.spotify_stub` with the given latency (or uses `--stub-url`)
+and, for every concurrency level, sorts that many distinct playlists at once
+in two ways:
+
+- threadpool: `PlaylistSorter` on spotipy clients, one sort per thread of a
+  pool sized like Starlette's (`--threads`), as the synchronous endpoints ran;
+- asyncio: `AsyncPlaylistSorter` on `AsyncSpotifyClient`, every sort awaited
+  on one event loop, as the async endpoints run.
+
+Each mode and level gets a new stand-in user, so every sort starts from the
+same unsorted playlists. Reports wall time, sorts per second, p50/p95/p99 sort
+latency and the peak number of threads of the process as JSON.
+
+Usage:
+    python -m benchmarks.async_bench [--concurrency 10 50 200] [--latency-ms 100]
+        [--tracks 200] [--threads 40] [--max-connections 100] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from benchmarks.load_test import free_port, percentile, wait_until_up
+from playlistsmith.services.async_sorter import AsyncPlaylistSorter
+from playlistsmith.services.async_spotify import AsyncHTTPPool, AsyncSpotifyClient
+from playlistsmith.services.client_pool import build_spotify_client
+from playlistsmith.services.rate_limiter import RateLimitScheduler, ScheduledSpotifyClient
+from playlistsmith.services.sort_playlist import PlaylistSorter
+
+SORT_KEYS = [("artist", False)]
+
+
+def stub_user(stub_url: str):
+    """Log a new user in to the stand-in and return (access token, playlist id prefix)."""
+    redirect = requests.get(f"{stub_url}/authorize", params={"redirect_uri": "http://bench/callback"},
+                            allow_redirects=False, timeout=10)
+    code = parse_qs(urlparse(redirect.headers["location"]).query)["code"][0]
+    token = requests.post(f"{stub_url}/api/token", data={"grant_type": "authorization_code", "code": code},
+                          timeout=10).json()["access_token"]
+    first = requests.get(f"{stub_url}/v1/me/playlists", params={"limit": 1},
+                         headers={"Authorization": f"Bearer {token}"}, timeout=10).json()
+    return token, first["items"][0]["id"].rpartition("p")[0]
+
+
+class ThreadSampler:
+    """Record the peak thread count of the process while running."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # The sampler itself does not count.
+            self.peak = max(self.peak, threading.active_count() - 1)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def start_stub(port: int, args):
+    return subprocess.Popen([
+        sys.executable, "-m", "benchmarks.spotify_stub", "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--playlists", str(max(args.concurrency)),
+        "--tracks", str(args.tracks),
+    ])
+
+
+def run_threadpool(token: str, playlist_ids, args):
+    # Every sort gets its own client, like every session gets one in the app.
+    scheduler = RateLimitScheduler(rate=1e9, burst=10 ** 9)
+    api_url = f"{args.stub_url}/v1/"
+
+    def sort(playlist_id):
+        client = build_spotify_client(token, args.fetch_concurrency, api_url=api_url)
+        sorter = PlaylistSorter(ScheduledSpotifyClient(client, scheduler, playlist_id), playlist_id,
+                                fetch_concurrency=args.fetch_concurrency)
+        started = time.perf_counter()
+        try:
+            sorter.sort_by_keys(SORT_KEYS)
+            ok = True
+        except Exception:
+            ok = False
+        client._session.close()
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        return list(executor.map(sort, playlist_ids))
+
+
+def run_asyncio(token: str, playlist_ids, args):
+    scheduler = RateLimitScheduler(rate=1e9, burst=10 ** 9)
+
+    async def main():
+        http = AsyncHTTPPool(max_connections=args.max_connections, shard_size=max(args.fetch_concurrency, 4))
+
+        async def sort(playlist_id):
+            client = AsyncSpotifyClient(token, http.client_for(playlist_id), api_url=f"{args.stub_url}/v1/")
+            sorter = AsyncPlaylistSorter(ScheduledSpotifyClient(client, scheduler, playlist_id), playlist_id,
+                                         fetch_concurrency=args.fetch_concurrency)
+            started = time.perf_counter()
+            try:
+                await sorter.sort_by_keys(SORT_KEYS)
+                ok = True
+            except Exception:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        try:
+            return await asyncio.gather(*(sort(playlist_id) for playlist_id in playlist_ids))
+        finally:
+            await http.aclose()
+
+    return asyncio.run(main())
+
+
+MODES = {"threadpool": run_threadpool, "asyncio": run_asyncio}
+
+
+def measure(mode: str, concurrency: int, args):
+    token, user = stub_user(args.stub_url)
+    playlist_ids = [f"{user}p{number}" for number in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadSampler() as sampler:
+        outcomes = MODES[mode](token, playlist_ids, args)
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds for seconds, _ in outcomes)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "sorts_per_second": round(len(outcomes) / elapsed, 3),
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 1),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 1),
+        "peak_threads": sampler.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stub-url", help="Use a running stand-in instead of starting one.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200],
+                        help="Sorts of distinct playlists running at once.")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Stand-in latency per Spotify call.")
+    parser.add_argument("--tracks", type=int, default=200, help="Tracks per playlist.")
+    parser.add_argument("--threads", type=int, default=40, help="Threads of the threadpool path.")
+    parser.add_argument("--fetch-concurrency", type=int, default=4, help="Pages fetched at once per sort.")
+    parser.add_argument("--max-connections", type=int, default=100,
+                        help="Connections of the asyncio HTTP client (SPOTIFY_ASYNC_MAX_CONNECTIONS).")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    stub = None
+    if not args.stub_url:
+        port = free_port()
+        args.stub_url = f"http://127.0.0.1:{port}"
+        stub = start_stub(port, args)
+    try:
+        wait_until_up(f"{args.stub_url}/stub/stats")
+        results = [measure(mode, concurrency, args)
+                   for concurrency in args.concurrency for mode in args.modes]
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait(timeout=30)
+
+    report = json.dumps({
+        "benchmark": "async_bench",
+        "python": platform.python_version(),
+        "latency_ms": args.latency_ms,
+        "tracks": args.tracks,
+        "threads": args.threads,
+        "fetch_concurrency": args.fetch_concurrency,
+        "max_connections": args.max_connections,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
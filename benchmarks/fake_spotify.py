@@ -0,0 +1,53 @@
+"""Generated playlists and artists for the benchmarks and the Spotify stand-in.
+
+The in-process client that serves them to `PlaylistSorter` is
+`tests.helpers.FakeSpotifyClient`, shared with the tests. Its simulated
+latency makes network-bound behaviour (parallel page fetches, number of
+write calls) show up in wall time.
+"""
+import random
+
+GENRES = ("ambient", "blues", "country", "disco", "folk", "funk", "hip hop", "indie pop",
+          "jazz", "metal", "punk", "reggae", "rock", "soul", "techno")
+
+
+def make_tracks(count: int, seed: int = 0, duplicate_ratio: float = 0.0):
+    """Build Spotify track objects with random artists, dates and durations.
+
+    Args:
+        count (int): Number of tracks in the playlist.
+        seed (int, optional): Seed for reproducible playlists.
+        duplicate_ratio (float, optional): Share of the playlist made of repeated
+            tracks, re-added at random positions.
+    """
+    rng = random.Random(seed)
+    unique = count - int(count * duplicate_ratio)
+    tracks = []
+    for number in range(unique):
+        year = rng.randint(1960, 2024)
+        artist = rng.randrange(count // 5 + 1)
+        tracks.append({
+            "id": str(number),
+            "uri": f"spotify:track:{number:022d}",
+            "name": f"Track {number}",
+            "artists": [{"id": f"artist{artist}", "name": f"Artist {artist}"}],
+            "album": {"name": f"Album {number // 12}", "release_date": f"{year}-{rng.randint(1, 12):02d}-01"},
+            "duration_ms": rng.randint(90_000, 420_000),
+            "popularity": rng.randint(0, 100),
+            "external_ids": {"isrc": f"XX{number:010d}"},
+        })
+    for _ in range(count - unique):
+        tracks.insert(rng.randrange(len(tracks) + 1), rng.choice(tracks[:unique]))
+    return tracks
+
+
+def make_artist(artist_id: str):
+    """Build the Spotify artist object of `artist_id`, the same on every call."""
+    rng = random.Random(artist_id)
+    return {
+        "id": artist_id,
+        "name": artist_id,
+        "genres": rng.sample(GENRES, rng.randint(0, 3)),
+        "followers": {"total": int(rng.paretovariate(1.2) * 1000)},
+    }
+
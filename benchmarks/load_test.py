@@ -0,0 +1,268 @@
+"""Load-test PlaylistSmith end to end against the local Spotify stand-in.
+
+Starts `benchmarks.spotify_stub` and `playlistsmith.web_app:app` under
+gunicorn with the given worker and thread configuration (or targets an app
+that is already running with `--app-url`), logs in N simulated users through
+the real OAuth redirect flow and has each of them repeatedly list playlists,
+stream one playlist's tracks, sort it and remove its duplicates. Reports
+throughput and p50/p95/p99 latency per endpoint as JSON.
+
+Usage:
+    python -m benchmarks.load_test [--users 20] [--duration 30] [--workers 2] [--threads 40]
+        [--latency-ms 50] [--rate-429 0.0] [--tracks 100 1000] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urljoin
+
+import requests
+
+SORT_METHODS = ("artist", "release", "duration", "popularity")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Thread-safe collection of request latencies per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "throughput_rps": round(len(values) / elapsed, 3),
+                "mean_ms": round(1000 * sum(values) / len(values), 3),
+                "p50_ms": round(1000 * percentile(values, 0.50), 3),
+                "p95_ms": round(1000 * percentile(values, 0.95), 3),
+                "p99_ms": round(1000 * percentile(values, 0.99), 3),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(total / elapsed, 3),
+            "endpoints": endpoints,
+        }
+
+
+class SimulatedUser:
+    """One browser session driving the app."""
+
+    def __init__(self, app_url: str, recorder: Recorder, seed: int):
+        self.app_url = app_url
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+
+    def request(self, endpoint: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, urljoin(self.app_url, path), timeout=120, **kwargs)
+            if kwargs.get("stream"):
+                for _ in response.iter_lines():
+                    pass
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(endpoint, time.perf_counter() - started, ok)
+        return response
+
+    def login(self):
+        """Follow the OAuth redirects by hand so every hop is a plain request."""
+        started = time.perf_counter()
+        url = urljoin(self.app_url, "/login")
+        try:
+            # /login -> stand-in /authorize -> /callback, which sets the session cookie.
+            for _ in range(3):
+                response = self.http.get(url, allow_redirects=False, timeout=30)
+                url = response.headers.get("location")
+                if not url:
+                    break
+        except requests.RequestException:
+            pass
+        ok = "session_id" in self.http.cookies
+        self.recorder.record("GET /login (OAuth flow)", time.perf_counter() - started, ok)
+        return ok
+
+    def iteration(self):
+        response = self.request("GET /playlists", "GET", "/playlists")
+        if response is None or response.status_code >= 400:
+            return
+        playlists = response.json().get("items") or []
+        if not playlists:
+            return
+        playlist_id = self.rng.choice(playlists)["id"]
+        self.request("GET /playlists/{id}/tracks", "GET", f"/playlists/{playlist_id}/tracks", stream=True)
+        self.request("POST /sort", "POST", "/sort", json={
+            "playlist_id": playlist_id,
+            "method": self.rng.choice(SORT_METHODS),
+            "direction": self.rng.choice(("ascending", "descending")),
+        })
+        self.request("POST /remove_duplicates", "POST", "/remove_duplicates", json={"playlist_id": playlist_id})
+
+    def run(self, deadline: float):
+        if not self.login():
+            return
+        while time.monotonic() < deadline:
+            self.iteration()
+
+
+def run_load(app_url: str, users: int, duration: float):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    simulated = [SimulatedUser(app_url, recorder, seed) for seed in range(users)]
+    threads = [threading.Thread(target=user.run, args=(deadline,), daemon=True) for user in simulated]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - started)
+
+
+def start_stub(args, port: int):
+    command = [
+        sys.executable, "-m", "benchmarks.spotify_stub", "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--rate-429", str(args.rate_429), "--playlists", str(args.playlists),
+        "--tracks", *map(str, args.tracks),
+    ]
+    return subprocess.Popen(command)
+
+
+def start_app(args, port: int, stub_url: str, session_db: str):
+    env = dict(os.environ)
+    env.update({
+        "SPOTIPY_CLIENT_ID": "load-test",
+        "SPOTIPY_CLIENT_SECRET": "load-test",
+        "SPOTIPY_REDIRECT_URI": f"http://127.0.0.1:{port}/callback",
+        "SPOTIFY_API_URL": f"{stub_url}/v1/",
+        "SPOTIFY_ACCOUNTS_URL": stub_url,
+        "COOKIE_SECURE": "false",
+        "THREADPOOL_SIZE": str(args.threads),
+        # Each worker takes its share of the Spotify rate limit.
+        "WEB_CONCURRENCY": str(args.workers),
+    })
+    if args.workers > 1:
+        # Sessions must be shared when requests of one user land on different workers.
+        env["SESSION_STORE_URL"] = f"sqlite:///{session_db}"
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    command = [
+        sys.executable, "-m", "gunicorn", "playlistsmith.web_app:app",
+        "--worker-class", "uvicorn.workers.UvicornWorker",
+        "--workers", str(args.workers), "--bind", f"127.0.0.1:{port}",
+        "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, env=env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app-url", help="Target an app that is already running instead of starting one.")
+    parser.add_argument("--stub-url", help="Spotify stand-in used by --app-url, for its call statistics.")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent logged-in users.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds each user keeps working.")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers.")
+    parser.add_argument("--threads", type=int, default=40, help="Threads for synchronous endpoints per worker.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Stand-in latency per Spotify call.")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Stand-in random extra latency.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of Spotify calls answered with 429.")
+    parser.add_argument("--playlists", type=int, default=10, help="Playlists per simulated user.")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[100, 1000], help="Playlist sizes.")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app, e.g. SPOTIFY_RATE_LIMIT=100.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    processes = []
+    app_url, stub_url = args.app_url, args.stub_url
+    with tempfile.TemporaryDirectory() as scratch:
+        try:
+            if not app_url:
+                stub_port, app_port = free_port(), free_port()
+                stub_url = f"http://127.0.0.1:{stub_port}"
+                app_url = f"http://127.0.0.1:{app_port}"
+                processes.append(start_stub(args, stub_port))
+                wait_until_up(f"{stub_url}/stub/stats")
+                processes.append(start_app(args, app_port, stub_url, os.path.join(scratch, "sessions.db")))
+                wait_until_up(f"{app_url}/health")
+
+            results = run_load(app_url, args.users, args.duration)
+            spotify = requests.get(f"{stub_url}/stub/stats", timeout=10).json() if stub_url else None
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                process.wait(timeout=30)
+
+    report = json.dumps({
+        "benchmark": "load_test",
+        "config": {
+            "users": args.users,
+            "duration": args.duration,
+            "workers": None if args.app_url else args.workers,
+            "threads": None if args.app_url else args.threads,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "rate_429": args.rate_429,
+            "tracks": args.tracks,
+        },
+        "results": results,
+        "spotify": spotify,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
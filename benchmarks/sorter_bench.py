@@ -0,0 +1,112 @@
+"""Benchmark every PlaylistSorter operation against an in-process fake Spotify.
+
+Each operation runs on a freshly shuffled playlist served by
+`FakeSpotifyClient`, so no network or credentials are needed. For every
+playlist size and operation the suite records wall time, CPU time, peak
+traced memory and the API calls made per method. Peak memory comes from a
+separate run under tracemalloc so that tracing does not distort the timings.
+
+Usage:
+    python -m benchmarks.sorter_bench [--sizes 100 1000 5000 10000]
+        [--latency-ms 0] [--concurrency 4] [--repeat 3] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.fake_spotify import make_artist, make_tracks
+from playlistsmith.services.sort_playlist import PlaylistSorter
+from tests.helpers import FakeSpotifyClient
+
+# Share of repeated tracks in the playlists used for the dedupe operations.
+DUPLICATE_RATIO = 0.1
+
+OPERATIONS = {
+    "sort_by_artist": lambda sorter: sorter.sort_by_artist(),
+    "sort_by_release_date": lambda sorter: sorter.sort_by_release_date(),
+    "sort_by_duration": lambda sorter: sorter.sort_by_duration(),
+    "sort_by_popularity": lambda sorter: sorter.sort_by_popularity(),
+    "sort_by_genre": lambda sorter: sorter.sort_by_genre(),
+    "sort_by_artist_followers": lambda sorter: sorter.sort_by_artist_followers(),
+    "remove_duplicates": lambda sorter: sorter.remove_duplicates(),
+    "remove_duplicates_fuzzy": lambda sorter: sorter.remove_duplicates(fuzzy=True),
+}
+
+
+def run_once(operation: str, tracks, latency: float, concurrency: int):
+    """Run one operation on a fresh playlist and return (client, write stats)."""
+    client = FakeSpotifyClient(tracks, latency=latency, artist_lookup=make_artist)
+    sorter = PlaylistSorter(client, "benchmark", fetch_concurrency=concurrency)
+    write = OPERATIONS[operation](sorter)
+    return client, write
+
+
+def measure(operation: str, tracks, latency: float, concurrency: int, repeat: int):
+    best_wall = best_cpu = float("inf")
+    client = write = None
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        client, write = run_once(operation, tracks, latency, concurrency)
+        best_cpu = min(best_cpu, time.process_time() - cpu_start)
+        best_wall = min(best_wall, time.perf_counter() - wall_start)
+
+    tracemalloc.start()
+    run_once(operation, tracks, latency, concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(best_wall, 6),
+        "cpu_seconds": round(best_cpu, 6),
+        "peak_bytes": peak,
+        "api_calls": dict(sorted(Counter(client.calls).items())),
+        "write": write,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+    parser.add_argument("--operations", nargs="+", choices=sorted(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Simulated latency of every Spotify call.")
+    parser.add_argument("--concurrency", type=int, default=4, help="PlaylistSorter fetch concurrency.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    results = []
+    for size in args.sizes:
+        playlists = {
+            False: make_tracks(size, seed=size),
+            True: make_tracks(size, seed=size, duplicate_ratio=DUPLICATE_RATIO),
+        }
+        for operation in args.operations:
+            tracks = playlists[operation.startswith("remove_duplicates")]
+            results.append({
+                "tracks": size,
+                "operation": operation,
+                **measure(operation, tracks, latency, args.concurrency, args.repeat),
+            })
+
+    report = json.dumps({
+        "benchmark": "playlist_sorter",
+        "python": platform.python_version(),
+        "latency_ms": args.latency_ms,
+        "concurrency": args.concurrency,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Local stand-in for the parts of the Spotify Web API PlaylistSmith uses.
+
+Serves the OAuth authorize redirect and token exchange, the current user's
+playlists, playlist metadata, the playlist items endpoints (read, replace,
+add and reorder) and the several-artists lookup. Every login creates a new user with its own playlists,
+generated on first use. Latency, jitter and 429 responses can be injected
+into the Web API routes to exercise the rate-limit handling.
+
+Point the app at it with:
+    SPOTIFY_API_URL=http://127.0.0.1:9000/v1/ SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:9000
+
+Usage:
+    python -m benchmarks.spotify_stub [--port 9000] [--latency-ms 50] [--jitter-ms 10]
+        [--rate-429 0.01] [--retry-after 1] [--playlists 10] [--tracks 100 1000 5000]
+"""
+import argparse
+import asyncio
+import random
+import threading
+from collections import Counter
+from urllib.parse import parse_qs, urlencode
+from uuid import uuid4
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+from benchmarks.fake_spotify import make_artist, make_tracks
+
+# Share of repeated tracks in generated playlists, so dedupe has work to do.
+DUPLICATE_RATIO = 0.05
+
+
+class StubState:
+    """Users, tokens and playlists held by the stand-in."""
+
+    def __init__(self, playlists_per_user: int = 10, sizes=(100, 1000), latency: float = 0.0,
+                 jitter: float = 0.0, rate_429: float = 0.0, retry_after: int = 1, seed: int = 0):
+        self.playlists_per_user = playlists_per_user
+        self.sizes = list(sizes)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.codes = {}
+        self.tokens = {}
+        self.refresh_tokens = {}
+        self.users = 0
+        self.catalogs = {}
+        self.tracks_by_uri = {}
+        self.playlists = {}
+        self.calls = Counter()
+        self.throttled = 0
+
+    def new_user(self):
+        with self.lock:
+            self.users += 1
+            return f"user{self.users}"
+
+    def issue_token(self, user):
+        access_token = uuid4().hex
+        refresh_token = uuid4().hex
+        with self.lock:
+            self.tokens[access_token] = user
+            self.refresh_tokens[refresh_token] = user
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "refresh_token": refresh_token,
+            "scope": "user-library-read playlist-modify-public playlist-modify-private",
+        }
+
+    def user_for(self, request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user = self.tokens.get(token)
+        if user is None:
+            raise HTTPException(status_code=401, detail="Invalid access token")
+        return user
+
+    def _catalog(self, size: int):
+        catalog = self.catalogs.get(size)
+        if catalog is None:
+            catalog = make_tracks(size, seed=size, duplicate_ratio=DUPLICATE_RATIO)
+            self.catalogs[size] = catalog
+            self.tracks_by_uri.update((track["uri"], track) for track in catalog)
+        return catalog
+
+    def playlist(self, user: str, playlist_id: str):
+        """Return a playlist of `user`, creating it on first access."""
+        # Ids are base62 like real ones: "<user>p<number>", e.g. "user3p7".
+        owner, _, number = playlist_id.rpartition("p")
+        if owner != user or not number.isdigit() or int(number) >= self.playlists_per_user:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+        with self.lock:
+            playlist = self.playlists.get(playlist_id)
+            if playlist is None:
+                size = self.sizes[int(number) % len(self.sizes)]
+                playlist = {"id": playlist_id, "name": f"Playlist {number}", "version": 0,
+                            "tracks": list(self._catalog(size))}
+                self.playlists[playlist_id] = playlist
+            return playlist
+
+
+def _summary(playlist):
+    return {
+        "id": playlist["id"],
+        "name": playlist["name"],
+        "snapshot_id": f"{playlist['id']}-{playlist['version']}",
+        "tracks": {"total": len(playlist["tracks"])},
+        "images": [],
+        "owner": {"id": playlist["id"].rpartition("p")[0]},
+        "public": False,
+    }
+
+
+def _route_label(request: Request) -> str:
+    """Return the method and path of a Web API call with the playlist id masked."""
+    parts = request.url.path.split("/")
+    if len(parts) > 3 and parts[2] == "playlists":
+        parts[3] = "{id}"
+    return f"{request.method} {'/'.join(parts)}"
+
+
+def _page(request: Request, items, default_limit: int):
+    """Return one page of `items` shaped like a Spotify paging object."""
+    limit = int(request.query_params.get("limit", default_limit))
+    offset = int(request.query_params.get("offset", 0))
+    return {
+        "items": items[offset:offset + limit],
+        "total": len(items),
+        "limit": limit,
+        "offset": offset,
+        "next": str(request.url) if offset + limit < len(items) else None,
+    }
+
+
+def create_app(state: StubState) -> FastAPI:
+    """Build the stand-in application around `state`."""
+    app = FastAPI(title="Spotify stand-in")
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        if not request.url.path.startswith("/v1/"):
+            return await call_next(request)
+        state.calls[_route_label(request)] += 1
+        delay = state.latency + state.rng.uniform(0, state.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if state.rate_429 and state.rng.random() < state.rate_429:
+            state.throttled += 1
+            return JSONResponse({"error": {"status": 429, "message": "API rate limit exceeded"}},
+                                status_code=429, headers={"Retry-After": str(state.retry_after)})
+        return await call_next(request)
+
+    @app.get("/authorize")
+    def authorize(redirect_uri: str, request: Request):
+        code = uuid4().hex
+        state.codes[code] = state.new_user()
+        query = {"code": code}
+        if request.query_params.get("state"):
+            query["state"] = request.query_params["state"]
+        return RedirectResponse(f"{redirect_uri}?{urlencode(query)}")
+
+    @app.post("/api/token")
+    async def token(request: Request):
+        # Parsed by hand so the stand-in does not need python-multipart.
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        if form.get("grant_type") == "refresh_token":
+            user = state.refresh_tokens.get(form.get("refresh_token"))
+        else:
+            user = state.codes.pop(form.get("code"), None)
+        if user is None:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        return state.issue_token(user)
+
+    @app.get("/v1/me/playlists")
+    def my_playlists(request: Request):
+        user = state.user_for(request)
+        playlists = [_summary(state.playlist(user, f"{user}p{number}"))
+                     for number in range(state.playlists_per_user)]
+        return _page(request, playlists, 20)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    def playlist(playlist_id: str, request: Request):
+        return _summary(state.playlist(state.user_for(request), playlist_id))
+
+    # spotipy has used both the `/tracks` and the newer `/items` path.
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    @app.get("/v1/playlists/{playlist_id}/items")
+    def playlist_items(playlist_id: str, request: Request):
+        playlist = state.playlist(state.user_for(request), playlist_id)
+        with state.lock:
+            page = _page(request, playlist["tracks"], 100)
+        page["items"] = [{"track": track} for track in page["items"]]
+        return page
+
+    @app.put("/v1/playlists/{playlist_id}/tracks")
+    @app.put("/v1/playlists/{playlist_id}/items")
+    async def replace_or_reorder(playlist_id: str, request: Request):
+        playlist = state.playlist(state.user_for(request), playlist_id)
+        body = await request.json()
+        with state.lock:
+            tracks = playlist["tracks"]
+            if "uris" in body:
+                playlist["tracks"] = [state.tracks_by_uri[uri] for uri in body["uris"]]
+            else:
+                start = body["range_start"]
+                length = body.get("range_length", 1)
+                insert_before = body["insert_before"]
+                chunk = tracks[start:start + length]
+                del tracks[start:start + length]
+                if insert_before > start:
+                    insert_before -= length
+                tracks[insert_before:insert_before] = chunk
+            playlist["version"] += 1
+            return {"snapshot_id": f"{playlist_id}-{playlist['version']}"}
+
+    @app.post("/v1/playlists/{playlist_id}/tracks")
+    @app.post("/v1/playlists/{playlist_id}/items")
+    async def add(playlist_id: str, request: Request):
+        playlist = state.playlist(state.user_for(request), playlist_id)
+        body = await request.json()
+        uris = body["uris"] if isinstance(body, dict) else body
+        position = request.query_params.get("position")
+        with state.lock:
+            added = [state.tracks_by_uri[uri] for uri in uris]
+            if position is None:
+                playlist["tracks"].extend(added)
+            else:
+                playlist["tracks"][int(position):int(position)] = added
+            playlist["version"] += 1
+            return {"snapshot_id": f"{playlist_id}-{playlist['version']}"}
+
+    @app.get("/v1/artists")
+    def artists(ids: str, request: Request):
+        state.user_for(request)
+        return {"artists": [make_artist(artist_id) for artist_id in ids.split(",")[:50]]}
+
+    @app.get("/stub/stats")
+    def stats():
+        return {"users": state.users, "calls": dict(state.calls), "throttled": state.throttled}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every Web API call.")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay, up to this value.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of Web API calls answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of injected 429s.")
+    parser.add_argument("--playlists", type=int, default=10, help="Playlists per user.")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[100, 1000],
+                        help="Playlist sizes, assigned to each user's playlists in turn.")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    state = StubState(
+        playlists_per_user=args.playlists,
+        sizes=args.tracks,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Measure the cold start of the app: import time per module and time to first /health.
+
+Imports `playlistsmith.web_app` in fresh interpreters under `python -X
+importtime` and reports the total import time plus the modules and
+top-level packages that cost the most. Then starts the server from scratch
+`--runs` times per server and reports how long it took until `/health`
+first answered:
+
+- uvicorn: `python main.py`, as in local development;
+- gunicorn: the production profile in `gunicorn.conf.py`.
+
+All times are medians over `--runs` in milliseconds, printed as JSON.
+
+Usage:
+    python -m benchmarks.startup_bench [--runs 5] [--top 15] [--servers uvicorn gunicorn]
+        [--workers 2] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+from benchmarks.load_test import free_port
+
+APP_MODULE = "playlistsmith.web_app"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str):
+    """Return {module: (self µs, cumulative µs)} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def import_times(runs: int, top: int):
+    totals = []
+    self_times = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {APP_MODULE}"],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        modules = parse_importtime(result.stderr)
+        totals.append(modules[APP_MODULE][1])
+        for name, (self_us, _) in modules.items():
+            self_times[name].append(self_us)
+
+    median_self = {name: statistics.median(values) for name, values in self_times.items()}
+    packages = defaultdict(float)
+    for name, self_us in median_self.items():
+        packages[name.split(".")[0]] += self_us
+    slowest = sorted(median_self.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(statistics.median(totals) / 1000, 1),
+        "packages_ms": {name: round(us / 1000, 1)
+                        for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]},
+        "modules_ms": {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+def server_command(server: str, port: int, args):
+    if server == "uvicorn":
+        return [sys.executable, "main.py"], {"HOST": "127.0.0.1", "PORT": str(port)}
+    return ([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+             "--bind", f"127.0.0.1:{port}", "--log-level", "warning"],
+            {"WEB_CONCURRENCY": str(args.workers)})
+
+
+def time_to_health(server: str, args, timeout: float = 60.0) -> float:
+    """Start the server and return the seconds until /health first answered."""
+    port = free_port()
+    command, extra_env = server_command(server, port, args)
+    env = dict(os.environ, **extra_env)
+    url = f"http://127.0.0.1:{port}/health"
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"{server} exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.002)
+        raise SystemExit(f"{server} did not answer /health within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts measured per server.")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules and packages reported.")
+    parser.add_argument("--servers", nargs="+", choices=("uvicorn", "gunicorn"), default=["uvicorn", "gunicorn"])
+    parser.add_argument("--workers", type=int, default=2, help="Workers of the gunicorn profile.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    health = {}
+    for server in args.servers:
+        seconds = [time_to_health(server, args) for _ in range(args.runs)]
+        health[server] = round(1000 * statistics.median(seconds), 1)
+
+    report = json.dumps({
+        "benchmark": "startup_bench",
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "imports": import_times(args.runs, args.top),
+        "first_health_ms": health,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
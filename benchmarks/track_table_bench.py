@@ -0,0 +1,86 @@
+"""Compare the per-track dict sort path with the columnar TrackTable path.
+
+Both paths start from the same synthetic `playlist_items` pages and end with
+the list of URIs in sorted order. Peak memory is measured with tracemalloc and
+time with perf_counter.
+
+Usage:
+    python -m benchmarks.track_table_bench [--sizes 1000 10000] [--output results.json]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.fake_spotify import make_tracks
+from playlistsmith.services.sort_playlist import PlaylistSorter
+from playlistsmith.services.track_table import TrackTable, release_date_ordinal
+
+
+def make_pages(count: int, seed: int = 0):
+    """Build raw `playlist_items` pages shaped like the Spotify API response."""
+    items = [{"track": track} for track in make_tracks(count, seed)]
+    return [{"items": items[i:i + 100]} for i in range(0, count, 100)]
+
+
+def dict_path(pages):
+    """The original approach: a dict per track, then a dict per sort row."""
+    tracks = []
+    for page in pages:
+        tracks.extend(PlaylistSorter._extract_tracks(page))
+    track_data = [{"uri": t["uri"], "artist": t["artists"][0]["name"]} for t in tracks]
+    ordered = sorted(track_data, key=lambda x: x["artist"].lower())
+    return [t["uri"] for t in ordered]
+
+
+def table_path(pages):
+    # Time a worker that has not parsed these release dates before.
+    release_date_ordinal.cache_clear()
+    table = TrackTable()
+    for page in pages:
+        table.extend_from_items(page["items"])
+    return table.take_uris(table.argsort([("artist", False)]))
+
+
+def measure(func, pages, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_bytes": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        # Keep the pages alive outside the measurement, as the API response would be.
+        pages = make_pages(size)
+        if dict_path(pages) != table_path(pages):
+            raise SystemExit(f"Paths disagree on the order of {size} tracks")
+        results.append({
+            "tracks": size,
+            "dict": measure(dict_path, pages),
+            "table": measure(table_path, pages),
+        })
+
+    report = json.dumps({"benchmark": "track_table", "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Production server profile: `gunicorn -c gunicorn.conf.py`.
+
+- The app is imported once by the master (`preload_app`), and every worker is
+  forked with all modules already loaded, so a new worker serves its first
+  request without importing anything.
+- Workers run uvicorn on uvloop and httptools (`playlistsmith.workers`).
+- `WEB_CONCURRENCY` sets the number of workers. By default it is one per CPU
+  available to the process, or one while sessions are kept in process memory,
+  which workers cannot share. The chosen number is exported as
+  `WEB_CONCURRENCY` before the app is loaded, so it can split the Spotify
+  rate limit between the workers.
+"""
+import os
+
+
+def _cpu_count() -> int:
+    try:
+        # Honors CPU pinning (e.g. `docker run --cpuset-cpus`), unlike os.cpu_count().
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _default_workers() -> int:
+    if os.getenv("SESSION_STORE_URL", "memory://").startswith("memory:"):
+        return 1
+    return _cpu_count()
+
+
+wsgi_app = "playlistsmith.web_app:app"
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "playlistsmith.workers.UvicornWorker"
+preload_app = True
+# Worker heartbeats go to tmpfs; a container's overlay filesystem can stall them.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
@@ -4,32 +4,203 @@ This module exposes FastAPI endpoints for:
 - /login -> starts Spotify OAuth flow
 - /callback -> receives Spotify OAuth callback
 - /playlists -> list user playlists
+- /playlists/{id}/tracks -> stream a playlist's tracks as NDJSON
 - /sort -> reorder a playlist using existing sorting logic
-
-Each endpoint delegates to functions in `playlistsmith.services`.
+- /remove_duplicates -> remove repeated tracks from a playlist
+- /batch -> sort or deduplicate many playlists concurrently
+- /jobs/{id} -> poll or stream the progress of a background sort/cleanup
+- /metrics -> Prometheus metrics of this worker
+
+Each endpoint delegates to functions in `playlistsmith.services`. The playlist,
+track, sort, cleanup and batch endpoints are `async` and await Spotify through
+`AsyncSpotifyClient`, so slow upstream calls do not hold threads; background
+jobs run on threads with spotipy.
 """
 import json
 import os
+import tempfile
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
 from uuid import uuid4
 
-import spotipy
-from dotenv import load_dotenv
+import anyio.to_thread
 from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import RedirectResponse, JSONResponse
-from pydantic import BaseModel
-from spotipy.oauth2 import SpotifyOAuth
-
-from playlistsmith.services.sort_playlist import PlaylistSorter
+from fastapi.responses import RedirectResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from playlistsmith.services.artists import ArtistCache
+from playlistsmith.services.async_sorter import AsyncPlaylistSorter
+from playlistsmith.services.async_spotify import AsyncHTTPPool, AsyncSpotifyClient
+from playlistsmith.services.batch import arun_batch, run_batch
+from playlistsmith.services.client_pool import SpotifyClientPool, build_spotify_client
+from playlistsmith.services.duplicates import KEEP_POLICIES
+from playlistsmith.services.jobs import FINISHED_STATUSES, JobManager, JobQueueFullError, create_job_store
+from playlistsmith.services.metrics import MetricsRegistry
+from playlistsmith.services.playlist_locks import PlaylistBusyError, PlaylistLocks
+from playlistsmith.services.playlists import afetch_all_playlists, playlists_etag
+from playlistsmith.services.rate_limiter import RateLimitScheduler, ScheduledSpotifyClient
+from playlistsmith.services.session_store import create_session_store
+from playlistsmith.services.shuffle import DEFAULT_MIN_GAP
+from playlistsmith.services.token_refresh import SessionEndedError, TokenRefresher
+from playlistsmith.services.sort_playlist import PlaylistSorter, PlaylistSorterBase
+from playlistsmith.services.track_cache import TrackCache
+from playlistsmith.services.track_store import create_track_store
+from playlistsmith.services.track_table import SORT_COLUMNS
+from playlistsmith.services.tracing import current_trace, span
 
 router = APIRouter()
 
 COOKIE_SECURE = os.getenv("COOKIE_SECURE", "false").lower() in ("1", "true", "yes")
-SESSION_STORE: dict[str, dict] = {}
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# Connections one session may use at once: a batch runs up to BATCH_CONCURRENCY
+# sorters of the session, each fetching FETCH_CONCURRENCY pages in parallel.
+SESSION_CONNECTIONS = FETCH_CONCURRENCY * max(1, BATCH_CONCURRENCY)
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+# Base URLs of the Spotify services; override to run against a local stand-in.
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1/")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com").rstrip("/")
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+SESSION_STORE = create_session_store(
+    SESSION_STORE_URL,
+    ttl=SESSION_TTL,
+    max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+)
+# Seconds before expiry from which an active session's token is renewed in the background (0: off).
+TOKEN_REFRESH_AHEAD = float(os.getenv("TOKEN_REFRESH_AHEAD", "0"))
+TOKENS = TokenRefresher(SESSION_STORE, refresh_ahead=TOKEN_REFRESH_AHEAD)
+# spotipy clients of the background jobs; the async endpoints use `_ASYNC_HTTP`.
+CLIENT_POOL = SpotifyClientPool(
+    pool_size=SESSION_CONNECTIONS,
+    max_clients=int(os.getenv("SESSION_MAX", "10000")),
+    client_factory=partial(build_spotify_client, api_url=SPOTIFY_API_URL),
+    ttl=SESSION_TTL,
+)
+# Connections of the shared asyncio HTTP client used by the async endpoints.
+SPOTIFY_ASYNC_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_ASYNC_MAX_CONNECTIONS", "100"))
+# SPOTIFY_RATE_LIMIT and SPOTIFY_RATE_BURST budget the whole server; every gunicorn
+# worker schedules its calls in its own process, so each gets an equal share.
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+SCHEDULER = RateLimitScheduler(
+    rate=float(os.getenv("SPOTIFY_RATE_LIMIT", "15")) / WEB_WORKERS,
+    burst=max(1, int(os.getenv("SPOTIFY_RATE_BURST", "30")) // WEB_WORKERS),
+)
+TRACK_CACHE = TrackCache(
+    max_tracks=int(os.getenv("TRACK_CACHE_MAX_TRACKS", "200000")),
+    ttl=float(os.getenv("TRACK_CACHE_TTL", "600")),
+)
+# Shared by the workers of a host, and kept across restarts, when set.
+TRACK_STORE = create_track_store(os.getenv("TRACK_STORE_URL", ""))
+ARTIST_CACHE = ArtistCache(
+    max_artists=int(os.getenv("ARTIST_CACHE_MAX_ARTISTS", "50000")),
+    ttl=float(os.getenv("ARTIST_CACHE_TTL", "86400")),
+)
+JOB_MANAGER = JobManager(
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "100")),
+    max_finished=int(os.getenv("JOB_MAX_FINISHED", "1000")),
+    # Polls of a job may reach any worker; share the jobs wherever the sessions are shared.
+    store=create_job_store(os.getenv("JOB_STORE_URL") or
+                           (SESSION_STORE_URL if SESSION_STORE_URL.startswith("sqlite:") else "")),
+)
+# Mutations of one playlist run one at a time, across the workers of a host through
+# lock files in PLAYLIST_LOCK_DIR ("" to lock per process only); identical in-flight
+# requests share a result.
+PLAYLIST_LOCKS = PlaylistLocks(
+    wait_timeout=float(os.getenv("PLAYLIST_LOCK_TIMEOUT", "120")),
+    lock_dir=os.getenv("PLAYLIST_LOCK_DIR", os.path.join(tempfile.gettempdir(), "playlistsmith-locks")),
+)
+
+METRICS = MetricsRegistry()
+SPOTIFY_CALLS = METRICS.counter(
+    "playlistsmith_spotify_calls_total", "Spotify Web API calls by client method and outcome.",
+    ("method", "outcome"))
+SPOTIFY_CALL_SECONDS = METRICS.histogram(
+    "playlistsmith_spotify_call_duration_seconds", "Spotify Web API call latency by client method.",
+    ("method",))
+OPERATIONS = METRICS.counter(
+    "playlistsmith_operations_total", "Playlist operations by kind and outcome.", ("operation", "status"))
+OPERATION_SECONDS = METRICS.histogram(
+    "playlistsmith_operation_duration_seconds", "Playlist operation duration.", ("operation",))
+OPERATION_PAGES = METRICS.histogram(
+    "playlistsmith_operation_pages", "Track pages fetched from Spotify per operation.", ("operation",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200))
+OPERATION_TRACKS = METRICS.histogram(
+    "playlistsmith_operation_tracks", "Tracks fetched from Spotify per operation.", ("operation",),
+    buckets=(0, 100, 500, 1000, 2000, 5000, 10000, 20000))
+OPERATIONS_IN_FLIGHT = METRICS.gauge(
+    "playlistsmith_operations_in_flight", "Playlist operations currently running.", ("operation",))
+METRICS.stats_gauges("playlistsmith_active_sessions", "Sessions held by the session store",
+                     lambda: {"total": len(SESSION_STORE)})
+METRICS.stats_gauges("playlistsmith_token_refresh", "Session token refreshes", TOKENS.stats)
+METRICS.stats_gauges("playlistsmith_client_pool", "Spotify client pool of background jobs", CLIENT_POOL.stats)
+METRICS.stats_gauges("playlistsmith_async_http", "Spotify HTTP pool of async endpoints",
+                     lambda: _ASYNC_HTTP.stats() if _ASYNC_HTTP is not None else {})
+METRICS.stats_gauges("playlistsmith_rate_limiter", "Spotify rate-limit scheduler", SCHEDULER.stats)
+METRICS.stats_gauges("playlistsmith_track_cache", "Track cache", TRACK_CACHE.stats)
+METRICS.stats_gauges("playlistsmith_artist_cache", "Artist details cache", ARTIST_CACHE.stats)
+if TRACK_STORE is not None:
+    METRICS.stats_gauges("playlistsmith_track_store", "On-disk track store", TRACK_STORE.stats)
+METRICS.stats_gauges("playlistsmith_playlist_locks", "Playlist mutation locks", PLAYLIST_LOCKS.stats)
+
+
+def _observe_spotify_call(method: str, seconds: float, error):
+    if error is None:
+        outcome = "ok"
+    elif getattr(error, "http_status", None) == 429:
+        outcome = "throttled"
+    else:
+        outcome = "error"
+    SPOTIFY_CALLS.inc(method=method, outcome=outcome)
+    SPOTIFY_CALL_SECONDS.observe(seconds, method=method)
 
 
-def get_sp_oauth(request: Request):
-    """Return a SpotifyOAuth configured for this request.
+def _spotify_call_observer(trace):
+    """Return the Spotify call observer for a request, adding each call to `trace` if set."""
+    if trace is None:
+        return _observe_spotify_call
+
+    # Captured here because page fetches run on worker threads without the request context.
+    def observe(method: str, seconds: float, error):
+        _observe_spotify_call(method, seconds, error)
+        attrs = {"error": type(error).__name__} if error is not None else {}
+        trace.add(f"spotify.{method}", time.perf_counter() - seconds, seconds, **attrs)
+
+    return observe
+
+
+@contextmanager
+def _observe_operation(kind: str, sorter: PlaylistSorterBase):
+    """Record duration, outcome, pages and tracks of one playlist operation."""
+    OPERATIONS_IN_FLIGHT.inc(operation=kind)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        OPERATIONS_IN_FLIGHT.dec(operation=kind)
+        OPERATIONS.inc(operation=kind, status=status)
+        OPERATION_SECONDS.observe(time.perf_counter() - started, operation=kind)
+        OPERATION_PAGES.observe(sorter.pages_fetched, operation=kind)
+        OPERATION_TRACKS.observe(sorter.tracks_fetched, operation=kind)
+
+
+SPOTIPY_CLIENT_ID = os.getenv("SPOTIPY_CLIENT_ID")
+SPOTIPY_CLIENT_SECRET = os.getenv("SPOTIPY_CLIENT_SECRET")
+SPOTIPY_REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI")
+# OAuth managers by redirect URI. Bounded, since the URI can follow the request's Host header.
+_OAUTH_MANAGERS = OrderedDict()
+_OAUTH_MANAGERS_MAX = 16
+_OAUTH_LOCK = threading.Lock()
+
+
+def _redirect_uri(request: Request) -> str:
+    """Return the OAuth redirect URI for this request.
 
     If `SPOTIPY_REDIRECT_URI` is not provided or points to localhost while the
     incoming request is not local, prefer a redirect URI built from the
@@ -38,13 +209,31 @@ def get_sp_oauth(request: Request):
     Note: the redirect URI used here must also be registered in your Spotify
     application settings for OAuth to succeed in production.
     """
-    client_id = os.getenv("SPOTIPY_CLIENT_ID")
-    client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-    redirect_uri_env = os.getenv("SPOTIPY_REDIRECT_URI")
+    redirect_uri_env = SPOTIPY_REDIRECT_URI
+    try:
+        if redirect_uri_env:
+            # If env var points to localhost but the incoming request host is not
+            # localhost, override to use the app's public callback URL built
+            # from the incoming request. This avoids redirecting browsers back
+            # to the client's localhost when the server runs remotely.
+            if "localhost" in redirect_uri_env and request.url.hostname not in ("localhost", "127.0.0.1"):
+                return str(request.url_for("callback"))
+            return redirect_uri_env
+        return str(request.url_for("callback"))
+    except Exception:
+        # Fallback to env var if building from request fails for any reason
+        return redirect_uri_env or "http://localhost:8000/callback"
 
+
+def get_sp_oauth(request: Request):
+    """Return the SpotifyOAuth for this request's redirect URI.
+
+    Managers are built once per redirect URI and shared by all requests; they
+    keep no tokens themselves.
+    """
     missing = [name for name, value in (
-        ("SPOTIPY_CLIENT_ID", client_id),
-        ("SPOTIPY_CLIENT_SECRET", client_secret),
+        ("SPOTIPY_CLIENT_ID", SPOTIPY_CLIENT_ID),
+        ("SPOTIPY_CLIENT_SECRET", SPOTIPY_CLIENT_SECRET),
     ) if not value]
 
     if missing:
@@ -53,44 +242,54 @@ def get_sp_oauth(request: Request):
             detail=f"Spotify credentials missing: {', '.join(missing)}"
         )
 
-    # Prefer explicit env var when it's provided and not obviously a local-only value.
-    final_redirect = None
-    try:
-        if redirect_uri_env:
-            # If env var points to localhost but the incoming request host is not
-            # localhost, override to use the app's public callback URL built
-            # from the incoming request. This avoids redirecting browsers back
-            # to the client's localhost when the server runs remotely.
-            if "localhost" in redirect_uri_env and request.url.hostname not in ("localhost", "127.0.0.1"):
-                final_redirect = str(request.url_for("callback"))
-            else:
-                final_redirect = redirect_uri_env
-        else:
-            final_redirect = str(request.url_for("callback"))
-    except Exception:
-        # Fallback to env var if building from request fails for any reason
-        final_redirect = redirect_uri_env or "http://localhost:8000/callback"
+    redirect_uri = _redirect_uri(request)
+    with _OAUTH_LOCK:
+        sp_oauth = _OAUTH_MANAGERS.get(redirect_uri)
+        if sp_oauth is not None:
+            _OAUTH_MANAGERS.move_to_end(redirect_uri)
+            return sp_oauth
+
+        # spotipy (and the redis client it imports) is only loaded once a user logs in.
+        from spotipy.cache_handler import CacheHandler
+        from spotipy.oauth2 import SpotifyOAuth
+
+        class NoTokenCache(CacheHandler):
+            """Keeps nothing: OAuth managers are shared, tokens live in the session store."""
+
+            def get_cached_token(self):
+                return None
 
-    return SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=final_redirect,
-                        scope="user-library-read playlist-modify-public playlist-modify-private")
+            def save_token_to_cache(self, token_info):
+                pass
+
+        sp_oauth = SpotifyOAuth(client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET,
+                                redirect_uri=redirect_uri,
+                                scope="user-library-read playlist-modify-public playlist-modify-private",
+                                show_dialog=True, cache_handler=NoTokenCache())
+        sp_oauth.OAUTH_AUTHORIZE_URL = f"{SPOTIFY_ACCOUNTS_URL}/authorize"
+        sp_oauth.OAUTH_TOKEN_URL = f"{SPOTIFY_ACCOUNTS_URL}/api/token"
+        _OAUTH_MANAGERS[redirect_uri] = sp_oauth
+        while len(_OAUTH_MANAGERS) > _OAUTH_MANAGERS_MAX:
+            _OAUTH_MANAGERS.popitem(last=False)
+        return sp_oauth
 
 
 @router.get("/login")
-def login(sp_oauth: SpotifyOAuth = Depends(get_sp_oauth)):
+def login(sp_oauth=Depends(get_sp_oauth)):
     """Redirect the user to Spotify authorization page."""
-    auth_url = sp_oauth.get_authorize_url(show_dialog=True)
+    auth_url = sp_oauth.get_authorize_url()
     return RedirectResponse(auth_url)
 
 
 @router.get("/callback")
-def callback(request: Request, sp_oauth: SpotifyOAuth = Depends(get_sp_oauth)):
+def callback(request: Request, sp_oauth=Depends(get_sp_oauth)):
     """Handle Spotify redirect and store the token in a server-side session cookie."""
     code = request.query_params.get("code")
     if not code:
         return JSONResponse({"error": "No code provided"}, status_code=400)
 
     try:
-        token_info = sp_oauth.get_access_token(code)
+        token_info = sp_oauth.get_access_token(code, check_cache=False)
     except Exception as exc:
         return JSONResponse({"error": "Failed to obtain access token", "detail": str(exc)}, status_code=500)
 
@@ -102,7 +301,7 @@ def callback(request: Request, sp_oauth: SpotifyOAuth = Depends(get_sp_oauth)):
         token_info["expires_at"] = int(time.time()) + int(token_info["expires_in"])
 
     session_id = str(uuid4())
-    SESSION_STORE[session_id] = token_info
+    SESSION_STORE.set(session_id, token_info)
 
     response = RedirectResponse(url="/")
     response.set_cookie(
@@ -111,42 +310,83 @@ def callback(request: Request, sp_oauth: SpotifyOAuth = Depends(get_sp_oauth)):
         httponly=True,
         secure=COOKIE_SECURE,
         samesite="strict",
-        max_age=token_info.get("expires_in", 3600),
+        max_age=SESSION_TTL,
         path="/",
     )
     return response
 
 
-def _get_session_id(request: Request):
+def _get_session(request: Request):
+    """Return the session id and stored token info, or raise 401."""
     session_id = request.cookies.get("session_id")
     if not session_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    if session_id not in SESSION_STORE:
+    token_info = SESSION_STORE.get(session_id)
+    if token_info is None:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    return session_id
+    return session_id, token_info
 
 
-def _get_spotify_client(request: Request):
-    session_id = _get_session_id(request)
-    token_info = SESSION_STORE[session_id]
-    expires_at = token_info.get("expires_at")
+def _get_session_id(request: Request):
+    return _get_session(request)[0]
+
+
+def _refresh_token(request: Request, token_info: dict):
+    """Ask Spotify for a new access token for `token_info`. Blocking; see `TOKENS`."""
+    refresh_token = token_info.get("refresh_token")
+    if not refresh_token:
+        raise HTTPException(status_code=401, detail="Session expired")
+
+    new_token_info = get_sp_oauth(request).refresh_access_token(refresh_token)
+    if "refresh_token" not in new_token_info:
+        new_token_info["refresh_token"] = refresh_token
+    if "expires_at" not in new_token_info and new_token_info.get("expires_in"):
+        new_token_info["expires_at"] = int(time.time()) + int(new_token_info["expires_in"])
+    return new_token_info
+
+
+async def _get_session_token(request: Request):
+    """Return the session id and a fresh token; only a due refresh leaves the event loop."""
+    with span("auth"):
+        session_id, token_info = _get_session(request)
+        refresh = partial(_refresh_token, request)
+        if TOKENS.is_due(token_info):
+            try:
+                token_info = await anyio.to_thread.run_sync(TOKENS.refresh, session_id, token_info, refresh)
+            except SessionEndedError:
+                raise HTTPException(status_code=401, detail="Not authenticated")
+        else:
+            TOKENS.prefetch(session_id, token_info, refresh)
+    return session_id, token_info
+
+
+def _scheduled_client(session_id: str, token_info: dict):
+    client = CLIENT_POOL.get(session_id, token_info["access_token"])
+    return ScheduledSpotifyClient(client, SCHEDULER, session_id,
+                                  observer=_spotify_call_observer(current_trace()))
+
 
-    if expires_at and int(time.time()) > expires_at - 60:
-        sp_oauth = get_sp_oauth(request)
-        refresh_token = token_info.get("refresh_token")
-        if not refresh_token:
-            raise HTTPException(status_code=401, detail="Session expired")
+_ASYNC_HTTP = None
 
-        new_token_info = sp_oauth.refresh_access_token(refresh_token)
-        if "refresh_token" not in new_token_info:
-            new_token_info["refresh_token"] = refresh_token
-        if "expires_at" not in new_token_info and new_token_info.get("expires_in"):
-            new_token_info["expires_at"] = int(time.time()) + int(new_token_info["expires_in"])
 
-        SESSION_STORE[session_id] = new_token_info
-        token_info = new_token_info
+def _async_client(session_id: str, token_info: dict):
+    """Return an asyncio Spotify client for the session, on the worker's shared HTTP pool."""
+    global _ASYNC_HTTP
+    if _ASYNC_HTTP is None:
+        _ASYNC_HTTP = AsyncHTTPPool(max_connections=SPOTIFY_ASYNC_MAX_CONNECTIONS,
+                                    shard_size=max(SESSION_CONNECTIONS, 4))
+    client = AsyncSpotifyClient(token_info["access_token"], _ASYNC_HTTP.client_for(session_id),
+                                api_url=SPOTIFY_API_URL)
+    return ScheduledSpotifyClient(client, SCHEDULER, session_id,
+                                  observer=_spotify_call_observer(current_trace()))
 
-    return spotipy.Spotify(auth=token_info["access_token"])
+
+async def close_async_http():
+    """Close the shared asyncio HTTP client; called when the application shuts down."""
+    global _ASYNC_HTTP
+    if _ASYNC_HTTP is not None:
+        await _ASYNC_HTTP.aclose()
+        _ASYNC_HTTP = None
 
 
 @router.get("/auth/status")
@@ -159,19 +399,40 @@ def auth_status(request: Request):
 def logout(request: Request):
     session_id = request.cookies.get("session_id")
     if session_id:
-        SESSION_STORE.pop(session_id, None)
+        SESSION_STORE.delete(session_id)
+        CLIENT_POOL.evict(session_id)
     response = JSONResponse({"status": "ok"})
     response.delete_cookie("session_id", path="/")
     return response
 
 
 @router.get("/playlists")
-def list_playlists(request: Request):
-    """Return current user's playlists using the server-side Spotify session."""
-    sp = _get_spotify_client(request)
-    results = sp.current_user_playlists(limit=50)
+async def list_playlists(request: Request, offset: int = 0, limit: int | None = None):
+    """Return current user's playlists using the server-side Spotify session.
+
+    Every page of playlists is fetched (concurrently after the first one) and the
+    `offset`/`limit` window is returned. The response carries an ETag built from
+    the playlist ids and snapshot ids so unchanged lists are answered with 304.
+    With a track store, the listed snapshot ids are recorded in it and the stored
+    tracks of playlists that changed since are dropped.
+    """
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must not be negative")
+
+    sp = _async_client(*await _get_session_token(request))
+    results = await afetch_all_playlists(sp, concurrency=FETCH_CONCURRENCY)
+    if TRACK_STORE is not None:
+        await anyio.to_thread.run_sync(TRACK_STORE.put_playlists, results)
+    end = None if limit is None else offset + limit
+    window = results[offset:end]
+
+    etag = playlists_etag(window, len(results), offset, limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
     playlists = []
-    for p in results["items"]:
+    for p in window:
         images = p.get("images") or []
         image_url = images[0]["url"] if images else None
         playlists.append({
@@ -179,46 +440,370 @@ def list_playlists(request: Request):
             "name": p["name"],
             "tracks": p["tracks"]["total"],
             "image_url": image_url,
+            "snapshot_id": p.get("snapshot_id"),
         })
-    return {"items": playlists}
+    return JSONResponse(
+        {"items": playlists, "total": len(results), "offset": offset, "limit": limit},
+        headers=headers,
+    )
 
 
-class SortRequest(BaseModel):
-    playlist_id: str
+def _track_row(track: dict, position: int):
+    album = track.get("album") or {}
+    return {
+        "position": position,
+        "id": track.get("id"),
+        "uri": track.get("uri"),
+        "name": track.get("name"),
+        "artists": [artist.get("name") for artist in track.get("artists") or []],
+        "album": album.get("name"),
+        "release_date": album.get("release_date"),
+        "duration_ms": track.get("duration_ms"),
+        "popularity": track.get("popularity"),
+    }
+
+
+@router.get("/playlists/{playlist_id}/tracks")
+async def stream_playlist_tracks(playlist_id: str, request: Request):
+    """Stream the playlist's tracks as NDJSON, one line per track, as pages arrive."""
+    sp = _async_client(*await _get_session_token(request))
+    sorter = _make_async_sorter(sp, playlist_id)
+
+    async def lines():
+        with _observe_operation("tracks", sorter):
+            async for page in sorter.iter_track_pages():
+                yield "".join(json.dumps(_track_row(track, track["position"])) + "\n" for track in page)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def _make_sorter(sp, playlist_id: str, on_progress=None):
+    return PlaylistSorter(sp, playlist_id, fetch_concurrency=FETCH_CONCURRENCY,
+                          track_cache=TRACK_CACHE, on_progress=on_progress, artist_cache=ARTIST_CACHE,
+                          track_store=TRACK_STORE)
+
+
+def _make_async_sorter(sp, playlist_id: str):
+    return AsyncPlaylistSorter(sp, playlist_id, fetch_concurrency=FETCH_CONCURRENCY,
+                               track_cache=TRACK_CACHE, artist_cache=ARTIST_CACHE, track_store=TRACK_STORE)
+
+
+def _lock_options(request: Request, kind: str, payload: BaseModel):
+    """Return the `PlaylistLocks` options of a playlist operation request.
+
+    Requests of the same session with the same body are coalesced into one
+    call, and a newer request of the session replaces one still waiting.
+    Dry runs only coalesce, since they never write.
+    """
+    session_id = _get_session_id(request)
+    return {
+        "key": (session_id, kind, payload.model_dump_json(exclude={"background"})),
+        "owner": session_id,
+        "exclusive": not getattr(payload, "dry_run", False),
+    }
+
+
+def _exclusive(request: Request, kind: str, payload: BaseModel, operation):
+    """Wrap a background `operation` so it holds the playlist's mutation lock while it runs."""
+    options = _lock_options(request, kind, payload)
+
+    def locked_operation(on_progress=None):
+        return PLAYLIST_LOCKS.run(payload.playlist_id, lambda: operation(on_progress), **options)
+
+    return locked_operation
+
+
+async def _run_exclusive(request: Request, kind: str, payload: BaseModel, operation):
+    """Await `operation()` under the playlist's mutation lock, answering 409 when it stays busy."""
+    try:
+        return await PLAYLIST_LOCKS.arun(payload.playlist_id, operation,
+                                         **_lock_options(request, kind, payload))
+    except PlaylistBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+def _submit_job(request: Request, kind: str, operation):
+    """Run `operation(on_progress)` on the job pool and answer 202 with its id."""
+    session_id = _get_session_id(request)
+    try:
+        job = JOB_MANAGER.submit(kind, operation, owner=session_id)
+    except JobQueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return JSONResponse(
+        {
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+        },
+        status_code=202,
+    )
+
+
+class SortKeySpec(BaseModel):
+    key: str
+    desc: bool = False
+
+
+class SortOptions(BaseModel):
     method: str = "artist"
     direction: str = "descending"
+    spec: list[SortKeySpec] | None = None
+    # Options of method "shuffle".
+    seed: int | None = None
+    min_gap: int = DEFAULT_MIN_GAP
+
+    @property
+    def shuffled(self) -> bool:
+        return self.method == "shuffle" and not self.spec
+
+    def sort_keys(self):
+        """Return `(key, reverse)` pairs from the spec, or from method/direction."""
+        if self.spec:
+            return [(item.key, item.desc) for item in self.spec]
+        return [(self.method, self.direction.lower() == "descending")]
+
+    def check(self):
+        """Raise 400 for an unknown sort key or an invalid shuffle option."""
+        if self.shuffled:
+            if self.min_gap < 1:
+                raise HTTPException(status_code=400, detail="min_gap must be at least 1")
+        elif any(key not in SORT_COLUMNS for key, _ in self.sort_keys()):
+            raise HTTPException(status_code=400, detail="Unknown method")
+
+
+def _sort(sorter: PlaylistSorterBase, options: SortOptions, dry_run: bool = False):
+    """Run the sort or shuffle `options` ask for; a coroutine for an `AsyncPlaylistSorter`."""
+    if options.shuffled:
+        return sorter.shuffle(seed=options.seed, min_gap=options.min_gap, dry_run=dry_run)
+    return sorter.sort_by_keys(options.sort_keys(), dry_run=dry_run)
+
+
+class SortRequest(SortOptions):
+    playlist_id: str
+    background: bool = False
+    dry_run: bool = False
+
+
+def _result_field(dry_run: bool) -> str:
+    return "preview" if dry_run else "write"
 
 
 @router.post("/sort")
-def sort_playlist(payload: SortRequest, request: Request):
+async def sort_playlist(payload: SortRequest, request: Request):
     """Reorder the given playlist using PlaylistSorter.
 
     Expects JSON body: {"playlist_id": "id", "method": "artist", "direction": "ascending"|"descending"}
+    or a composite spec evaluated in one pass, e.g.
+    {"playlist_id": "id", "spec": [{"key": "artist"}, {"key": "release", "desc": true}]}.
+    "genre" and "artist_followers" sort by the genre or follower count of each
+    track's first artist, looked up in batches and cached across requests.
+    "method": "shuffle" shuffles the playlist with tracks of the same artist at least
+    "min_gap" positions apart where possible; pass the "seed" of an earlier result
+    to get the same order again.
+    With "background": true the sort runs as a job and the response is 202 with its id.
+    With "dry_run": true nothing is written; the response holds a "preview" of the
+    moves, removed positions and estimated write calls instead. A sort written as
+    a rewrite removes items without a track; both report "removed_without_track".
     """
-    sp = _get_spotify_client(request)
-    sorter = PlaylistSorter(sp, payload.playlist_id)
-    reverse = payload.direction.lower() == "descending"
-    if payload.method == "artist":
-        sorter.sort_by_artist(reverse=reverse)
-    elif payload.method == "release":
-        sorter.sort_by_release_date(reverse=reverse)
-    elif payload.method == "duration":
-        sorter.sort_by_duration(reverse=reverse)
-    elif payload.method == "popularity":
-        sorter.sort_by_popularity(reverse=reverse)
-    else:
-        raise HTTPException(status_code=400, detail="Unknown method")
-    return {"status": "ok"}
+    payload.check()
+    session_id, token_info = await _get_session_token(request)
+    if payload.background:
+        sp = _scheduled_client(session_id, token_info)
+
+        def operation(on_progress=None):
+            sorter = _make_sorter(sp, payload.playlist_id, on_progress)
+            with _observe_operation("sort", sorter):
+                return _sort(sorter, payload, dry_run=payload.dry_run)
+
+        return _submit_job(request, "sort", _exclusive(request, "sort", payload, operation))
+
+    sorter = _make_async_sorter(_async_client(session_id, token_info), payload.playlist_id)
+
+    async def sort():
+        with _observe_operation("sort", sorter):
+            return await _sort(sorter, payload, dry_run=payload.dry_run)
+
+    return {"status": "ok", _result_field(payload.dry_run): await _run_exclusive(request, "sort", payload, sort)}
+
 
+class DuplicateOptions(BaseModel):
+    mode: str = "exact"
+    keep: str = "first"
 
-class RemoveDuplicatesRequest(BaseModel):
+    def duplicate_options(self):
+        """Return the `remove_duplicates` keyword arguments for the mode and keep policy."""
+        return {"fuzzy": self.mode == "fuzzy", "keep": self.keep}
+
+    def check(self):
+        """Raise 400 for an unknown mode or keep policy."""
+        if self.mode not in ("exact", "fuzzy"):
+            raise HTTPException(status_code=400, detail=f"Unknown mode: {self.mode}")
+        if self.keep not in KEEP_POLICIES:
+            raise HTTPException(status_code=400, detail=f"Unknown keep policy: {self.keep}")
+
+
+class RemoveDuplicatesRequest(DuplicateOptions):
     playlist_id: str
+    background: bool = False
+    dry_run: bool = False
 
 
 @router.post("/remove_duplicates")
-def remove_duplicates(payload: RemoveDuplicatesRequest, request: Request):
-    """Remove duplicate tracks from a playlist while preserving the first occurrence."""
-    sp = _get_spotify_client(request)
-    sorter = PlaylistSorter(sp, payload.playlist_id)
-    sorter.remove_duplicates()
-    return {"status": "ok"}
+async def remove_duplicates(payload: RemoveDuplicatesRequest, request: Request):
+    """Remove duplicate tracks from a playlist while preserving the first occurrence.
+
+    "mode": "fuzzy" also removes other releases of the same recording (same ISRC,
+    or same title and artist with a near-identical duration); "keep" picks the copy
+    that stays: "first", "popular" or "earliest".
+    With "dry_run": true nothing is written and the response holds a "preview".
+    """
+    payload.check()
+    options = {"dry_run": payload.dry_run, **payload.duplicate_options()}
+    session_id, token_info = await _get_session_token(request)
+    if payload.background:
+        sp = _scheduled_client(session_id, token_info)
+
+        def operation(on_progress=None):
+            sorter = _make_sorter(sp, payload.playlist_id, on_progress)
+            with _observe_operation("remove_duplicates", sorter):
+                return sorter.remove_duplicates(**options)
+
+        return _submit_job(request, "remove_duplicates",
+                           _exclusive(request, "remove_duplicates", payload, operation))
+
+    sorter = _make_async_sorter(_async_client(session_id, token_info), payload.playlist_id)
+
+    async def remove():
+        with _observe_operation("remove_duplicates", sorter):
+            return await sorter.remove_duplicates(**options)
+
+    result = await _run_exclusive(request, "remove_duplicates", payload, remove)
+    return {"status": "ok", _result_field(payload.dry_run): result}
+
+
+BATCH_OPERATIONS = ("sort", "remove_duplicates")
+
+
+class BatchItem(SortOptions, DuplicateOptions):
+    playlist_id: str
+    operation: str = "sort"
+
+    def check(self):
+        """Raise 400 for an unknown operation or invalid options of the operation."""
+        if self.operation not in BATCH_OPERATIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown operation: {self.operation}")
+        if self.operation == "sort":
+            SortOptions.check(self)
+        else:
+            DuplicateOptions.check(self)
+
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(max_length=BATCH_MAX_ITEMS)
+    concurrency: int = BATCH_CONCURRENCY
+    background: bool = False
+
+
+def _batch_operation(sorter: PlaylistSorterBase, item: BatchItem):
+    """Run one batch item; a coroutine for an `AsyncPlaylistSorter`."""
+    if item.operation == "remove_duplicates":
+        return sorter.remove_duplicates(**item.duplicate_options())
+    return _sort(sorter, item)
+
+
+@router.post("/batch")
+async def batch(payload: BatchRequest, request: Request):
+    """Sort or deduplicate many playlists concurrently.
+
+    Expects JSON body: {"items": [{"playlist_id": "id", "operation": "sort"|"remove_duplicates",
+    ...sort options or "mode"/"keep"}], "concurrency": 4}. Different playlists run in
+    parallel, up to `concurrency` (capped by BATCH_CONCURRENCY); operations on the same
+    playlist run in order. At most BATCH_MAX_ITEMS items are accepted (422 otherwise).
+    Returns per-item results and timings.
+    """
+    for item in payload.items:
+        item.check()
+
+    session_id, token_info = await _get_session_token(request)
+    concurrency = max(1, min(payload.concurrency, BATCH_CONCURRENCY))
+
+    # No owner: batch items are explicitly ordered work and must not supersede each other.
+    if payload.background:
+        sp = _scheduled_client(session_id, token_info)
+
+        def run_item(item):
+            sorter = _make_sorter(sp, item.playlist_id)
+
+            def write():
+                with _observe_operation(item.operation, sorter):
+                    return _batch_operation(sorter, item)
+
+            return PLAYLIST_LOCKS.run(item.playlist_id, write)
+
+        def operation(on_progress=None):
+            on_item_done = None
+            if on_progress:
+                on_progress("processing", items_total=len(payload.items), items_done=0)
+
+                def on_item_done(done):
+                    on_progress("processing", items_done=done)
+
+            return run_batch(payload.items, run_item, concurrency=concurrency, on_item_done=on_item_done)
+
+        return _submit_job(request, "batch", operation)
+
+    sp = _async_client(session_id, token_info)
+
+    async def run_item(item):
+        sorter = _make_async_sorter(sp, item.playlist_id)
+
+        async def write():
+            with _observe_operation(item.operation, sorter):
+                return await _batch_operation(sorter, item)
+
+        return await PLAYLIST_LOCKS.arun(item.playlist_id, write)
+
+    return {"status": "ok", **await arun_batch(payload.items, run_item, concurrency=concurrency)}
+
+
+def _get_job(request: Request, job_id: str):
+    session_id = _get_session_id(request)
+    job = JOB_MANAGER.get(job_id)
+    if job is None or job.owner != session_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, request: Request):
+    """Return the phase, counters and result of a background job."""
+    return _get_job(request, job_id).to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+def job_events(job_id: str, request: Request):
+    """Stream job progress as Server-Sent Events until the job finishes."""
+    job = _get_job(request, job_id)
+
+    def events():
+        version = -1
+        while True:
+            change = JOB_MANAGER.wait_for_change(job, version)
+            if change is None:
+                yield ": keep-alive\n\n"
+                continue
+            data, version = change
+            yield f"data: {json.dumps(data)}\n\n"
+            # Decided on the state just sent, so the terminal event is never skipped.
+            if data["status"] in FINISHED_STATUSES:
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/metrics")
+def metrics():
+    """Expose this worker's metrics in the Prometheus text format."""
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
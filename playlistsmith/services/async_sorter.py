@@ -0,0 +1,231 @@
+"""Playlist sorter for asyncio Spotify clients.
+
+`AsyncPlaylistSorter` has the behaviour of `PlaylistSorter` (cache lookups,
+in-place range moves, dry-run previews, progress reporting). Both build on
+`PlaylistSorterBase`, which holds every step that does no I/O, so this
+module only awaits the Spotify calls on an `AsyncSpotifyClient`. Pages are
+fetched ahead of the consumer by tasks instead of threads. Sorting, dedupe
+and move planning are CPU work, and track store reads and writes block on
+SQLite; both run in a worker thread, so one large playlist does not stall
+every other request served by the event loop.
+"""
+import asyncio
+from collections import deque
+from itertools import islice
+
+import anyio.to_thread
+
+from playlistsmith.services.artists import afetch_artists
+from playlistsmith.services.shuffle import DEFAULT_MIN_GAP, new_seed
+from playlistsmith.services.sort_playlist import PAGE_SIZE, TRACK_FIELDS, PlaylistSorterBase
+from playlistsmith.services.track_table import TrackTable
+from playlistsmith.services.tracing import span
+
+
+class AsyncPlaylistSorter(PlaylistSorterBase):
+    """A playlist sorter whose Spotify calls and operations are coroutines.
+
+    `spotify_client` must return awaitables from its methods, like
+    `AsyncSpotifyClient` or a `ScheduledSpotifyClient` wrapping one.
+    """
+
+    async def _fetch_page(self, offset: int):
+        return await self.spotify_client.playlist_items(
+            self.playlist_id, limit=PAGE_SIZE, offset=offset, fields=TRACK_FIELDS)
+
+    async def _iter_pages_serially(self, offset: int = 0):
+        while True:
+            response = await self._fetch_page(offset)
+            if not self._is_page(response):
+                return
+
+            self._page_fetched(response)
+            yield offset, response
+            if not response.get('next'):
+                return
+            offset += PAGE_SIZE
+
+    async def iter_track_pages(self, parallel=None):
+        """Yield the playlist's normalized tracks one page at a time, in playlist order.
+
+        See `PlaylistSorter.iter_track_pages`.
+        """
+        if self.track_store is None:
+            async for offset, response in self._iter_responses(parallel):
+                yield self._extract_tracks(response, offset)
+            return
+
+        snapshot_id = await self.get_snapshot_id()
+        stored = self._stored_pages(snapshot_id)
+        page = await anyio.to_thread.run_sync(next, stored, None)
+        if page is not None:
+            while page is not None:
+                yield page
+                page = await anyio.to_thread.run_sync(next, stored, None)
+            return
+
+        with self.track_store.track_writer(self.playlist_id, snapshot_id) as writer:
+            async for offset, response in self._iter_responses(parallel):
+                page = self._extract_tracks(response, offset)
+                await anyio.to_thread.run_sync(writer.add, page)
+                yield page
+            await anyio.to_thread.run_sync(writer.commit)
+
+    async def _iter_responses(self, parallel=None):
+        """Yield `(offset, response)` for the raw `playlist_items` pages in playlist order."""
+        if not self._use_parallel(parallel):
+            async for offset, response in self._iter_pages_serially():
+                yield offset, response
+            return
+
+        response = await self._fetch_page(0)
+        if not self._is_page(response):
+            return
+
+        self._page_fetched(response)
+        yield 0, response
+        if not response.get('next'):
+            return
+
+        offsets = self._offsets_after(response)
+        if offsets is None:
+            async for offset, response in self._iter_pages_serially(PAGE_SIZE):
+                yield offset, response
+            return
+
+        pending = deque((offset, asyncio.ensure_future(self._fetch_page(offset)))
+                        for offset in islice(offsets, self.fetch_concurrency))
+        try:
+            while pending:
+                offset, task = pending.popleft()
+                page = await task
+                if not self._is_page(page):
+                    return
+                for next_offset in islice(offsets, 1):
+                    pending.append((next_offset, asyncio.ensure_future(self._fetch_page(next_offset))))
+                self._page_fetched(page)
+                yield offset, page
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def get_snapshot_id(self):
+        """Return the playlist's current `snapshot_id`. See `PlaylistSorter.get_snapshot_id`."""
+        response = await self.spotify_client.playlist(self.playlist_id, fields='snapshot_id')
+        self.snapshot_id = (response or {}).get('snapshot_id')
+        return self.snapshot_id
+
+    async def get_all_tracks(self, parallel=None):
+        """Retrieve all tracks from the playlist. See `PlaylistSorter.get_all_tracks`."""
+        return await self._load("tracks", parallel)
+
+    async def get_track_table(self, parallel=None):
+        """Retrieve the playlist as a `TrackTable`. See `PlaylistSorter.get_track_table`."""
+        return await self._load("table", parallel)
+
+    async def _load(self, kind: str, parallel=None):
+        self._report("fetching")
+        with span("fetch", kind=kind):
+            if self.track_cache is None and self.track_store is None:
+                return await self._fetch(kind, parallel)
+
+            snapshot_id = await self.get_snapshot_id()
+            cached = self._cached(kind, snapshot_id)
+            if cached is not None:
+                return cached
+
+            data = await self._read_through(kind, snapshot_id, parallel)
+            self._remember(kind, snapshot_id, data)
+            return data
+
+    async def _fetch(self, kind: str, parallel=None):
+        if kind == "tracks":
+            return await self._fetch_all_tracks(parallel)
+        return await self._fetch_track_table(parallel)
+
+    async def _read_through(self, kind: str, snapshot_id, parallel=None):
+        if self.track_store is None or not snapshot_id:
+            return await self._fetch(kind, parallel)
+
+        tracks = await anyio.to_thread.run_sync(self.track_store.get_tracks, self.playlist_id, snapshot_id)
+        if tracks is None:
+            tracks = await self._fetch_all_tracks(parallel)
+            await anyio.to_thread.run_sync(self.track_store.put_tracks, self.playlist_id, snapshot_id, tracks)
+        else:
+            self._report("sorting")
+        if kind == "tracks":
+            return tracks
+        return await anyio.to_thread.run_sync(TrackTable.from_tracks, tracks)
+
+    async def _fetch_all_tracks(self, parallel=None):
+        all_tracks = []
+        async for offset, response in self._iter_responses(parallel):
+            all_tracks.extend(self._extract_tracks(response, offset))
+        self._report("sorting")
+        return all_tracks
+
+    async def _fetch_track_table(self, parallel=None):
+        table = TrackTable()
+        async for _, response in self._iter_responses(parallel):
+            table.extend_from_items(response['items'])
+        self._report("sorting")
+        return table
+
+    async def reorder_playlist_in_batches(self, track_uris: list, current_uris=None):
+        """Write `track_uris` with the fewest calls. See `PlaylistSorter.reorder_playlist_in_batches`."""
+        stats, moves = await anyio.to_thread.run_sync(self._plan_write, track_uris, current_uris)
+        if not track_uris:
+            return stats
+
+        with span("write", tracks=len(track_uris)):
+            for method, arguments in self._write_calls(track_uris, moves):
+                self._written(await getattr(self.spotify_client, method)(self.playlist_id, **arguments))
+        return self._write_stats(stats, moves)
+
+    async def remove_duplicates(self, dry_run: bool = False, fuzzy: bool = False, keep: str = "first"):
+        """Remove duplicate tracks. See `PlaylistSorter.remove_duplicates`."""
+        tracks = await self.get_all_tracks()
+        if not tracks:
+            return
+
+        track_uris, current_uris = await anyio.to_thread.run_sync(
+            self._deduplicated_uris, tracks, fuzzy, keep)
+        if dry_run:
+            return await anyio.to_thread.run_sync(self.preview_reorder, track_uris, current_uris)
+        return await self.reorder_playlist_in_batches(track_uris, current_uris)
+
+    async def sort_by_keys(self, keys, dry_run: bool = False):
+        """Reorder the playlist by several sort keys. See `PlaylistSorter.sort_by_keys`."""
+        self._check_keys(keys)
+        table = await self.get_track_table()
+        if not len(table):
+            return
+
+        if table.needs_artist_details(keys):
+            await self.add_artist_details(table)
+        track_uris = await anyio.to_thread.run_sync(self._sorted_uris, table, keys)
+        if dry_run:
+            return await anyio.to_thread.run_sync(self.preview_reorder, track_uris, table.current_uris())
+        return await self.reorder_playlist_in_batches(track_uris, table.current_uris())
+
+    async def add_artist_details(self, table: TrackTable):
+        """Fill the genre and follower columns of `table`. See `PlaylistSorter.add_artist_details`."""
+        with span("artists", tracks=len(table)):
+            artists = await afetch_artists(self.spotify_client, table.artist_ids, self.artist_cache,
+                                           self.fetch_concurrency)
+            table.add_artist_details(artists)
+
+    async def shuffle(self, seed=None, min_gap: int = DEFAULT_MIN_GAP, dry_run: bool = False):
+        """Shuffle the playlist, keeping artists apart. See `PlaylistSorter.shuffle`."""
+        self._check_gap(min_gap)
+        table = await self.get_track_table()
+        if not len(table):
+            return
+
+        seed = new_seed() if seed is None else seed
+        track_uris, gap = await anyio.to_thread.run_sync(self._shuffled_uris, table, seed, min_gap)
+        if dry_run:
+            result = await anyio.to_thread.run_sync(self.preview_reorder, track_uris, table.current_uris())
+        else:
+            result = await self.reorder_playlist_in_batches(track_uris, table.current_uris())
+        return {**result, "seed": seed, "min_gap": gap}
@@ -0,0 +1,226 @@
+"""asyncio-native client for the Spotify Web API calls PlaylistSmith makes.
+
+spotipy is blocking, so every in-flight Spotify call of a synchronous
+endpoint holds a thread. `AsyncSpotifyClient` implements the calls used by
+`PlaylistSorter` and the playlist listing on `httpx.AsyncClient`, so a single
+worker can wait on hundreds of slow upstream calls from one event loop.
+
+The methods mirror spotipy's names, arguments and return values, and errors
+are raised as `spotipy.SpotifyException` with the response headers, so the
+rate-limit scheduler and the metrics treat both clients alike. Retries follow
+the spotipy sessions of `build_spotify_client`, which use `Retry(read=False)`:
+failed connection attempts are retried, but a request that may already have
+reached Spotify (a read timeout, a dropped response) is not. A 5xx response
+is only retried for idempotent calls (reads and `playlist_replace_items`);
+Spotify may have applied an add or a move before failing, so those are never
+sent twice. 429 is left to the rate-limit scheduler. The sessions
+of a worker share the connections of one `AsyncHTTPPool`; the access token is
+sent per request.
+"""
+import asyncio
+import re
+import ssl
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_API_URL = "https://api.spotify.com/v1/"
+# Statuses retried with exponential back-off, like `build_spotify_client`'s sessions.
+RETRY_STATUSES = (500, 502, 503, 504)
+# Methods whose requests can be repeated without changing the result.
+IDEMPOTENT_METHODS = frozenset(["GET", "DELETE"])
+
+
+class AsyncHTTPPool:
+    """Keep-alive HTTP connections shared by all sessions of a worker.
+
+    httpcore rescans every connection of a pool for each queued request, which
+    turns quadratic with hundreds of requests in flight. The connections are
+    therefore split into small `httpx.AsyncClient` shards, and each session is
+    pinned to one shard so its page fetches reuse the same connections.
+    Requests and newly opened connections are counted like the connections of
+    `SpotifyClientPool`'s clients, see `stats`.
+    """
+
+    def __init__(self, max_connections: int = 100, shard_size: int = 8, timeout: float = 5.0):
+        """Initialize the pool.
+
+        Args:
+            max_connections (int): Connections across all shards.
+            shard_size (int): Connections per shard; match the fetch concurrency.
+            timeout (float): Seconds before a request times out.
+        """
+        # Imported here so that httpx is only loaded by the first async request.
+        import httpx
+
+        shard_size = max(1, min(shard_size, max_connections))
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        # Loading the CA bundle is slow; every shard shares one SSL context.
+        verify = ssl.create_default_context()
+        hooks = {"request": [self._count_request]}
+        self._clients = [httpx.AsyncClient(limits=limits, timeout=timeout, verify=verify, event_hooks=hooks)
+                         for _ in range(max(1, -(-max_connections // shard_size)))]
+        self.requests = 0
+        self.connections = 0
+
+    def client_for(self, key) -> "httpx.AsyncClient":
+        """Return the HTTP client of the shard `key` (e.g. a session id) is pinned to."""
+        return self._clients[hash(key) % len(self._clients)]
+
+    async def _count_request(self, request: "httpx.Request"):
+        self.requests += 1
+        # httpcore reports through this hook when the request opens a connection.
+        request.extensions["trace"] = self._count_connection
+
+    async def _count_connection(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self.connections += 1
+
+    def stats(self):
+        """Return HTTP connection reuse counters."""
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "http_requests": self.requests,
+            "http_connections": self.connections,
+            "connection_reuse_rate": reused / self.requests if self.requests else 0.0,
+        }
+
+    async def aclose(self):
+        for client in self._clients:
+            await client.aclose()
+
+
+def _spotify_error(response: "httpx.Response"):
+    from spotipy.exceptions import SpotifyException
+
+    try:
+        error = response.json().get("error", {})
+        message = error.get("message") if isinstance(error, dict) else error
+        reason = error.get("reason") if isinstance(error, dict) else None
+    except ValueError:
+        message = response.text or None
+        reason = None
+    return SpotifyException(response.status_code, -1, f"{response.url}:\n {message}",
+                            reason=reason, headers=response.headers)
+
+
+def _get_id(kind: str, value: str) -> str:
+    """Return the id of a Spotify URI, open.spotify.com URL or bare id, like spotipy's `_get_id`.
+
+    Raises:
+        SpotifyException: If `value` is of another type or not an id at all.
+    """
+    from spotipy import Spotify
+    from spotipy.exceptions import SpotifyException
+
+    match = re.search(Spotify._regex_spotify_uri, value)
+    if match is not None:
+        groups = match.groupdict()
+        if groups["username"] and kind == "playlist":
+            return groups["playlistid"]
+        if groups["type"] != kind:
+            raise SpotifyException(400, -1, "Unexpected Spotify URI type.")
+        return groups["id"]
+    match = re.search(Spotify._regex_spotify_url, value)
+    if match is not None:
+        if match.group("type") != kind:
+            raise SpotifyException(400, -1, "Unexpected Spotify URL type.")
+        return match.group("id")
+    if re.search(Spotify._regex_base62, value) is not None:
+        return value
+    raise SpotifyException(400, -1, "Unsupported URL / URI.")
+
+
+def _playlist_path(playlist_id: str, tail: str = "") -> str:
+    return f"playlists/{_get_id('playlist', playlist_id)}{tail}"
+
+
+def _track_uri(item: str) -> str:
+    if item.startswith("spotify:"):
+        return item
+    return f"spotify:track:{_get_id('track', item)}"
+
+
+class AsyncSpotifyClient:
+    """Spotify Web API calls for one access token, awaited on the event loop."""
+
+    def __init__(self, access_token: str, http: "httpx.AsyncClient", api_url: str | None = None,
+                 retries: int = 3, backoff_factor: float = 0.3):
+        """Initialize the client.
+
+        Args:
+            access_token (str): OAuth access token of the session.
+            http (httpx.AsyncClient): HTTP client, e.g. from `AsyncHTTPPool.client_for`.
+            api_url (str, optional): Web API base URL, e.g. a local stand-in.
+            retries (int): Times a 5xx response or a failed connection attempt is retried.
+            backoff_factor (float): Base of the exponential back-off between retries.
+        """
+        self.access_token = access_token
+        self.prefix = (api_url or DEFAULT_API_URL).rstrip("/") + "/"
+        self._http = http
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+
+    async def _call(self, method: str, path: str, params=None, payload=None, idempotent=None):
+        import httpx
+
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.request(method, self.prefix + path, params=params,
+                                                    json=payload, headers=headers)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # The request never reached Spotify, so even a POST is safe to resend.
+                if attempt >= self._retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or not idempotent or attempt >= self._retries:
+                    break
+            await asyncio.sleep(self._backoff_factor * (2 ** attempt))
+            attempt += 1
+
+        if response.is_error:
+            raise _spotify_error(response)
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0):
+        return await self._call("GET", "me/playlists", {"limit": limit, "offset": offset})
+
+    async def playlist(self, playlist_id: str, fields=None, market=None, additional_types=("track",)):
+        return await self._call("GET", _playlist_path(playlist_id), {
+            "fields": fields, "market": market, "additional_types": ",".join(additional_types)})
+
+    async def playlist_items(self, playlist_id: str, fields=None, limit: int = 100, offset: int = 0,
+                             market=None, additional_types=("track", "episode")):
+        return await self._call("GET", _playlist_path(playlist_id, "/items"), {
+            "fields": fields, "limit": limit, "offset": offset, "market": market,
+            "additional_types": ",".join(additional_types)})
+
+    async def playlist_replace_items(self, playlist_id: str, items):
+        # Replacing the items twice leaves the same playlist, so a 5xx is retried.
+        return await self._call("PUT", _playlist_path(playlist_id, "/items"),
+                                payload={"uris": [_track_uri(item) for item in items]}, idempotent=True)
+
+    async def playlist_add_items(self, playlist_id: str, items, position=None):
+        return await self._call("POST", _playlist_path(playlist_id, "/items"), {"position": position},
+                                payload=[_track_uri(item) for item in items])
+
+    async def artists(self, artists):
+        ids = ",".join(_get_id("artist", artist) for artist in artists)
+        return await self._call("GET", "artists", {"ids": ids})
+
+    async def playlist_reorder_items(self, playlist_id: str, range_start: int, insert_before: int,
+                                     range_length: int = 1, snapshot_id=None):
+        payload = {"range_start": range_start, "range_length": range_length, "insert_before": insert_before}
+        if snapshot_id:
+            payload["snapshot_id"] = snapshot_id
+        return await self._call("PUT", _playlist_path(playlist_id, "/items"), payload=payload)
@@ -0,0 +1,101 @@
+"""Run playlist operations for many playlists at once.
+
+Operations on different playlists are independent and run concurrently, on a
+bounded thread pool (`run_batch`) or as bounded asyncio tasks (`arun_batch`).
+Operations that target the same playlist are grouped and run one after another
+in request order, so their writes never interleave.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Batch:
+    """Per-item results and progress of one batch run."""
+
+    def __init__(self, items: list, on_item_done=None):
+        self.items = items
+        self.on_item_done = on_item_done
+        self.started = time.perf_counter()
+        self.results = [None] * len(items)
+        self.groups = {}
+        for index, item in enumerate(items):
+            self.groups.setdefault(item.playlist_id, []).append(index)
+        self._done = 0
+        self._lock = threading.Lock()
+
+    def workers(self, concurrency: int) -> int:
+        return max(1, min(concurrency, len(self.groups)))
+
+    def finish(self, index: int, outcome: dict, started: float):
+        outcome["seconds"] = round(time.perf_counter() - started, 6)
+        self.results[index] = {"playlist_id": self.items[index].playlist_id, **outcome}
+        with self._lock:
+            self._done += 1
+            finished = self._done
+        if self.on_item_done:
+            self.on_item_done(finished)
+
+    def report(self, workers: int) -> dict:
+        return {
+            "items": self.results,
+            "playlists": len(self.groups),
+            "concurrency": workers,
+            "seconds": round(time.perf_counter() - self.started, 6),
+        }
+
+
+def run_batch(items: list, run_item, concurrency: int = 4, on_item_done=None):
+    """Run `run_item(item)` for every item with bounded concurrency across playlists.
+
+    Args:
+        items (list): Objects with a `playlist_id` attribute, in request order.
+        run_item (callable): Performs one item and returns its result.
+        concurrency (int, optional): Maximum number of playlists processed at once.
+        on_item_done (callable, optional): Called with the number of finished
+            items after each one completes.
+
+    Returns:
+        dict: Per-item results in request order, each with its status, result or
+        error and duration, plus the batch wall time.
+    """
+    batch = _Batch(items, on_item_done)
+
+    def run_group(indices):
+        for index in indices:
+            started = time.perf_counter()
+            try:
+                outcome = {"status": "ok", "result": run_item(items[index])}
+            except Exception as exc:
+                outcome = {"status": "error", "error": str(exc)}
+            batch.finish(index, outcome, started)
+
+    workers = batch.workers(concurrency)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="playlistsmith-batch") as executor:
+        list(executor.map(run_group, batch.groups.values()))
+    return batch.report(workers)
+
+
+async def arun_batch(items: list, run_item, concurrency: int = 4, on_item_done=None):
+    """Await `run_item(item)`, a coroutine function, for every item. See `run_batch`.
+
+    The playlists share `concurrency` tasks on the event loop, so a batch holds
+    no thread while it waits on Spotify.
+    """
+    batch = _Batch(items, on_item_done)
+    groups = iter(batch.groups.values())
+
+    async def worker():
+        for indices in groups:
+            for index in indices:
+                started = time.perf_counter()
+                try:
+                    outcome = {"status": "ok", "result": await run_item(items[index])}
+                except Exception as exc:
+                    outcome = {"status": "error", "error": str(exc)}
+                batch.finish(index, outcome, started)
+
+    workers = batch.workers(concurrency)
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return batch.report(workers)
@@ -0,0 +1,178 @@
+"""Reusable Spotify clients keyed by session.
+
+Building a `spotipy.Spotify` per request also builds a new `requests`
+session, so every request pays for a fresh TLS handshake with the Spotify
+API. `SpotifyClientPool` keeps one client per session, backed by a
+keep-alive connection pool sized for concurrent page fetches, and only
+rebuilds it when the session's access token changes. Clients of sessions
+that logged out are closed right away, and clients left unused for the
+session TTL, whose sessions have expired, on the next pool access.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def _connection_counts(http_session):
+    """Return (requests, new connections) made through a requests session."""
+    requests_made = 0
+    connections = 0
+    for adapter in getattr(http_session, "adapters", {}).values():
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made += getattr(pool, "num_requests", 0)
+            connections += getattr(pool, "num_connections", 0)
+    return requests_made, connections
+
+
+def build_spotify_client(access_token: str, pool_size: int, api_url: str | None = None):
+    """Build a spotipy client whose HTTP session keeps `pool_size` connections alive.
+
+    `api_url` replaces the Web API base URL, e.g. to point at a local stand-in.
+    """
+    import requests
+    import spotipy
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Mirror spotipy's own retry policy, which it only installs on sessions it
+    # creates, except for 429: the rate-limit scheduler handles Retry-After, so
+    # urllib3 must not sleep on it and retry inside the worker thread. And
+    # unlike spotipy, only idempotent requests are resent after a 5xx: Spotify
+    # may have applied an add or a move before failing. Failed connection
+    # attempts never reached Spotify and are retried for every method.
+    retry = Retry(
+        total=3,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "DELETE"]),
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        respect_retry_after_header=False,
+    )
+    http_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    client = spotipy.Spotify(auth=access_token, requests_session=http_session)
+    if api_url:
+        client.prefix = api_url.rstrip("/") + "/"
+    return client
+
+
+class SpotifyClientPool:
+    """Keep one Spotify client per session and rebuild it only on token refresh."""
+
+    def __init__(self, pool_size: int = 4, max_clients: int = 1000, client_factory=None,
+                 ttl: float | None = None, clock=time.monotonic):
+        """Initialize the pool.
+
+        Args:
+            pool_size (int): Keep-alive connections per client; match the fetch concurrency.
+            max_clients (int): Maximum number of cached clients, evicted least recently used.
+            client_factory (callable, optional): `factory(access_token, pool_size)`
+                returning a client. Defaults to `build_spotify_client`.
+            ttl (float, optional): Seconds a client may stay unused before it is
+                closed; pass the session TTL. Defaults to no expiry.
+            clock (callable, optional): Time source, for tests.
+        """
+        self.pool_size = pool_size
+        self.max_clients = max_clients
+        self.ttl = ttl
+        self._client_factory = client_factory or build_spotify_client
+        self._clock = clock
+        # session id -> (access token, client, last use), least recently used first.
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.expired = 0
+        # Counters of clients that were already closed.
+        self._retired_requests = 0
+        self._retired_connections = 0
+
+    def get(self, session_id: str, access_token: str):
+        """Return the session's client, building a new one if the token changed."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._clients.get(session_id)
+            if entry is not None and entry[0] == access_token:
+                self._clients[session_id] = (access_token, entry[1], now)
+                self._clients.move_to_end(session_id)
+                self.hits += 1
+                return entry[1]
+
+        client = self._client_factory(access_token, self.pool_size)
+        with self._lock:
+            previous = self._clients.pop(session_id, None)
+            if previous is not None:
+                self._retire(previous[1])
+            self._clients[session_id] = (access_token, client, self._clock())
+            self.builds += 1
+            while len(self._clients) > self.max_clients:
+                _, (_, evicted, _) = self._clients.popitem(last=False)
+                self._retire(evicted)
+        return client
+
+    def evict(self, session_id: str):
+        """Close and forget the client of a session that ended."""
+        with self._lock:
+            entry = self._clients.pop(session_id, None)
+            if entry is not None:
+                self._retire(entry[1])
+
+    def _expire(self, now: float):
+        """Close the clients unused for `ttl`, oldest first. Call with the lock held.
+
+        A session ends `ttl` after its token was last stored, so a client unused
+        for that long usually belongs to an expired session. Should the session
+        still be alive, the next `get` builds it a new client.
+        """
+        if self.ttl is None:
+            return
+        while self._clients:
+            session_id, (_, client, last_used) = next(iter(self._clients.items()))
+            if last_used > now - self.ttl:
+                return
+            del self._clients[session_id]
+            self._retire(client)
+            self.expired += 1
+
+    def _retire(self, client):
+        http_session = getattr(client, "_session", None)
+        if http_session is None:
+            return
+        requests_made, connections = _connection_counts(http_session)
+        self._retired_requests += requests_made
+        self._retired_connections += connections
+        close = getattr(http_session, "close", None)
+        if close:
+            close()
+
+    def stats(self):
+        """Return client reuse and HTTP connection reuse counters."""
+        with self._lock:
+            self._expire(self._clock())
+            requests_made = self._retired_requests
+            connections = self._retired_connections
+            for _, client, _ in self._clients.values():
+                counts = _connection_counts(getattr(client, "_session", None))
+                requests_made += counts[0]
+                connections += counts[1]
+            reused = max(requests_made - connections, 0)
+            return {
+                "clients": len(self._clients),
+                "client_hits": self.hits,
+                "client_builds": self.builds,
+                "client_expired": self.expired,
+                "http_requests": requests_made,
+                "http_connections": connections,
+                "connection_reuse_rate": reused / requests_made if requests_made else 0.0,
+            }
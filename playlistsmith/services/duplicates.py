@@ -0,0 +1,174 @@
+"""Find duplicate recordings in a playlist.
+
+Exact duplicates share a track URI. Fuzzy duplicates are the same recording
+published more than once, for example on a single and on an album, or as a
+remaster. Two tracks are fuzzy duplicates when they share an ISRC, or when
+their normalized title and primary artist match and their durations differ
+by at most a small tolerance. The title match only applies when an ISRC is
+missing: recordings with different ISRCs, such as a re-recorded "Song
+(Taylor's Version)", are never merged, not even through a third track.
+
+Comparing every pair would be quadratic, so tracks are first bucketed by
+hashed blocking keys (URI, ISRC, and normalized title plus artist). Only
+tracks in the same bucket are compared, which keeps the work close to linear
+for real playlists. Repeats of a URI join the first copy's group directly and
+are not compared again.
+"""
+import re
+import unicodedata
+
+from playlistsmith.services.track_table import release_date_ordinal
+
+KEEP_POLICIES = ("first", "popular", "earliest")
+
+DURATION_TOLERANCE_MS = 3000
+
+# Title suffixes that mark another release of the same recording, such as
+# "Song - Remastered 2011" or "Song (Single Version)".
+_VERSION_WORDS = r"remaster(?:ed)?|version|edit|mono|stereo|single|album|deluxe|explicit|clean|feat\.?|ft\.?"
+_BRACKETED = re.compile(r"[(\[][^)\]]*\b(?:" + _VERSION_WORDS + r")\b[^)\]]*[)\]]")
+_DASH_SUFFIX = re.compile(r"\s-\s.*\b(?:" + _VERSION_WORDS + r")\b.*$")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(text) -> str:
+    """Lowercase, strip accents and collapse punctuation and whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def normalize_title(title) -> str:
+    """Normalize a track title, dropping remaster, edit and featuring suffixes."""
+    title = (title or "").lower()
+    title = _BRACKETED.sub(" ", title)
+    title = _DASH_SUFFIX.sub("", title)
+    return normalize_text(title)
+
+
+def _primary_artist(track: dict) -> str:
+    artists = track.get("artists") or []
+    return normalize_text(artists[0].get("name")) if artists else ""
+
+
+class _DisjointSet:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, index: int) -> int:
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, first: int, second: int) -> int:
+        """Merge the groups of two positions and return the root of the merged group."""
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # The lower index stays the root so groups are keyed by first occurrence.
+            if second < first:
+                first, second = second, first
+            self.parent[second] = first
+        return first
+
+
+def find_duplicate_groups(tracks: list, fuzzy: bool = True,
+                          duration_tolerance_ms: int = DURATION_TOLERANCE_MS):
+    """Group the positions of tracks that are copies of the same recording.
+
+    Args:
+        tracks (list): Normalized track dicts in playlist order.
+        fuzzy (bool, optional): Also match on ISRC and on title, artist and
+            duration. If False only identical URIs are duplicates.
+        duration_tolerance_ms (int, optional): Largest duration difference for
+            a title and artist match.
+
+    Returns:
+        list: Lists of positions, in playlist order, with two or more entries.
+    """
+    groups = _DisjointSet(len(tracks))
+    first_by_uri = {}
+    first_by_isrc = {}
+    # Root of a group -> the ISRC of its members, if any has one.
+    isrc_by_root = {}
+    # (title, artist) -> positions, compared by duration within the block.
+    blocks = {}
+
+    for index, track in enumerate(tracks):
+        uri = track.get("uri")
+        if uri:
+            first = first_by_uri.setdefault(uri, index)
+            if first != index:
+                # The same track again: it matches whatever its first copy matched.
+                groups.union(first, index)
+                continue
+        if not fuzzy:
+            continue
+
+        isrc = (track.get("isrc") or "").upper()
+        if isrc:
+            isrc_by_root[groups.union(first_by_isrc.setdefault(isrc, index), index)] = isrc
+
+        title = normalize_title(track.get("name"))
+        if not title:
+            continue
+        block = blocks.setdefault((title, _primary_artist(track)), [])
+        duration = track.get("duration_ms") or 0
+        for other in block:
+            if abs((tracks[other].get("duration_ms") or 0) - duration) > duration_tolerance_ms:
+                continue
+            other_isrc = isrc_by_root.get(groups.find(other))
+            own_isrc = isrc_by_root.get(groups.find(index))
+            if other_isrc and own_isrc and other_isrc != own_isrc:
+                continue
+            isrc_by_root[groups.union(other, index)] = other_isrc or own_isrc
+        block.append(index)
+
+    members = {}
+    for index in range(len(tracks)):
+        members.setdefault(groups.find(index), []).append(index)
+    return [group for group in members.values() if len(group) > 1]
+
+
+def _choose(tracks: list, group: list, keep: str) -> int:
+    if keep == "popular":
+        return min(group, key=lambda index: (-(tracks[index].get("popularity") or 0), index))
+    if keep == "earliest":
+        return min(group, key=lambda index: (_release_key(tracks[index]), index))
+    return group[0]
+
+
+def _release_key(track: dict):
+    release_date = (track.get("album") or {}).get("release_date")
+    # Tracks without a release date never win the "earliest" policy.
+    return release_date_ordinal(release_date) if release_date else float("inf")
+
+
+def select_unique_tracks(tracks: list, keep: str = "first", fuzzy: bool = True,
+                         duration_tolerance_ms: int = DURATION_TOLERANCE_MS):
+    """Return the tracks left after dropping duplicates, in playlist order.
+
+    The kept copy of each group stays at its own position. Tracks without a
+    URI cannot be written back and are dropped.
+
+    Args:
+        tracks (list): Normalized track dicts in playlist order.
+        keep (str, optional): Which copy to keep: "first", "popular" (highest
+            popularity) or "earliest" (oldest release date). Ties keep the
+            earlier position.
+        fuzzy (bool, optional): Match fuzzy duplicates, not only identical URIs.
+        duration_tolerance_ms (int, optional): See `find_duplicate_groups`.
+
+    Raises:
+        ValueError: If `keep` is not a known policy.
+    """
+    if keep not in KEEP_POLICIES:
+        raise ValueError(f"Unknown keep policy: {keep}")
+
+    dropped = set()
+    for group in find_duplicate_groups(tracks, fuzzy, duration_tolerance_ms):
+        kept = _choose(tracks, group, keep)
+        dropped.update(index for index in group if index != kept)
+    return [track for index, track in enumerate(tracks)
+            if index not in dropped and track.get("uri")]
@@ -0,0 +1,276 @@
+"""Background jobs for long-running playlist operations.
+
+Sorting or deduplicating a large playlist can take tens of seconds. The
+`JobManager` runs such operations on a bounded worker pool and keeps a
+small progress record per job that HTTP handlers can poll or stream.
+
+A job runs in the worker that accepted it, but its polls may reach any
+gunicorn worker. Given a `SQLiteJobStore`, every change of a job is also
+written to a SQLite file shared by the workers of a host, and the other
+workers serve the job from there.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+FINISHED_STATUSES = ("done", "failed")
+# Seconds between reads of the store while waiting for a job another worker runs.
+STORE_POLL_INTERVAL = 0.25
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class Job:
+    """Progress record of a single background operation."""
+
+    def __init__(self, kind: str, owner=None):
+        self.id = str(uuid4())
+        self.kind = kind
+        self.owner = owner
+        self.status = "queued"
+        self.phase = "queued"
+        self.pages_fetched = 0
+        self.batches_written = 0
+        self.items_total = None
+        self.items_done = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0
+
+    @classmethod
+    def from_dict(cls, data: dict, owner, version: int):
+        """Rebuild a job from its `to_dict()` record, e.g. one read from a job store."""
+        job = cls(data["kind"], owner=owner)
+        for name, value in data.items():
+            setattr(job, name, value)
+        job.version = version
+        return job
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "phase": self.phase,
+            "pages_fetched": self.pages_fetched,
+            "batches_written": self.batches_written,
+            "items_total": self.items_total,
+            "items_done": self.items_done,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite file shared by all workers on a host."""
+
+    def __init__(self, path: str):
+        """Initialize the store and create its table if needed.
+
+        Args:
+            path (str): Database file path.
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, owner TEXT, data TEXT NOT NULL, version INTEGER NOT NULL, "
+                "finished INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished, updated_at)")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads, nor with
+        # the workers a preloading gunicorn master forks after creating the store.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put(self, data: dict, owner, version: int):
+        """Store a job record, unless a newer version of it is stored already."""
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, data, version, finished, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, version = excluded.version, "
+                "finished = excluded.finished, updated_at = excluded.updated_at "
+                "WHERE excluded.version > jobs.version",
+                (data["id"], owner, json.dumps(data), version,
+                 data["status"] in FINISHED_STATUSES, data["updated_at"]),
+            )
+
+    def get(self, job_id: str):
+        """Return the stored job, or None."""
+        row = self._connection().execute(
+            "SELECT data, owner, version FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job.from_dict(json.loads(row[0]), row[1], row[2]) if row else None
+
+    def prune(self, cutoff: float, max_finished: int):
+        """Delete finished jobs last updated before `cutoff` and all but the newest `max_finished`."""
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE finished AND (updated_at < ? OR id NOT IN ("
+                "SELECT id FROM jobs WHERE finished ORDER BY updated_at DESC LIMIT ?))",
+                (cutoff, max_finished),
+            )
+
+
+class JobManager:
+    """Run callables on a bounded thread pool and track their progress."""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, retention: float = 3600.0,
+                 max_finished: int = 1000, store=None):
+        """Initialize the job manager.
+
+        Args:
+            max_workers (int): Number of jobs executed at the same time.
+            max_pending (int): Maximum number of unfinished jobs accepted.
+            retention (float): Seconds a finished job stays queryable.
+            max_finished (int): Maximum number of finished jobs kept; the
+                oldest are forgotten first.
+            store (SQLiteJobStore, optional): Store that makes jobs visible to
+                the other workers of the host.
+        """
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_finished = max_finished
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="playlistsmith-job")
+        self._jobs: dict[str, Job] = {}
+        self._changed = threading.Condition()
+
+    def submit(self, kind: str, func, owner=None):
+        """Queue `func(report)` as a new job and return it.
+
+        `func` receives a `report(phase, **counters)` callable to publish
+        progress; its return value becomes the job result.
+
+        Raises:
+            JobQueueFullError: If `max_pending` unfinished jobs already exist.
+        """
+        with self._changed:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                raise JobQueueFullError("Too many jobs in progress")
+            job = Job(kind, owner=owner)
+            self._jobs[job.id] = job
+            record = job.to_dict()
+
+        if self.store is not None:
+            self.store.prune(time.time() - self.retention, self.max_finished)
+            self.store.put(record, owner, job.version)
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str):
+        """Return the job with the given id, or None.
+
+        Jobs of other workers are read from the store; the returned job is a
+        snapshot that `wait_for_change` keeps up to date.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.get(job_id)
+        return job
+
+    def update(self, job: Job, **fields):
+        """Update job fields and wake up anyone waiting for changes."""
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            job.version += 1
+            record, version = job.to_dict(), job.version
+            self._changed.notify_all()
+        if self.store is not None:
+            self.store.put(record, job.owner, version)
+
+    def wait_for_change(self, job: Job, version: int, timeout: float = 15.0):
+        """Block until the job changes past `version` or `timeout` elapses.
+
+        The returned dict is read together with the version, so its status
+        tells whether the job has finished.
+
+        Returns:
+            tuple | None: The job as a dict and its new version, or None if
+            nothing changed.
+        """
+        with self._changed:
+            if self.store is None or self._jobs.get(job.id) is job:
+                self._changed.wait_for(lambda: job.version > version, timeout=timeout)
+                if job.version <= version:
+                    return None
+                return job.to_dict(), job.version
+
+        # Run by another worker: follow its record in the store.
+        deadline = time.monotonic() + timeout
+        while True:
+            stored = self.store.get(job.id)
+            if stored is not None and stored.version > version:
+                job.__dict__.update(stored.__dict__)
+                return stored.to_dict(), stored.version
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(STORE_POLL_INTERVAL, remaining))
+
+    def _run(self, job: Job, func):
+        self.update(job, status="running", phase="starting")
+
+        def report(phase, **counters):
+            self.update(job, phase=phase, **counters)
+
+        try:
+            result = func(report)
+        except Exception as exc:
+            self.update(job, status="failed", phase="failed", error=str(exc))
+        else:
+            self.update(job, status="done", phase="done", result=result)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        finished = sorted((job for job in self._jobs.values() if job.finished),
+                          key=lambda job: job.updated_at)
+        excess = len(finished) - self.max_finished
+        for index, job in enumerate(finished):
+            if index < excess or job.updated_at < cutoff:
+                del self._jobs[job.id]
+
+
+def create_job_store(url: str = ""):
+    """Build a job store from a URL, or return None when `url` is empty.
+
+    Args:
+        url (str): `sqlite:///relative.db` / `sqlite:////absolute.db`, or "" to
+            keep jobs in process memory only.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported job store URL: {url}")
@@ -0,0 +1,405 @@
+"""Serialize writes to a playlist and coalesce identical in-flight requests.
+
+Two overlapping sorts of one playlist would each fetch every track and then
+interleave their replace, add and reorder calls, which wastes calls and can
+leave the playlist in neither order. `PlaylistLocks` gives every playlist a
+first-come, first-served mutation lock, so a playlist never has two writers
+in this process. Given a `lock_dir`, the writer of each process also holds an
+exclusive `fcntl` lock on a file named after the playlist, so the gunicorn
+workers of a host never write one playlist at the same time either:
+
+- An identical request (same playlist and key, e.g. a double-click) joins the
+  call already in flight and shares its result instead of running again.
+- A different request queues behind the running one.
+- A queued request from an owner is superseded, and fails with
+  `PlaylistSupersededError`, when the same owner queues a newer request for
+  that playlist; only the latest wish of each user waits for its turn. The
+  running call is never interrupted, since stopping it between write batches
+  would leave the playlist half rewritten.
+
+Coalescing and superseding only see the requests of one process; across
+workers, mutations of a playlist queue for the lock file until
+`wait_timeout`. `run` serves threads and `arun` coroutines; both share the
+same locks. Coroutines wait on their event loop, for an `asyncio.Event` or by
+polling the lock file, so queued requests never hold a worker thread that the
+running one needs.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+
+def _wake(waiters):
+    """Set the `(loop, asyncio.Event)` pairs of waiting coroutines from any thread."""
+    for loop, event in waiters:
+        loop.call_soon_threadsafe(event.set)
+
+
+class PlaylistBusyError(RuntimeError):
+    """Raised when a mutation could not get its turn on the playlist."""
+
+
+class PlaylistSupersededError(PlaylistBusyError):
+    """Raised for a queued mutation replaced by a newer request of the same owner."""
+
+
+class _Call:
+    """One in-flight operation, shared with identical requests."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = []
+        self.result = None
+        self.error = None
+
+    def finish(self):
+        self.done.set()
+        _wake(self.waiters)
+
+
+class _Queue:
+    """Tickets of the mutations waiting for, or holding, one playlist."""
+
+    def __init__(self, lock):
+        self.turn = threading.Condition(lock)
+        self.next_ticket = 0
+        self.serving = 0
+        self.abandoned = set()
+        self.latest = {}
+        self.users = 0
+        self.waiters = set()
+
+    def notify(self):
+        """Wake every waiter, thread or coroutine, to check whose turn it is."""
+        self.turn.notify_all()
+        _wake(self.waiters)
+
+
+class _LockFiles:
+    """Exclusive `fcntl` locks on one file per playlist, held across processes.
+
+    A process takes the file of a playlist only while it holds its own turn on
+    that playlist, so each file is locked by at most one thread per process.
+    The files are never deleted: unlinking a lock file another process is
+    waiting on would let a third one lock a new file of the same name.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._held = {}
+
+    def acquire(self, playlist_id: str, timeout: float, blocking: bool = True) -> bool:
+        """Lock the playlist's file, polling until `timeout`; False if it stayed locked."""
+        import fcntl
+
+        name = hashlib.sha256(playlist_id.encode()).hexdigest()[:32] + ".lock"
+        fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not blocking or time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                delay = min(delay * 2, 0.1)
+            else:
+                self._held[playlist_id] = fd
+                return True
+
+    def release(self, playlist_id: str):
+        # Closing the descriptor drops its lock.
+        os.close(self._held.pop(playlist_id))
+
+
+class PlaylistLocks:
+    """Per-playlist mutation locks with single-flight coalescing. Thread-safe."""
+
+    def __init__(self, wait_timeout: float = 120.0, lock_dir: str | None = None):
+        """Initialize the locks.
+
+        Args:
+            wait_timeout (float): Seconds a mutation waits for its turn before
+                failing with `PlaylistBusyError`.
+            lock_dir (str, optional): Directory of the per-playlist lock files
+                shared by the processes of a host. Without it, mutations are
+                only serialized within this process.
+        """
+        self.wait_timeout = wait_timeout
+        self._files = _LockFiles(lock_dir) if lock_dir else None
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._calls = {}
+        self.runs = 0
+        self.coalesced = 0
+        self.queued = 0
+        self.superseded = 0
+        self.timeouts = 0
+        self.process_waits = 0
+
+    def run(self, playlist_id: str, func, key=None, owner=None, exclusive: bool = True):
+        """Run `func()` for a playlist and return its result.
+
+        Args:
+            playlist_id (str): Playlist the operation reads or writes.
+            func (callable): The operation.
+            key (hashable, optional): Identity of the request. A call with the
+                same playlist and key as one in flight waits for that call and
+                returns its result (or raises its error) instead of running.
+            owner (hashable, optional): Who asked, e.g. the session id. A newer
+                mutation of the same owner supersedes this one while it waits.
+            exclusive (bool, optional): Take the playlist's mutation lock. Pass
+                False for read-only operations such as dry runs.
+
+        Raises:
+            PlaylistBusyError: The playlist stayed locked for `wait_timeout`.
+            PlaylistSupersededError: A newer request of `owner` replaced this one.
+        """
+        if key is None:
+            return self._run(playlist_id, func, owner, exclusive)
+
+        call_key = (playlist_id, key)
+        with self._lock:
+            call = self._calls.get(call_key)
+            leader = call is None
+            if leader:
+                call = self._calls[call_key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(playlist_id, func, owner, exclusive)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[call_key]
+            call.finish()
+
+    async def arun(self, playlist_id: str, func, key=None, owner=None, exclusive: bool = True):
+        """Await `func()`, a coroutine function, with the semantics of `run`.
+
+        Waiting for a busy playlist, or for the identical call in flight,
+        happens on the event loop without taking a worker thread.
+        """
+        if key is None:
+            return await self._arun(playlist_id, func, owner, exclusive)
+
+        call_key = (playlist_id, key)
+        with self._lock:
+            call = self._calls.get(call_key)
+            leader = call is None
+            if leader:
+                call = self._calls[call_key] = _Call()
+            else:
+                self.coalesced += 1
+                # Registered while the call is in flight, so its `finish` sees this waiter.
+                done = asyncio.Event()
+                call.waiters.append((asyncio.get_running_loop(), done))
+
+        if not leader:
+            await done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = await self._arun(playlist_id, func, owner, exclusive)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[call_key]
+            call.finish()
+
+    async def _arun(self, playlist_id: str, func, owner, exclusive: bool):
+        if not exclusive:
+            return await func()
+        await self._aacquire(playlist_id, owner)
+        try:
+            await self._alock_file(playlist_id)
+            try:
+                return await func()
+            finally:
+                self._unlock_file(playlist_id)
+        finally:
+            self._release(playlist_id)
+
+    def _run(self, playlist_id: str, func, owner, exclusive: bool):
+        if not exclusive:
+            return func()
+        self._acquire(playlist_id, owner)
+        try:
+            self._lock_file(playlist_id)
+            try:
+                return func()
+            finally:
+                self._unlock_file(playlist_id)
+        finally:
+            self._release(playlist_id)
+
+    def _lock_file(self, playlist_id: str, blocking: bool = True) -> bool:
+        """Wait for other processes to finish writing the playlist, once this process' turn came.
+
+        Returns False when the file is locked and `blocking` is False.
+
+        Raises:
+            PlaylistBusyError: Another process kept the playlist for `wait_timeout`.
+        """
+        if self._files is None or self._files.acquire(playlist_id, 0, blocking=False):
+            return True
+        if not blocking:
+            return False
+        with self._lock:
+            self.process_waits += 1
+        if self._files.acquire(playlist_id, self.wait_timeout):
+            return True
+        with self._lock:
+            self.timeouts += 1
+        raise PlaylistBusyError("Playlist is busy with another operation")
+
+    async def _alock_file(self, playlist_id: str):
+        """Like `_lock_file`, but poll the lock file with `asyncio.sleep` between tries."""
+        if self._lock_file(playlist_id, blocking=False):
+            return
+        with self._lock:
+            self.process_waits += 1
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, 0.1)
+            if self._files.acquire(playlist_id, 0, blocking=False):
+                return
+        with self._lock:
+            self.timeouts += 1
+        raise PlaylistBusyError("Playlist is busy with another operation")
+
+    def _unlock_file(self, playlist_id: str):
+        if self._files is not None:
+            self._files.release(playlist_id)
+
+    def _acquire(self, playlist_id: str, owner, blocking: bool = True):
+        """Wait for the playlist's turn.
+
+        Returns False without queueing when the playlist is taken and `blocking` is False.
+        """
+        with self._lock:
+            entry = self._enqueue(playlist_id, owner, blocking)
+            if entry is None:
+                return False
+            queue, ticket = entry
+            queue.turn.wait_for(lambda: self._decided(queue, ticket, owner), timeout=self.wait_timeout)
+            return self._settle(playlist_id, queue, ticket, owner)
+
+    async def _aacquire(self, playlist_id: str, owner):
+        """Await the playlist's turn, woken through an `asyncio.Event` instead of a thread."""
+        deadline = time.monotonic() + self.wait_timeout
+        woken = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), woken)
+        with self._lock:
+            queue, ticket = self._enqueue(playlist_id, owner)
+            queue.waiters.add(waiter)
+        try:
+            while True:
+                with self._lock:
+                    woken.clear()
+                    if self._decided(queue, ticket, owner) or time.monotonic() >= deadline:
+                        return self._settle(playlist_id, queue, ticket, owner)
+                try:
+                    await asyncio.wait_for(woken.wait(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                queue.waiters.discard(waiter)
+
+    def _enqueue(self, playlist_id: str, owner, blocking: bool = True):
+        """Take a ticket for the playlist and return `(queue, ticket)`; call with `_lock` held.
+
+        Returns None without queueing when the playlist is taken and `blocking` is False.
+        """
+        queue = self._queues.get(playlist_id)
+        if queue is None:
+            queue = self._queues[playlist_id] = _Queue(self._lock)
+        elif not blocking:
+            return None
+        queue.users += 1
+        ticket = queue.next_ticket
+        queue.next_ticket += 1
+        if owner is not None:
+            queue.latest[owner] = ticket
+            # Wake an older waiter of this owner so it notices it was superseded.
+            queue.notify()
+        if ticket != queue.serving:
+            self.queued += 1
+        return queue, ticket
+
+    @staticmethod
+    def _superseded(queue: _Queue, ticket: int, owner) -> bool:
+        return owner is not None and queue.latest.get(owner) != ticket
+
+    def _decided(self, queue: _Queue, ticket: int, owner) -> bool:
+        return ticket == queue.serving or self._superseded(queue, ticket, owner)
+
+    def _settle(self, playlist_id: str, queue: _Queue, ticket: int, owner) -> bool:
+        """Take the turn the waiter got, or give its ticket up and raise; call with `_lock` held."""
+        if ticket == queue.serving and not self._superseded(queue, ticket, owner):
+            self.runs += 1
+            return True
+
+        queue.abandoned.add(ticket)
+        self._advance(queue)
+        self._leave(playlist_id, queue)
+        if self._superseded(queue, ticket, owner):
+            self.superseded += 1
+            raise PlaylistSupersededError("Superseded by a newer request for this playlist")
+        self.timeouts += 1
+        raise PlaylistBusyError("Playlist is busy with another operation")
+
+    def _release(self, playlist_id: str):
+        with self._lock:
+            queue = self._queues[playlist_id]
+            queue.serving += 1
+            self._advance(queue)
+            self._leave(playlist_id, queue)
+
+    def _advance(self, queue: _Queue):
+        """Skip abandoned tickets and wake the waiters to check whose turn it is."""
+        while queue.serving in queue.abandoned:
+            queue.abandoned.discard(queue.serving)
+            queue.serving += 1
+        queue.notify()
+
+    def _leave(self, playlist_id: str, queue: _Queue):
+        queue.users -= 1
+        if queue.users == 0:
+            del self._queues[playlist_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "locked_playlists": len(self._queues),
+                "in_flight": len(self._calls),
+                "runs": self.runs,
+                "coalesced": self.coalesced,
+                "queued": self.queued,
+                "superseded": self.superseded,
+                "timeouts": self.timeouts,
+                "process_waits": self.process_waits,
+            }
@@ -0,0 +1,84 @@
+"""Helpers to list every playlist of the current Spotify user."""
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+PLAYLIST_PAGE_SIZE = 50
+
+
+def fetch_all_playlists(spotify_client, concurrency: int = 4):
+    """Return every playlist of the current user in Spotify's order.
+
+    The first page reveals the total number of playlists; the remaining pages
+    are then requested concurrently through a thread pool bounded by
+    `concurrency`.
+
+    Args:
+        spotify_client: An authenticated Spotify client instance.
+        concurrency (int, optional): Maximum number of pages requested at once.
+
+    Returns:
+        list: The raw playlist objects returned by Spotify.
+    """
+    first = spotify_client.current_user_playlists(limit=PLAYLIST_PAGE_SIZE, offset=0)
+    if not first:
+        return []
+
+    playlists = [p for p in first.get("items", []) if p]
+    total = first.get("total")
+    if not first.get("next") or not isinstance(total, int):
+        return playlists
+
+    def fetch_page(offset):
+        return spotify_client.current_user_playlists(limit=PLAYLIST_PAGE_SIZE, offset=offset)
+
+    offsets = range(PLAYLIST_PAGE_SIZE, total, PLAYLIST_PAGE_SIZE)
+    workers = max(1, min(concurrency, len(offsets)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for page in executor.map(fetch_page, offsets):
+            if not page:
+                break
+            playlists.extend(p for p in page.get("items", []) if p)
+
+    return playlists
+
+
+async def afetch_all_playlists(spotify_client, concurrency: int = 4):
+    """Return every playlist of the current user, awaiting an asyncio client.
+
+    The counterpart of `fetch_all_playlists` for `AsyncSpotifyClient`: after the
+    first page, at most `concurrency` page requests are awaited at once.
+    """
+    first = await spotify_client.current_user_playlists(limit=PLAYLIST_PAGE_SIZE, offset=0)
+    if not first:
+        return []
+
+    playlists = [p for p in first.get("items", []) if p]
+    total = first.get("total")
+    if not first.get("next") or not isinstance(total, int):
+        return playlists
+
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_page(offset):
+        async with slots:
+            return await spotify_client.current_user_playlists(limit=PLAYLIST_PAGE_SIZE, offset=offset)
+
+    pages = await asyncio.gather(*(fetch_page(offset)
+                                   for offset in range(PLAYLIST_PAGE_SIZE, total, PLAYLIST_PAGE_SIZE)))
+    for page in pages:
+        if not page:
+            break
+        playlists.extend(p for p in page.get("items", []) if p)
+
+    return playlists
+
+
+def playlists_etag(playlists, *parts):
+    """Build a weak ETag from playlist ids, their snapshot ids and extra `parts`."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(f"{part}|".encode())
+    for playlist in playlists:
+        digest.update(f"{playlist.get('id')}:{playlist.get('snapshot_id')};".encode())
+    return f'W/"{digest.hexdigest()}"'
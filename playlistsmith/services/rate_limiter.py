@@ -0,0 +1,278 @@
+"""Process-wide scheduling of Spotify Web API calls.
+
+Spotify enforces one rate limit for the whole application. When several
+users sort large playlists at once, uncoordinated calls exhaust it and every
+request starts failing with 429. `RateLimitScheduler` makes all calls of a
+process share a token bucket, pauses them when Spotify answers 429 with
+`Retry-After`, and hands out permits round-robin between sessions so a
+single busy user cannot starve the others. Threads and coroutines share the
+same budget: `call` blocks its thread for a permit, `acall` awaits one.
+
+The bucket and the 429 pause live in process memory. Processes that share
+one Spotify application, e.g. gunicorn workers, each need a scheduler with
+their share of the rate; a 429 only pauses the process that received it.
+"""
+import asyncio
+import inspect
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def _retry_after(exc, default: float):
+    """Return the Retry-After delay of a 429 error, or None for other errors."""
+    if getattr(exc, "http_status", None) != 429:
+        return None
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimitScheduler:
+    """Token-bucket scheduler with 429 back-off and per-session fairness."""
+
+    def __init__(self, rate: float = 15.0, burst: int = 30, max_retries: int = 3,
+                 default_retry_after: float = 1.0, clock=time.monotonic):
+        """Initialize the scheduler.
+
+        Args:
+            rate (float): Calls per second allowed across this scheduler's calls.
+            burst (int): Maximum number of calls that can start back to back.
+            max_retries (int): Times a call is retried after a 429 response.
+            default_retry_after (float): Back-off when a 429 has no Retry-After header.
+            clock (callable, optional): Monotonic time source, for tests.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.default_retry_after = default_retry_after
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = clock()
+        self._throttled_until = 0.0
+        # Waiting calls per session; the first session in the dict goes next.
+        self._queues = OrderedDict()
+        # Wake-up callbacks of coroutines waiting for a permit, by ticket.
+        self._wakers = {}
+        self.calls = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+
+    def call(self, session_id, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` once the session gets a permit.
+
+        Calls that fail with 429 pause every call of this scheduler for the
+        `Retry-After` delay and are retried up to `max_retries` times.
+        """
+        attempt = 0
+        while True:
+            self._acquire(session_id)
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:
+                delay = _retry_after(exc, self.default_retry_after)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._throttle(delay)
+
+    async def acall(self, session_id, coroutine_function, *args, **kwargs):
+        """Await `coroutine_function(*args, **kwargs)` once the session gets a permit.
+
+        The asyncio counterpart of `call`, with the same retries after 429.
+        """
+        attempt = 0
+        while True:
+            await self._acquire_async(session_id)
+            try:
+                return await coroutine_function(*args, **kwargs)
+            except Exception as exc:
+                delay = _retry_after(exc, self.default_retry_after)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._throttle(delay)
+
+    def _acquire(self, session_id):
+        ticket = object()
+        with self._cond:
+            queue = self._enqueue(session_id, ticket)
+            while True:
+                wait = self._try_take(session_id, queue, ticket)
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def _acquire_async(self, session_id):
+        # Coroutines cannot wait on the condition; the scheduler wakes the one
+        # whose ticket reaches the head of the line instead.
+        loop = asyncio.get_running_loop()
+        turn = asyncio.Event()
+        ticket = object()
+        with self._cond:
+            queue = self._enqueue(session_id, ticket)
+            self._wakers[ticket] = lambda: loop.call_soon_threadsafe(turn.set)
+        try:
+            while True:
+                turn.clear()
+                with self._cond:
+                    wait = self._try_take(session_id, queue, ticket)
+                if wait == 0:
+                    return
+                try:
+                    await asyncio.wait_for(turn.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._cond:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[session_id]
+                    self._notify()
+            raise
+        finally:
+            with self._cond:
+                self._wakers.pop(ticket, None)
+
+    def _notify(self):
+        """Wake waiting threads, and the coroutine holding the head ticket if any."""
+        self._cond.notify_all()
+        if self._wakers and self._queues:
+            waker = self._wakers.get(next(iter(self._queues.values()))[0])
+            if waker is not None:
+                waker()
+
+    def _enqueue(self, session_id, ticket):
+        queue = self._queues.setdefault(session_id, deque())
+        queue.append(ticket)
+        return queue
+
+    def _try_take(self, session_id, queue, ticket):
+        """Take a permit for `ticket` if it is its turn and one is available.
+
+        Returns 0 when the permit was taken, the seconds until one can be when
+        `ticket` is next in line, or None while other calls go first.
+        """
+        if next(iter(self._queues)) != session_id or queue[0] is not ticket:
+            return None
+        now = self._clock()
+        self._refill(now)
+        wait = self._throttled_until - now
+        if wait > 0:
+            return wait
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self.calls += 1
+        queue.popleft()
+        if queue:
+            self._queues.move_to_end(session_id)
+        else:
+            del self._queues[session_id]
+        self._notify()
+        return 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._refilled_at = now
+
+    def _throttle(self, delay: float):
+        with self._cond:
+            now = self._clock()
+            until = now + delay
+            if until > self._throttled_until:
+                self.throttle_seconds += until - max(self._throttled_until, now)
+                self._throttled_until = until
+            self.throttled += 1
+            self._notify()
+
+    def stats(self):
+        """Return queue depth and throttling counters."""
+        with self._cond:
+            return {
+                "queue_depth": sum(len(queue) for queue in self._queues.values()),
+                "queued_sessions": len(self._queues),
+                "calls": self.calls,
+                "throttled_responses": self.throttled,
+                "throttle_seconds": self.throttle_seconds,
+                "throttle_remaining": max(self._throttled_until - self._clock(), 0.0),
+            }
+
+
+class ScheduledSpotifyClient:
+    """Proxy that sends every method call of a Spotify client through a scheduler.
+
+    Coroutine methods, such as those of `AsyncSpotifyClient`, are scheduled
+    with `RateLimitScheduler.acall` and stay awaitable.
+    """
+
+    def __init__(self, client, scheduler: RateLimitScheduler, session_id, observer=None):
+        """Initialize the proxy.
+
+        Args:
+            client: The Spotify client to wrap.
+            scheduler (RateLimitScheduler): Scheduler every call goes through.
+            session_id: Key used for fairness between sessions.
+            observer (callable, optional): Called as `observer(method, seconds, error)`
+                after every attempt, excluding the time spent waiting for a permit.
+        """
+        self._client = client
+        self._scheduler = scheduler
+        self._session_id = session_id
+        self._observer = observer
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+        if inspect.iscoroutinefunction(attribute):
+            return self._scheduled_coroutine(name, attribute)
+
+        observer = self._observer
+        if observer is not None:
+            call = attribute
+
+            def attribute(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = call(*args, **kwargs)
+                except Exception as exc:
+                    observer(name, time.perf_counter() - started, exc)
+                    raise
+                observer(name, time.perf_counter() - started, None)
+                return result
+
+        def scheduled(*args, **kwargs):
+            return self._scheduler.call(self._session_id, attribute, *args, **kwargs)
+
+        scheduled.__name__ = name
+        return scheduled
+
+    def _scheduled_coroutine(self, name, attribute):
+        observer = self._observer
+        if observer is not None:
+            call = attribute
+
+            async def attribute(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await call(*args, **kwargs)
+                except Exception as exc:
+                    observer(name, time.perf_counter() - started, exc)
+                    raise
+                observer(name, time.perf_counter() - started, None)
+                return result
+
+        async def scheduled(*args, **kwargs):
+            return await self._scheduler.acall(self._session_id, attribute, *args, **kwargs)
+
+        scheduled.__name__ = name
+        return scheduled
@@ -0,0 +1,149 @@
+"""Plan minimal playlist reorders.
+
+Spotify's `playlist_reorder_items` moves one contiguous range of tracks per
+call. Given the current and target order of a playlist, the functions here
+keep the longest increasing subsequence of tracks in place and compute the
+range moves needed to bring the remaining tracks into position. The caller
+compares the result with the cost of a full replace-then-append rewrite.
+
+Playlist items without a track (removed or unavailable songs) still take a
+position in the live playlist. They appear as None in the current order and
+stay where they are, so the planned indices match the live playlist.
+"""
+from bisect import bisect_left
+
+REWRITE_BATCH_SIZE = 100
+
+
+def full_rewrite_calls(track_count: int) -> int:
+    """Return the number of API calls a replace-then-append rewrite needs."""
+    if track_count <= 0:
+        return 0
+    return (track_count + REWRITE_BATCH_SIZE - 1) // REWRITE_BATCH_SIZE
+
+
+def _occurrence_keys(uris):
+    """Tag each URI with its occurrence number so repeated tracks stay distinct."""
+    seen = {}
+    keys = []
+    for uri in uris:
+        count = seen.get(uri, 0)
+        seen[uri] = count + 1
+        keys.append((uri, count))
+    return keys
+
+
+def _longest_increasing_subsequence(sequence):
+    """Return the set of indices forming one longest increasing subsequence."""
+    tails = []
+    tail_indices = []
+    previous = [-1] * len(sequence)
+
+    for index, value in enumerate(sequence):
+        position = bisect_left(tails, value)
+        if position > 0:
+            previous[index] = tail_indices[position - 1]
+        if position == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[position] = value
+            tail_indices[position] = index
+
+    kept = set()
+    index = tail_indices[-1] if tail_indices else -1
+    while index != -1:
+        kept.add(index)
+        index = previous[index]
+    return kept
+
+
+def plan_reorder_moves(current_uris: list, target_uris: list, max_moves=None):
+    """Compute the range moves that turn `current_uris` into `target_uris`.
+
+    Args:
+        current_uris (list): Track URIs in their current playlist order, with
+            None at the positions of items without a track.
+        target_uris (list): The same URIs in the desired order, without None;
+            the items without a track keep their positions.
+        max_moves (int, optional): Stop planning and return None as soon as
+            more moves than this would be needed.
+
+    Returns:
+        list | None: A list of `(range_start, insert_before, range_length)`
+        tuples to apply in order, or None if the target is not a permutation
+        of the current playlist or the plan exceeds `max_moves`.
+    """
+    gaps = current_uris.count(None)
+    if len(current_uris) - gaps != len(target_uris):
+        return None
+    if gaps:
+        fill = iter(target_uris)
+        target_uris = [None if uri is None else next(fill) for uri in current_uris]
+
+    current_keys = _occurrence_keys(current_uris)
+    target_keys = _occurrence_keys(target_uris)
+    target_position = {key: index for index, key in enumerate(target_keys)}
+    if len(target_position) != len(current_keys) or any(
+            key not in target_position for key in current_keys):
+        return None
+
+    # Tracks on the longest increasing subsequence never have to move.
+    sequence = [target_position[key] for key in current_keys]
+    anchored = {sequence[i] for i in _longest_increasing_subsequence(sequence)}
+
+    work = list(sequence)
+    moves = []
+    step = 0
+    total = len(work)
+    while step < total:
+        if step in anchored:
+            step += 1
+            continue
+
+        start = work.index(step)
+        insert_before = work.index(step - 1) + 1 if step > 0 else 0
+
+        # Grow the range while the following target tracks already sit next
+        # to this one in the working order.
+        length = 1
+        while (step + length < total
+               and step + length not in anchored
+               and start + length < total
+               and work[start + length] == step + length):
+            length += 1
+
+        if insert_before != start:
+            if max_moves is not None and len(moves) >= max_moves:
+                return None
+            moves.append((start, insert_before, length))
+            chunk = work[start:start + length]
+            del work[start:start + length]
+            if insert_before > start:
+                insert_before -= length
+            work[insert_before:insert_before] = chunk
+        step += length
+
+    return moves
+
+
+def removed_ranges(current_uris: list, target_uris: list):
+    """Return the runs of current positions whose tracks are not in the target.
+
+    Repeated URIs are matched by occurrence, so when the target keeps the
+    first copy of a track the later copies are reported as removed. Items
+    without a track (None) are removed by a rewrite.
+
+    Returns:
+        list: `(start, length)` tuples in ascending position order.
+    """
+    kept = set(_occurrence_keys(target_uris))
+    ranges = []
+    for position, key in enumerate(_occurrence_keys(current_uris)):
+        if key in kept:
+            continue
+        if ranges and ranges[-1][0] + ranges[-1][1] == position:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((position, 1))
+    return ranges
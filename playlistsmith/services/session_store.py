@@ -0,0 +1,218 @@
+"""Server-side storage for Spotify OAuth sessions.
+
+The API keeps each user's token info under a random session id that is sent
+to the browser as an HTTP-only cookie. Two backends implement the same small
+interface:
+
+- `MemorySessionStore` keeps sessions in process memory with a TTL and a
+  size cap. It is only suitable for a single server process.
+- `SQLiteSessionStore` keeps sessions in a local SQLite database so every
+  gunicorn worker on the host sees the same sessions.
+
+`create_session_store` picks a backend from a URL such as `memory://` or
+`sqlite:////var/lib/playlistsmith/sessions.db`.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class SessionStore(ABC):
+    """Interface shared by the session backends."""
+
+    @abstractmethod
+    def get(self, session_id: str):
+        """Return the token info stored for `session_id`, or None if unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, session_id: str, token_info: dict):
+        """Store or replace the token info of a session and renew its TTL."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace(self, session_id: str, token_info: dict) -> bool:
+        """Replace the token info of a live session and renew its TTL.
+
+        Returns False, storing nothing, if the session is unknown or expired.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Forget a session. Unknown ids are ignored."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self):
+        """Return the number of live sessions."""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process session store with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, ttl: float = 3600.0, max_sessions: int = 10_000,
+                 sweep_interval: float = 60.0, clock=time.time):
+        """Initialize the store.
+
+        Args:
+            ttl (float): Seconds a session lives after it was last written.
+            max_sessions (int): Maximum number of sessions kept in memory.
+            sweep_interval (float): Minimum seconds between expiry sweeps.
+            clock (callable, optional): Time source, for tests.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, token_info = entry
+            if expires_at <= self._clock():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return dict(token_info)
+
+    def set(self, session_id: str, token_info: dict):
+        with self._lock:
+            now = self._clock()
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (now + self.ttl, dict(token_info))
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def replace(self, session_id: str, token_info: dict) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            now = self._clock()
+            if entry is None or entry[0] <= now:
+                return False
+            self._sessions[session_id] = (now + self.ttl, dict(token_info))
+            self._sessions.move_to_end(session_id)
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(self._clock())
+            return len(self._sessions)
+
+    def _sweep(self, now: float):
+        expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]
+        for session_id in expired:
+            del self._sessions[session_id]
+        self._last_sweep = now
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store backed by a SQLite file shared by all workers on a host."""
+
+    def __init__(self, path: str, ttl: float = 3600.0, sweep_interval: float = 60.0,
+                 clock=time.time):
+        """Initialize the store and create its table if needed.
+
+        Args:
+            path (str): Database file path.
+            ttl (float): Seconds a session lives after it was last written.
+            sweep_interval (float): Minimum seconds between expiry sweeps.
+            clock (callable, optional): Time source, for tests.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, token_info TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads, nor with
+        # the workers a preloading gunicorn master forks after creating the store.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id: str):
+        row = self._connection().execute(
+            "SELECT token_info FROM sessions WHERE id = ? AND expires_at > ?",
+            (session_id, self._clock()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, session_id: str, token_info: dict):
+        now = self._clock()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, token_info, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET token_info = excluded.token_info, "
+                "expires_at = excluded.expires_at",
+                (session_id, json.dumps(token_info), now + self.ttl),
+            )
+            if now - self._last_sweep >= self.sweep_interval:
+                conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                self._last_sweep = now
+
+    def replace(self, session_id: str, token_info: dict) -> bool:
+        now = self._clock()
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE sessions SET token_info = ?, expires_at = ? WHERE id = ? AND expires_at > ?",
+                (json.dumps(token_info), now + self.ttl, session_id, now),
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, session_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (self._clock(),)
+        ).fetchone()
+        return row[0]
+
+
+def create_session_store(url: str = "memory://", ttl: float = 3600.0, max_sessions: int = 10_000):
+    """Build a session store from a URL.
+
+    Args:
+        url (str): `memory://` or `sqlite:///relative.db` / `sqlite:////absolute.db`.
+        ttl (float): Seconds a session lives after it was last written.
+        max_sessions (int): Size cap of the in-memory backend.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    if url in ("", "memory", "memory://"):
+        return MemorySessionStore(ttl=ttl, max_sessions=max_sessions)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], ttl=ttl)
+    raise ValueError(f"Unsupported session store URL: {url}")
@@ -0,0 +1,136 @@
+"""Seeded shuffle that keeps tracks of the same artist apart.
+
+A uniform shuffle often plays an artist twice in a row, and retrying until
+no artist repeats gets very slow on playlists with thousands of tracks or
+one dominant artist. `artist_spread_order` builds the order in one
+O(n log n) pass instead:
+
+1. Every artist's tracks are shuffled and given target positions spread
+   evenly over the playlist, starting at a random offset and slightly
+   jittered, so an artist with m tracks comes back about every n/m tracks.
+2. The positions are filled one at a time from a heap, always with the
+   artist whose next target is earliest. An artist that was just played
+   waits `gap` positions in a cooldown queue before it is a candidate again.
+3. `gap` is `min_gap`, or the largest gap the playlist allows if that is
+   smaller: with c tracks by the most frequent artist(s), k of them, n
+   tracks need (c - 1) * gap + k <= n. Whenever the remaining positions
+   are exactly enough for the most frequent remaining artists, one of them
+   is placed first, so that gap is always met.
+
+The same seed gives the same order for the same playlist.
+"""
+import heapq
+import random
+from collections import deque
+
+# Positions between two tracks of the same artist, i.e. at least 4 other tracks in between.
+DEFAULT_MIN_GAP = 5
+# Random shift of each target position, as a share of the artist's spacing.
+JITTER = 0.15
+
+
+def new_seed() -> int:
+    """Return a random seed for `artist_spread_order`."""
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def max_artist_gap(artist_keys) -> int:
+    """Return the largest gap every artist of `artist_keys` can keep, or 0 if unbounded."""
+    counts = {}
+    for key in artist_keys:
+        counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return 0
+    most = max(counts.values())
+    if most < 2:
+        return 0
+    ties = sum(1 for count in counts.values() if count == most)
+    return (len(artist_keys) - ties) // (most - 1)
+
+
+def artist_spread_order(artist_keys, seed: int, min_gap: int = DEFAULT_MIN_GAP):
+    """Return a shuffled order of rows that keeps rows with the same key apart.
+
+    Args:
+        artist_keys (list): The artist key of every row, e.g. `TrackTable.artist_keys`.
+        seed (int): Seed of the shuffle; the same seed gives the same order.
+        min_gap (int): Wanted distance between two rows of the same artist.
+            1 allows the same artist twice in a row.
+
+    Returns:
+        tuple: The row indices in shuffled order, and the gap that was
+        guaranteed (`min_gap`, or less if the rows do not allow it).
+    """
+    rng = random.Random(seed)
+    groups = {}
+    for row, key in enumerate(artist_keys):
+        groups.setdefault(key, []).append(row)
+
+    total = len(artist_keys)
+    limit = max_artist_gap(artist_keys)
+    gap = max(1, min(min_gap, limit) if limit else min_gap)
+
+    rows = list(groups.values())
+    targets = []
+    for artist_rows in rows:
+        rng.shuffle(artist_rows)
+        count = len(artist_rows)
+        offset = rng.random()
+        spacing = total / count
+        targets.append([(index + offset + rng.uniform(-JITTER, JITTER)) * spacing
+                        for index in range(count)])
+
+    remaining = [len(artist_rows) for artist_rows in rows]
+    artists_with = {}
+    for count in remaining:
+        artists_with[count] = artists_with.get(count, 0) + 1
+    most = max(remaining, default=0)
+
+    # Ready artists by next target and by remaining tracks; entries of an
+    # artist that has been placed since are skipped (`ticket` changed).
+    by_target = []
+    by_remaining = []
+    ticket = [0] * len(rows)
+    cooling = deque()
+
+    def make_ready(artist):
+        ticket[artist] += 1
+        placed = len(rows[artist]) - remaining[artist]
+        heapq.heappush(by_target, (targets[artist][placed], artist, ticket[artist]))
+        heapq.heappush(by_remaining, (-remaining[artist], targets[artist][placed], artist, ticket[artist]))
+
+    def pop_valid(heap):
+        while heap and heap[0][-1] != ticket[heap[0][-2]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    for artist in range(len(rows)):
+        make_ready(artist)
+
+    order = []
+    for position in range(total):
+        while cooling and cooling[0][0] <= position:
+            make_ready(cooling.popleft()[1])
+
+        while most and not artists_with.get(most):
+            most -= 1
+        artist = None
+        if most > 1 and (most - 1) * gap + artists_with[most] >= total - position:
+            # Only just enough positions left for the most frequent artists: place one now.
+            top = pop_valid(by_remaining)
+            if top is not None and -top[0] == most:
+                artist = top[-2]
+        if artist is None:
+            top = pop_valid(by_target)
+            # Every artist left is cooling down: the one waiting longest plays early.
+            artist = top[1] if top is not None else cooling.popleft()[1]
+
+        ticket[artist] += 1
+        count = remaining[artist]
+        order.append(rows[artist][len(rows[artist]) - count])
+        artists_with[count] -= 1
+        artists_with[count - 1] = artists_with.get(count - 1, 0) + 1
+        remaining[artist] = count - 1
+        if count > 1:
+            cooling.append((position + gap, artist))
+    return order, gap
@@ -1,8 +1,24 @@
-class PlaylistSorter:
-    """A class that provides various sorting methods for Spotify playlists.
-    
-    This class handles sorting of tracks in a Spotify playlist based on different criteria
-    such as artist name, release date, duration, and popularity.
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from playlistsmith.services.artists import fetch_artists
+from playlistsmith.services.duplicates import select_unique_tracks
+from playlistsmith.services.reorder_plan import full_rewrite_calls, plan_reorder_moves, removed_ranges
+from playlistsmith.services.shuffle import DEFAULT_MIN_GAP, artist_spread_order, new_seed
+from playlistsmith.services.track_table import SORT_COLUMNS, TrackTable
+from playlistsmith.services.tracing import span
+
+PAGE_SIZE = 100
+TRACK_FIELDS = 'items(track(id,uri,name,artists,album(name,release_date),duration_ms,popularity,external_ids(isrc))),next,total'
+
+
+class PlaylistSorterBase:
+    """State and I/O-free steps shared by `PlaylistSorter` and `AsyncPlaylistSorter`.
+
+    Everything here runs without calling Spotify or the track store: progress
+    reporting, page parsing, cache lookups, write and move planning, dedupe
+    and sorting. Each subclass only implements the calls, blocking or awaited.
     """
 
     @staticmethod
@@ -18,96 +34,607 @@ class PlaylistSorter:
             deduped.append(track)
         return deduped
 
-    def __init__(self, spotify_client, playlist_id: str):
-        """Initialize the PlaylistSorter with Spotify client and playlist ID.
-        
+    def __init__(self, spotify_client, playlist_id: str, fetch_concurrency: int = 4,
+                 track_cache=None, on_progress=None, artist_cache=None, track_store=None):
+        """Initialize the sorter with Spotify client and playlist ID.
+
         Args:
             spotify_client: An authenticated Spotify client instance.
             playlist_id (str): The ID of the playlist to be sorted.
-            
+            fetch_concurrency (int, optional): Maximum number of track pages
+                requested at the same time. 1 disables parallel fetching.
+            track_cache (TrackCache, optional): Shared cache of normalized
+                tracks keyed by playlist snapshot.
+            on_progress (callable, optional): Called as
+                `on_progress(phase, pages_fetched=..., batches_written=...)`
+                whenever the operation advances.
+            artist_cache (ArtistCache, optional): Shared cache of the artist
+                details needed by the "genre" and "artist_followers" keys.
+            track_store (SQLiteTrackStore, optional): On-disk store of
+                normalized tracks read before, and filled after, downloading
+                a playlist snapshot.
+
         Raises:
             ValueError: If the Spotify client is not authenticated.
         """
         self.spotify_client = spotify_client
         self.playlist_id = playlist_id
+        self.fetch_concurrency = max(1, int(fetch_concurrency))
+        self.track_cache = track_cache
+        self.artist_cache = artist_cache
+        self.track_store = track_store
+        self.snapshot_id = None
+        self.on_progress = on_progress
+        self.pages_fetched = 0
+        self.tracks_fetched = 0
+        self.batches_written = 0
         if not self.spotify_client:
             raise ValueError(
                 "Spotify client is not authenticated. Please authenticate first."
             )
 
-    def get_all_tracks(self):
+    def _report(self, phase: str):
+        """Publish the current phase and counters to the progress callback."""
+        if self.on_progress:
+            self.on_progress(phase, pages_fetched=self.pages_fetched,
+                             batches_written=self.batches_written)
+
+    def _page_fetched(self, response):
+        self.pages_fetched += 1
+        self.tracks_fetched += len(response.get('items') or ())
+        self._report("fetching")
+
+    def _batch_written(self):
+        self.batches_written += 1
+        self._report("writing")
+
+    @staticmethod
+    def _extract_tracks(response, start: int = 0):
+        """Return the normalized tracks of one `playlist_items` page.
+
+        Items without a track are skipped; every track keeps its position in
+        the live playlist, counted from `start` (the page's offset).
+        """
+        # Filtrar pistas nulas y extraer solo la información necesaria
+        tracks = []
+        for index, item in enumerate(response['items']):
+            if item and item.get('track'):
+                track = item['track']
+                tracks.append({
+                    'position': start + index,
+                    'id': track.get('id'),
+                    'uri': track.get('uri'),
+                    'name': track.get('name'),
+                    'artists': track.get('artists', []),
+                    'album': track.get('album', {}),
+                    'duration_ms': track.get('duration_ms', 0),
+                    'popularity': track.get('popularity', 0),
+                    'isrc': (track.get('external_ids') or {}).get('isrc'),
+                })
+        return tracks
+
+    @staticmethod
+    def _is_page(response) -> bool:
+        """Return whether a `playlist_items` response carries a page of items."""
+        return bool(response) and 'items' in response
+
+    @staticmethod
+    def _offsets_after(first):
+        """Return the offsets of the pages after the first one, or None when its total is unknown."""
+        total = first.get('total')
+        if not isinstance(total, int):
+            return None
+        return iter(range(PAGE_SIZE, total, PAGE_SIZE))
+
+    def _use_parallel(self, parallel) -> bool:
+        return self.fetch_concurrency > 1 if parallel is None else parallel
+
+    def _stored_pages(self, snapshot_id):
+        """Return an iterator over the stored pages of `snapshot_id`; empty on a miss."""
+        if not snapshot_id:
+            return iter(())
+        return self.track_store.iter_track_pages(self.playlist_id, snapshot_id, PAGE_SIZE)
+
+    def _cached(self, kind: str, snapshot_id):
+        """Return the cached data of `kind` for `snapshot_id`, or None."""
+        if self.track_cache is None:
+            return None
+        cached = self.track_cache.get(self.playlist_id, snapshot_id, kind)
+        if cached is not None:
+            self._report("sorting")
+        return cached
+
+    def _remember(self, kind: str, snapshot_id, data):
+        if self.track_cache is not None:
+            self.track_cache.put(self.playlist_id, snapshot_id, data, kind)
+
+    def _plan_write(self, track_uris: list, current_uris=None):
+        """Return the write stats to fill in and the range moves, or None for a rewrite.
+
+        Invalidates the cached tracks of the playlist when it is going to change.
+        """
+        rewrite_calls = full_rewrite_calls(len(track_uris))
+        stats = {"strategy": "noop", "api_calls": 0,
+                 "rewrite_calls": rewrite_calls, "calls_saved": rewrite_calls,
+                 "removed_without_track": 0}
+        if not track_uris:
+            return stats, []
+
+        moves = None
+        if current_uris is not None:
+            with span("plan"):
+                moves = plan_reorder_moves(current_uris, track_uris, max_moves=rewrite_calls)
+            if moves is None:
+                stats["removed_without_track"] = current_uris.count(None)
+
+        if moves != [] and self.track_cache is not None:
+            self.track_cache.invalidate(self.playlist_id)
+        return stats, moves
+
+    def _write_calls(self, track_uris: list, moves):
+        """Yield the client method name and arguments of each call writing `track_uris`.
+
+        Range moves are chained to the previous `snapshot_id`: each move is
+        generated after `_written` recorded the response of the one before.
+        Without moves, the playlist is replaced and then extended in batches of 100.
+        """
+        if moves is not None:
+            for range_start, insert_before, range_length in moves:
+                yield "playlist_reorder_items", {
+                    "range_start": range_start,
+                    "insert_before": insert_before,
+                    "range_length": range_length,
+                    "snapshot_id": self.snapshot_id,
+                }
+            return
+        for index in range(0, len(track_uris), 100):
+            method = "playlist_replace_items" if index == 0 else "playlist_add_items"
+            yield method, {"items": track_uris[index: index + 100]}
+
+    def _written(self, response):
+        """Record the response of one write call."""
+        self.snapshot_id = (response or {}).get("snapshot_id")
+        self._batch_written()
+
+    @staticmethod
+    def _write_stats(stats: dict, moves):
+        """Complete the stats of `_plan_write` once the moves or the rewrite are written."""
+        if moves is None:
+            stats["strategy"] = "rewrite"
+            api_calls = stats["rewrite_calls"]
+        else:
+            if moves:
+                stats["strategy"] = "moves"
+            api_calls = len(moves)
+        stats["api_calls"] = api_calls
+        stats["calls_saved"] = stats["rewrite_calls"] - api_calls
+        return stats
+
+    def preview_reorder(self, track_uris: list, current_uris: list):
+        """Describe what `reorder_playlist_in_batches` would write, without writing.
+
+        Args:
+            track_uris (list): Track URIs in the desired order.
+            current_uris (list): Track URIs in the current playlist order.
+
+        Returns:
+            dict: The write strategy that would be used, the estimated number
+            of write calls, the `(range_start, insert_before, range_length)`
+            moves when reordering in place, and the `(start, length)` runs of
+            current positions that would be removed. "removed_without_track"
+            counts the items without a track among them: a rewrite cannot
+            re-add those, so they are lost even when only sorting.
+        """
+        rewrite_calls = full_rewrite_calls(len(track_uris))
+        moves = plan_reorder_moves(current_uris, track_uris, max_moves=rewrite_calls)
+        removed_without_track = 0
+        if moves is None:
+            strategy = "rewrite" if track_uris else "noop"
+            api_calls = rewrite_calls
+            if track_uris:
+                removed_without_track = current_uris.count(None)
+        else:
+            strategy = "moves" if moves else "noop"
+            api_calls = len(moves)
+        return {
+            "strategy": strategy,
+            "api_calls": api_calls,
+            "rewrite_calls": rewrite_calls,
+            "calls_saved": rewrite_calls - api_calls,
+            "tracks_before": len(current_uris),
+            "tracks_after": len(track_uris),
+            "moves": [list(move) for move in moves or ()],
+            # Moves keep every item; a rewrite drops what the target lacks.
+            "removed": [] if moves is not None else [list(run) for run in removed_ranges(current_uris, track_uris)],
+            "removed_without_track": removed_without_track,
+        }
+
+    def _deduplicated_uris(self, tracks, fuzzy: bool, keep: str):
+        """Return the URIs to keep, in order, and the current URIs of `tracks`."""
+        with span("dedupe", fuzzy=fuzzy):
+            if fuzzy or keep != "first":
+                deduped_tracks = select_unique_tracks(tracks, keep=keep, fuzzy=fuzzy)
+            else:
+                deduped_tracks = self._deduplicate_tracks(tracks)
+            track_uris = [t["uri"] for t in deduped_tracks if t.get("uri")]
+            current_uris = self._current_uris(tracks)
+        return track_uris, current_uris
+
+    @staticmethod
+    def _current_uris(tracks):
+        """Return the URIs of `tracks` at their live positions, with None for items without one."""
+        current_uris = []
+        for track in tracks:
+            position = track.get('position', len(current_uris))
+            current_uris.extend([None] * (position - len(current_uris)))
+            current_uris.append(track.get('uri'))
+        return current_uris
+
+    @staticmethod
+    def _check_keys(keys):
+        if not keys:
+            raise ValueError("At least one sort key is required.")
+        unknown = [key for key, _ in keys if key not in SORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown sort key: {', '.join(unknown)}")
+
+    @staticmethod
+    def _sorted_uris(table: TrackTable, keys):
+        with span("sort", tracks=len(table)):
+            return table.take_uris(table.argsort(keys))
+
+    @staticmethod
+    def _check_gap(min_gap: int):
+        if min_gap < 1:
+            raise ValueError("min_gap must be at least 1.")
+
+    @staticmethod
+    def _shuffled_uris(table: TrackTable, seed: int, min_gap: int):
+        with span("shuffle", tracks=len(table)):
+            order, gap = artist_spread_order(table.artist_keys, seed, min_gap)
+            return table.take_uris(order), gap
+
+
+class PlaylistSorter(PlaylistSorterBase):
+    """A class that provides various sorting methods for Spotify playlists.
+    
+    This class handles sorting of tracks in a Spotify playlist based on different criteria
+    such as artist name, release date, duration, and popularity.
+    """
+
+    def _fetch_page(self, offset: int):
+        """Request one page of playlist items starting at `offset`."""
+        return self.spotify_client.playlist_items(
+            self.playlist_id,
+            limit=PAGE_SIZE,
+            offset=offset,
+            fields=TRACK_FIELDS
+        )
+
+    def _iter_pages_serially(self, offset: int = 0):
+        """Yield `(offset, page)` one request after another from `offset` until the last page."""
+        while True:
+            response = self._fetch_page(offset)
+
+            if not self._is_page(response):
+                return
+
+            self._page_fetched(response)
+            yield offset, response
+
+            # Si no hay más páginas, salir del bucle
+            if not response.get('next'):
+                return
+
+            offset += PAGE_SIZE
+
+    def iter_track_pages(self, parallel=None):
+        """Yield the playlist's normalized tracks one page at a time, in playlist order.
+
+        In parallel mode the first page reveals the playlist total and the
+        following pages are requested ahead of the consumer, keeping at most
+        `fetch_concurrency` requests in flight. Memory stays bounded by that
+        window no matter how large the playlist is. With a track store, an
+        unchanged playlist is read from the store one page per query, and a
+        downloaded one is written to it page by page.
+
+        Args:
+            parallel (bool, optional): Force parallel (True) or serial (False)
+                fetching. Defaults to parallel when `fetch_concurrency` > 1.
+
+        Yields:
+            list: The tracks of one page.
+        """
+        if self.track_store is None:
+            for offset, response in self._iter_responses(parallel):
+                yield self._extract_tracks(response, offset)
+            return
+
+        snapshot_id = self.get_snapshot_id()
+        stored = self._stored_pages(snapshot_id)
+        page = next(stored, None)
+        if page is not None:
+            yield page
+            yield from stored
+            return
+
+        with self.track_store.track_writer(self.playlist_id, snapshot_id) as writer:
+            for offset, response in self._iter_responses(parallel):
+                page = self._extract_tracks(response, offset)
+                writer.add(page)
+                yield page
+            writer.commit()
+
+    def _iter_responses(self, parallel=None):
+        """Yield `(offset, response)` for the raw `playlist_items` pages in playlist order."""
+        if not self._use_parallel(parallel):
+            yield from self._iter_pages_serially()
+            return
+
+        response = self._fetch_page(0)
+        if not self._is_page(response):
+            return
+
+        self._page_fetched(response)
+        yield 0, response
+        if not response.get('next'):
+            return
+
+        offsets = self._offsets_after(response)
+        if offsets is None:
+            # Without a total the remaining offsets are unknown.
+            yield from self._iter_pages_serially(PAGE_SIZE)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.fetch_concurrency)
+        pending = deque((offset, executor.submit(self._fetch_page, offset))
+                        for offset in islice(offsets, self.fetch_concurrency))
+        try:
+            while pending:
+                offset, future = pending.popleft()
+                page = future.result()
+                if not self._is_page(page):
+                    return
+                for next_offset in islice(offsets, 1):
+                    pending.append((next_offset, executor.submit(self._fetch_page, next_offset)))
+                self._page_fetched(page)
+                yield offset, page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_snapshot_id(self):
+        """Return the playlist's current `snapshot_id` with a single lightweight lookup."""
+        response = self.spotify_client.playlist(self.playlist_id, fields='snapshot_id')
+        self.snapshot_id = (response or {}).get('snapshot_id')
+        return self.snapshot_id
+
+    def get_all_tracks(self, parallel=None):
         """Retrieve all tracks from the playlist, handling pagination.
         
+        When a track cache or a track store is configured, the playlist's
+        `snapshot_id` is looked up first and the cached or stored tracks are
+        returned if that snapshot was already downloaded.
+        
+        In parallel mode the first page reveals the playlist total and the
+        remaining pages are requested concurrently through a thread pool bounded
+        by `fetch_concurrency`. Pages are reassembled in playlist order.
+        See `iter_track_pages`.
+
+        Args:
+            parallel (bool, optional): Force parallel (True) or serial (False)
+                fetching. Defaults to parallel when `fetch_concurrency` > 1.
+
         Returns:
             list: A list of all track items in the playlist with their details.
         """
+        return self._load("tracks", parallel)
+
+    def get_track_table(self, parallel=None):
+        """Retrieve the playlist as a compact `TrackTable` of URIs and sort keys.
+
+        Pages are ingested straight into the table's columns without building a
+        dict per track. Uses the track cache and the track store like
+        `get_all_tracks`; a table read from the store is built from its tracks.
+
+        Args:
+            parallel (bool, optional): Force parallel (True) or serial (False)
+                fetching. Defaults to parallel when `fetch_concurrency` > 1.
+
+        Returns:
+            TrackTable: The playlist's tracks in playlist order.
+        """
+        return self._load("table", parallel)
+
+    def _load(self, kind: str, parallel=None):
+        """Return data of the given kind ("tracks" or "table") for the current snapshot.
+
+        Looks in the track cache, then in the track store, and downloads the
+        playlist only when neither has the snapshot.
+        """
+        self._report("fetching")
+        with span("fetch", kind=kind):
+            if self.track_cache is None and self.track_store is None:
+                return self._fetch(kind, parallel)
+
+            snapshot_id = self.get_snapshot_id()
+            cached = self._cached(kind, snapshot_id)
+            if cached is not None:
+                return cached
+
+            data = self._read_through(kind, snapshot_id, parallel)
+            self._remember(kind, snapshot_id, data)
+            return data
+
+    def _fetch(self, kind: str, parallel=None):
+        """Download the playlist as normalized tracks or as a `TrackTable`."""
+        if kind == "tracks":
+            return self._fetch_all_tracks(parallel)
+        return self._fetch_track_table(parallel)
+
+    def _read_through(self, kind: str, snapshot_id, parallel=None):
+        """Return the stored tracks of `snapshot_id`, or download and store them."""
+        if self.track_store is None or not snapshot_id:
+            return self._fetch(kind, parallel)
+
+        tracks = self.track_store.get_tracks(self.playlist_id, snapshot_id)
+        if tracks is None:
+            tracks = self._fetch_all_tracks(parallel)
+            self.track_store.put_tracks(self.playlist_id, snapshot_id, tracks)
+        else:
+            self._report("sorting")
+        return tracks if kind == "tracks" else TrackTable.from_tracks(tracks)
+
+    def _fetch_all_tracks(self, parallel=None):
+        """Download every page of the playlist from Spotify."""
         all_tracks = []
-        limit = 100
-        offset = 0
-        
-        while True:
-            response = self.spotify_client.playlist_items(
-                self.playlist_id,
-                limit=limit,
-                offset=offset,
-                fields='items(track(id,uri,name,artists,album(name,release_date),duration_ms,popularity)),next'
-            )
-            
-            if not response or 'items' not in response:
-                break
-                
-            # Filtrar pistas nulas y extraer solo la información necesaria
-            tracks = []
-            for item in response['items']:
-                if item and item.get('track'):
-                    track = item['track']
-                    tracks.append({
-                        'id': track.get('id'),
-                        'uri': track.get('uri'),
-                        'name': track.get('name'),
-                        'artists': track.get('artists', []),
-                        'album': track.get('album', {}),
-                        'duration_ms': track.get('duration_ms', 0),
-                        'popularity': track.get('popularity', 0)
-                    })
-            
-            all_tracks.extend(tracks)
-            
-            # Si no hay más páginas, salir del bucle
-            if not response.get('next'):
-                break
-                
-            offset += limit
-            
+        for offset, response in self._iter_responses(parallel):
+            all_tracks.extend(self._extract_tracks(response, offset))
+        self._report("sorting")
         return all_tracks
 
-    def reorder_playlist_in_batches(self, track_uris: list):
-        """Reorder a playlist in batches of 100 tracks without removing any songs.
+    def _fetch_track_table(self, parallel=None):
+        """Download every page of the playlist into a `TrackTable`."""
+        table = TrackTable()
+        for _, response in self._iter_responses(parallel):
+            table.extend_from_items(response['items'])
+        self._report("sorting")
+        return table
+
+    def reorder_playlist_in_batches(self, track_uris: list, current_uris=None):
+        """Reorder a playlist in batches of 100 tracks.
         
-        The method re-creates the playlist contents in the requested order. It does not
-        delete or add additional tracks; it only reorders the existing ones.
+        When the current order is known and the target is a permutation of it,
+        the playlist is reordered in place with the fewest `playlist_reorder_items`
+        range moves, each chained to the previous `snapshot_id`; items without a
+        track keep their positions. If the playlist is already in the target order
+        nothing is written. Otherwise, or when moving would cost more calls than a
+        rewrite, the playlist contents are re-created in the requested order. A
+        rewrite only writes `track_uris`, so it removes the items without a track
+        (e.g. songs removed from Spotify); "removed_without_track" counts them.
+
+        Args:
+            track_uris (list): Track URIs in the desired order.
+            current_uris (list, optional): Track URIs in the current playlist order.
+
+        Returns:
+            dict: The write strategy used ("noop", "moves" or "rewrite"), the
+            number of API calls made, how many calls were saved compared
+            with a full rewrite and the number of items without a track removed.
         """
+        stats, moves = self._plan_write(track_uris, current_uris)
         if not track_uris:
-            return
+            return stats
 
-        for index in range(0, len(track_uris), 100):
-            batch = track_uris[index: index + 100]
-            if index == 0:
-                self.spotify_client.playlist_replace_items(
-                    self.playlist_id, batch)
-            else:
-                self.spotify_client.playlist_add_items(self.playlist_id, batch)
+        with span("write", tracks=len(track_uris)):
+            for method, arguments in self._write_calls(track_uris, moves):
+                self._written(getattr(self.spotify_client, method)(self.playlist_id, **arguments))
+        return self._write_stats(stats, moves)
 
-    def remove_duplicates(self):
-        """Remove duplicate tracks while preserving the first occurrence of each song."""
+    def remove_duplicates(self, dry_run: bool = False, fuzzy: bool = False, keep: str = "first"):
+        """Remove duplicate tracks while preserving the first occurrence of each song.
+
+        Args:
+            dry_run (bool, optional): If True, return the preview of the change
+                from `preview_reorder` instead of writing it.
+            fuzzy (bool, optional): Also remove other releases of the same
+                recording, matched by ISRC or by title, artist and duration.
+            keep (str, optional): Which copy to keep: "first", "popular" or
+                "earliest". Defaults to the first occurrence.
+
+        Raises:
+            ValueError: If `keep` is not a known policy.
+        """
         tracks = self.get_all_tracks()
         if not tracks:
             print("No tracks found.")
             return
 
-        deduped_tracks = self._deduplicate_tracks(tracks)
-        track_uris = [t["uri"] for t in deduped_tracks if t.get("uri")]
-        self.reorder_playlist_in_batches(track_uris)
+        track_uris, current_uris = self._deduplicated_uris(tracks, fuzzy, keep)
+        if dry_run:
+            return self.preview_reorder(track_uris, current_uris)
+        return self.reorder_playlist_in_batches(track_uris, current_uris)
+
+    def sort_by_keys(self, keys, dry_run: bool = False):
+        """Reorder the playlist by several sort keys with one fetch and one write.
+
+        Args:
+            keys (list): `(key, reverse)` pairs, most significant first. Keys are
+                "artist", "release", "duration", "popularity", "genre" and
+                "artist_followers"; the last two fetch the artists' details
+                (see `add_artist_details`).
+            dry_run (bool, optional): If True, return the preview of the change
+                from `preview_reorder` instead of writing it.
+
+        Raises:
+            ValueError: If a key is unknown or no key is given.
+        """
+        self._check_keys(keys)
+        table = self.get_track_table()
+        if not len(table):
+            print("No tracks found.")
+            return
+
+        if table.needs_artist_details(keys):
+            self.add_artist_details(table)
+        track_uris = self._sorted_uris(table, keys)
+        if dry_run:
+            return self.preview_reorder(track_uris, table.current_uris())
+        return self.reorder_playlist_in_batches(track_uris, table.current_uris())
+
+    def add_artist_details(self, table: TrackTable):
+        """Fill the genre and follower columns of `table`, fetching only uncached artists.
+
+        The distinct artists are requested 50 per `artists` call, up to
+        `fetch_concurrency` calls at once.
+        """
+        with span("artists", tracks=len(table)):
+            artists = fetch_artists(self.spotify_client, table.artist_ids, self.artist_cache,
+                                    self.fetch_concurrency)
+            table.add_artist_details(artists)
+
+    def shuffle(self, seed=None, min_gap: int = DEFAULT_MIN_GAP, dry_run: bool = False):
+        """Shuffle the playlist, keeping tracks of the same artist apart, with one fetch and one write.
+
+        Args:
+            seed (int, optional): Seed of the shuffle. A random one is drawn if
+                omitted; the result reports it so the order can be reproduced.
+            min_gap (int, optional): Wanted distance between two tracks of the
+                same artist; lowered to the largest one the playlist allows.
+            dry_run (bool, optional): If True, return the preview of the change
+                from `preview_reorder` instead of writing it.
+
+        Returns:
+            dict: The write stats (or preview), plus the "seed" used and the
+            "min_gap" that was kept.
+
+        Raises:
+            ValueError: If `min_gap` is smaller than 1.
+        """
+        self._check_gap(min_gap)
+        table = self.get_track_table()
+        if not len(table):
+            print("No tracks found.")
+            return
+
+        seed = new_seed() if seed is None else seed
+        track_uris, gap = self._shuffled_uris(table, seed, min_gap)
+        if dry_run:
+            result = self.preview_reorder(track_uris, table.current_uris())
+        else:
+            result = self.reorder_playlist_in_batches(track_uris, table.current_uris())
+        return {**result, "seed": seed, "min_gap": gap}
+
+    def sort_by_spec(self, spec):
+        """Reorder the playlist by a declarative sort specification.
+
+        Args:
+            spec (list): Dicts such as `{"key": "release", "desc": True}`, most
+                significant first. "desc" defaults to False.
+
+        Raises:
+            ValueError: If a key is unknown or the spec is empty.
+        """
+        return self.sort_by_keys([(item["key"], bool(item.get("desc", False))) for item in spec])
 
     def sort_by_artist(self, reverse=False):
         """Sort the playlist by artist name.
@@ -116,20 +643,7 @@ class PlaylistSorter:
             reverse (bool, optional): If True, sorts in reverse order (Z-A).
                                     Defaults to False (A-Z).
         """
-        tracks = self.get_all_tracks()
-        if not tracks:
-            print("No tracks found.")
-            return
-
-        track_data = [
-            {"uri": t["uri"], "artist": t["artists"][0]["name"]}
-            for t in tracks
-        ]
-
-        sorted_tracks = sorted(
-            track_data, key=lambda x: x["artist"].lower(), reverse=reverse)
-        track_uris = [t["uri"] for t in sorted_tracks]
-        self.reorder_playlist_in_batches(track_uris)
+        return self.sort_by_keys([("artist", reverse)])
 
     def sort_by_release_date(self, reverse=True):
         """Sort the playlist by track release date.
@@ -138,32 +652,7 @@ class PlaylistSorter:
             reverse (bool, optional): If True, sorts from newest to oldest.
                                     Defaults to True.
         """
-        tracks = self.get_all_tracks()
-        if not tracks:
-            print("No tracks found.")
-            return
-
-        def get_release_date(track):
-            # Handle different date formats (YYYY, YYYY-MM, YYYY-MM-DD)
-            date_str = track.get("album", {}).get("release_date", "")
-            parts = date_str.split('-')
-            year = int(parts[0]) if parts[0].isdigit() else 0
-            month = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
-            day = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 1
-            return (year, month, day)
-
-        track_data = [
-            {"uri": t["uri"], "release_date": get_release_date(t)}
-            for t in tracks
-        ]
-
-        sorted_tracks = sorted(
-            track_data, 
-            key=lambda x: x["release_date"], 
-            reverse=reverse
-        )
-        track_uris = [t["uri"] for t in sorted_tracks]
-        self.reorder_playlist_in_batches(track_uris)
+        return self.sort_by_keys([("release", reverse)])
 
     def sort_by_duration(self, reverse=True):
         """Sort the playlist by track duration.
@@ -172,23 +661,7 @@ class PlaylistSorter:
             reverse (bool, optional): If True, sorts from longest to shortest.
                                     Defaults to True.
         """
-        tracks = self.get_all_tracks()
-        if not tracks:
-            print("No tracks found.")
-            return
-
-        track_data = [
-            {"uri": t["uri"], "duration": t.get("duration_ms", 0)}
-            for t in tracks
-        ]
-
-        sorted_tracks = sorted(
-            track_data, 
-            key=lambda x: x["duration"], 
-            reverse=reverse
-        )
-        track_uris = [t["uri"] for t in sorted_tracks]
-        self.reorder_playlist_in_batches(track_uris)
+        return self.sort_by_keys([("duration", reverse)])
 
     def sort_by_popularity(self, reverse=True):
         """Sort the playlist by track popularity.
@@ -197,20 +670,22 @@ class PlaylistSorter:
             reverse (bool, optional): If True, sorts from most to least popular.
                                     Defaults to True (most popular first).
         """
-        tracks = self.get_all_tracks()
-        if not tracks:
-            print("No tracks found.")
-            return
+        return self.sort_by_keys([("popularity", reverse)])
 
-        track_data = [
-            {"uri": t["uri"], "popularity": t.get("popularity", 0)}
-            for t in tracks
-        ]
+    def sort_by_genre(self, reverse=False):
+        """Sort the playlist by the genre of each track's first artist.
+        
+        Args:
+            reverse (bool, optional): If True, sorts in reverse order (Z-A).
+                                    Defaults to False (A-Z).
+        """
+        return self.sort_by_keys([("genre", reverse)])
 
-        sorted_tracks = sorted(
-            track_data, 
-            key=lambda x: x["popularity"], 
-            reverse=reverse
-        )
-        track_uris = [t["uri"] for t in sorted_tracks]
-        self.reorder_playlist_in_batches(track_uris)
+    def sort_by_artist_followers(self, reverse=True):
+        """Sort the playlist by the follower count of each track's first artist.
+        
+        Args:
+            reverse (bool, optional): If True, sorts from most to least followed.
+                                    Defaults to True.
+        """
+        return self.sort_by_keys([("artist_followers", reverse)])
@@ -0,0 +1,153 @@
+"""Single-flight, refresh-ahead renewal of session access tokens.
+
+Spotify access tokens live for an hour. When a token is about to expire,
+every concurrent request of that session would otherwise post the same
+refresh token to the accounts service, each paying a network round trip and
+racing to store its own new token. `TokenRefresher` refreshes a session at
+most once at a time: concurrent callers wait for the refresh in flight and
+share its token.
+
+With a refresh-ahead window, a token that is still valid but close to expiry
+is returned right away and renewed on a background thread, so the requests
+of an active user never wait for the accounts service.
+
+A refresh never brings back a session that was deleted, e.g. by a logout,
+while it was running: the new token is only written over a live session.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SessionEndedError(RuntimeError):
+    """Raised when the session was deleted before its refreshed token could be stored."""
+
+
+class _Refresh:
+    """A refresh in flight, shared with the callers that wait for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token_info = None
+        self.error = None
+
+
+class TokenRefresher:
+    """Refresh the access tokens of a session store, one refresh per session. Thread-safe."""
+
+    def __init__(self, store, margin: float = 60.0, refresh_ahead: float = 0.0,
+                 max_workers: int = 2, clock=time.time):
+        """Initialize the refresher.
+
+        Args:
+            store (SessionStore): Sessions whose token info is refreshed in place.
+            margin (float): Seconds before expiry from which a token is no
+                longer used; callers wait for a new one.
+            refresh_ahead (float): Seconds before expiry from which a token is
+                renewed in the background while it is still used. 0 disables
+                background refreshes.
+            max_workers (int): Threads running background refreshes.
+            clock (callable, optional): Time source, for tests.
+        """
+        self.store = store
+        self.margin = margin
+        self.refresh_ahead = refresh_ahead
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._executor = None
+        self._max_workers = max_workers
+        self.refreshes = 0
+        self.coalesced = 0
+        self.background = 0
+        self.failures = 0
+
+    def _expires_within(self, token_info: dict, seconds: float) -> bool:
+        expires_at = token_info.get("expires_at")
+        return bool(expires_at) and self._clock() > expires_at - seconds
+
+    def is_due(self, token_info: dict) -> bool:
+        """Return True if `token_info` must be refreshed before it is used."""
+        return self._expires_within(token_info, self.margin)
+
+    def refresh(self, session_id: str, token_info: dict, refresh):
+        """Refresh the session's token, or wait for the refresh in flight, and return it. Blocking.
+
+        Args:
+            session_id (str): Session the token belongs to.
+            token_info (dict): Token info as read from the store.
+            refresh (callable): `refresh(token_info)` asks the accounts
+                service for a new token info; only called by one caller per
+                session at a time.
+
+        Raises:
+            SessionEndedError: The session was deleted before or during the refresh.
+        """
+        with self._lock:
+            pending = self._in_flight.get(session_id)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[session_id] = _Refresh()
+                self.refreshes += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._run(session_id, pending, token_info, refresh)
+        else:
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.token_info
+
+    def prefetch(self, session_id: str, token_info: dict, refresh) -> bool:
+        """Start a background refresh if the token entered the refresh-ahead window.
+
+        Returns True if a refresh was started. Never blocks.
+        """
+        if not self.refresh_ahead or not self._expires_within(token_info, self.refresh_ahead):
+            return False
+        with self._lock:
+            if session_id in self._in_flight:
+                return False
+            pending = self._in_flight[session_id] = _Refresh()
+            self.background += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix="playlistsmith-token")
+        self._executor.submit(self._run, session_id, pending, token_info, refresh)
+        return True
+
+    def _run(self, session_id: str, pending: _Refresh, token_info: dict, refresh):
+        try:
+            # Another worker sharing the store may have refreshed the session already.
+            stored = self.store.get(session_id)
+            if stored is None:
+                raise SessionEndedError("Session ended")
+            if stored.get("access_token") != token_info.get("access_token") and not self.is_due(stored):
+                pending.token_info = stored
+            else:
+                token_info = refresh(stored)
+                if not self.store.replace(session_id, token_info):
+                    raise SessionEndedError("Session ended")
+                pending.token_info = token_info
+        except SessionEndedError as exc:
+            pending.error = exc
+        except BaseException as exc:
+            pending.error = exc
+            with self._lock:
+                self.failures += 1
+        finally:
+            with self._lock:
+                del self._in_flight[session_id]
+            pending.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "refreshes": self.refreshes,
+                "coalesced": self.coalesced,
+                "background": self.background,
+                "failures": self.failures,
+            }
@@ -0,0 +1,162 @@
+"""Opt-in, sampled tracing of where a request spends its time.
+
+`TracingMiddleware` decides per request whether to trace it: at random with
+the configured sample rate, or, when enabled, because the client sent
+`X-Trace: 1`. Any client can send the header, so it is off by default and
+the traces it starts are never written to disk. A traced
+request carries a `Trace` in a context variable, and code records phases with
+`span()` (a no-op when the request is not traced). The breakdown is returned
+in a `Server-Timing` header and can be written as a Chrome trace file
+(viewable in chrome://tracing or Perfetto).
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import uuid4
+
+import anyio.to_thread
+
+CURRENT_TRACE = ContextVar("playlistsmith_trace", default=None)
+
+
+class Trace:
+    """Spans recorded for one request, from any thread."""
+
+    def __init__(self):
+        self.id = uuid4().hex
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, started: float, duration: float, **attrs):
+        """Record a span that began at `started` (a `perf_counter` value)."""
+        entry = (name, started, duration, threading.get_ident(), attrs)
+        with self._lock:
+            self.spans.append(entry)
+
+    def server_timing(self) -> str:
+        """Return the spans, summed per name, as a `Server-Timing` header value."""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for name, _, duration, _, _ in spans:
+            total, count = totals.get(name, (0.0, 0))
+            totals[name] = (total + duration, count + 1)
+        entries = []
+        for name, (total, count) in totals.items():
+            entry = f"{name};dur={total * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_chrome(self, **request_info) -> dict:
+        """Return the spans in the Chrome trace event format."""
+        with self._lock:
+            spans = list(self.spans)
+        events = [{
+            "name": name,
+            "ph": "X",
+            "ts": round((started - self.started) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread,
+            "args": attrs,
+        } for name, started, duration, thread, attrs in spans]
+        return {"traceEvents": events, "otherData": {"trace_id": self.id, **request_info}}
+
+
+def current_trace():
+    """Return the trace of the current request, or None when it is not traced."""
+    return CURRENT_TRACE.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record the enclosed block as a span of the current trace, if any."""
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter() - started, **attrs)
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces sampled requests.
+
+    Traced responses get `Server-Timing` and `X-Trace-Id` headers. When
+    `trace_dir` is set, each sampled trace is also written to
+    `<trace_dir>/<id>.json`; traces requested with the header are not.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0, trace_dir: str | None = None,
+                 header: str = "x-trace", allow_header: bool = False):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI application to wrap.
+            sample_rate (float): Share of requests traced at random.
+            trace_dir (str, optional): Directory the sampled traces are written to.
+            header (str): Request header that asks for a trace.
+            allow_header (bool): Trace requests that send `header`. Leave off
+                where untrusted clients reach the app.
+        """
+        self.app = app
+        self.sample_rate = sample_rate
+        self.trace_dir = trace_dir
+        self.header = header.lower().encode()
+        self.allow_header = allow_header
+
+    def _requested(self, scope) -> bool:
+        if self.allow_header:
+            for key, value in scope.get("headers", ()):
+                if key == self.header:
+                    return value.strip() in (b"1", b"true", b"yes")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        sampled = not requested and self.sample_rate > 0 and random.random() < self.sample_rate
+        if not requested and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = CURRENT_TRACE.set(trace)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            CURRENT_TRACE.reset(token)
+            if self.trace_dir and sampled:
+                document = trace.to_chrome(method=scope["method"], path=scope["path"], status=status,
+                                           duration_ms=round((time.perf_counter() - trace.started) * 1000, 3))
+                await anyio.to_thread.run_sync(self._write, trace.id, document)
+
+    def _write(self, trace_id: str, document: dict):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with open(os.path.join(self.trace_dir, f"{trace_id}.json"), "w", encoding="utf-8") as handle:
+            json.dump(document, handle)
@@ -0,0 +1,88 @@
+"""In-memory cache of normalized playlist tracks.
+
+Entries are keyed by `(playlist_id, snapshot_id)` plus the kind of data
+stored (the normalized track list or a `TrackTable`). Spotify changes the
+snapshot id on every modification of a playlist, so a cached entry is valid
+for as long as the playlist reports the same snapshot. Entries are evicted
+least-recently-used first once the total number of cached tracks exceeds the
+configured budget, and expire after a fixed time-to-live.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TrackCache:
+    """A thread-safe LRU cache of track collections weighted by track count.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_tracks: int = 200_000, ttl: float = 600.0, clock=time.monotonic):
+        """Initialize the cache.
+
+        Args:
+            max_tracks (int): Maximum number of tracks held across all entries.
+            ttl (float): Seconds an entry stays valid after it was stored.
+            clock (callable, optional): Monotonic time source, for tests.
+        """
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, playlist_id: str, snapshot_id: str, kind: str = "tracks"):
+        """Return the cached tracks, or None on a miss."""
+        key = (playlist_id, snapshot_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, playlist_id: str, snapshot_id: str, tracks, kind: str = "tracks"):
+        """Store `tracks` (any sized collection) for the given playlist snapshot."""
+        if not snapshot_id or len(tracks) > self.max_tracks:
+            return
+        key = (playlist_id, snapshot_id, kind)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock(), tracks)
+            self._size += len(tracks)
+            while self._size > self.max_tracks:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, playlist_id: str):
+        """Drop every cached snapshot of a playlist."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == playlist_id]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, tracks = self._entries.pop(key)
+        self._size -= len(tracks)
+
+    def stats(self):
+        """Return hit/miss counters and the current cache size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "tracks": self._size,
+            }
@@ -0,0 +1,381 @@
+"""On-disk store of normalized playlist tracks shared by every worker on a host.
+
+`TrackCache` lives in process memory, so every restart and every gunicorn
+worker starts cold and downloads each playlist again. `SQLiteTrackStore`
+keeps what a download produced in a SQLite file:
+
+- `tracks`: one row per track URI with its normalized fields, shared by
+  every playlist that contains the track;
+- `playlists`: each playlist's name, size and `snapshot_id` from the last
+  listing, and the snapshot its stored tracks belong to;
+- `playlist_tracks`: the track URI at every position of a stored playlist,
+  indexed by playlist and by URI;
+- `pending_tracks`: the positions of a playlist still being downloaded, one
+  short transaction per page, moved to `playlist_tracks` once the last page
+  arrived (see `TrackWriter`).
+
+Spotify changes a playlist's `snapshot_id` on every modification, so stored
+tracks are served only for the snapshot they were downloaded at. The
+database runs in WAL mode, so readers never wait for a writer, and each
+playlist is written with `executemany` upserts in one transaction.
+Connections are per thread and per process, like `SQLiteSessionStore`.
+
+Triggers keep the number of stored playlists and tracks in `store_counts`,
+so `stats()`, read on every metrics scrape, never counts whole tables.
+
+`create_track_store` builds the store from a URL such as
+`sqlite:////var/lib/playlistsmith/tracks.db`, or returns None when the URL
+is empty.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS tracks ("
+    "uri TEXT PRIMARY KEY, id TEXT, name TEXT, artists TEXT NOT NULL, album TEXT NOT NULL, "
+    "duration_ms INTEGER, popularity INTEGER, isrc TEXT)",
+    "CREATE TABLE IF NOT EXISTS playlists ("
+    "id TEXT PRIMARY KEY, name TEXT, total INTEGER, snapshot_id TEXT, "
+    "tracks_snapshot_id TEXT, updated_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS playlist_tracks ("
+    "playlist_id TEXT NOT NULL, position INTEGER NOT NULL, uri TEXT NOT NULL, "
+    "PRIMARY KEY (playlist_id, position)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS playlist_tracks_uri ON playlist_tracks (uri)",
+    "CREATE TABLE IF NOT EXISTS pending_tracks ("
+    "writer TEXT NOT NULL, position INTEGER NOT NULL, uri TEXT NOT NULL, written_at REAL NOT NULL, "
+    "PRIMARY KEY (writer, position)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS pending_tracks_uri ON pending_tracks (uri)",
+    "CREATE TABLE IF NOT EXISTS store_counts (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TRIGGER IF NOT EXISTS tracks_inserted AFTER INSERT ON tracks BEGIN "
+    "UPDATE store_counts SET value = value + 1 WHERE name = 'tracks'; END",
+    "CREATE TRIGGER IF NOT EXISTS tracks_deleted AFTER DELETE ON tracks BEGIN "
+    "UPDATE store_counts SET value = value - 1 WHERE name = 'tracks'; END",
+    "CREATE TRIGGER IF NOT EXISTS playlists_inserted AFTER INSERT ON playlists "
+    "WHEN NEW.tracks_snapshot_id IS NOT NULL BEGIN "
+    "UPDATE store_counts SET value = value + 1 WHERE name = 'playlists'; END",
+    "CREATE TRIGGER IF NOT EXISTS playlists_updated AFTER UPDATE OF tracks_snapshot_id ON playlists "
+    "WHEN (OLD.tracks_snapshot_id IS NULL) != (NEW.tracks_snapshot_id IS NULL) BEGIN "
+    "UPDATE store_counts SET value = value + (CASE WHEN NEW.tracks_snapshot_id IS NULL THEN -1 ELSE 1 END) "
+    "WHERE name = 'playlists'; END",
+)
+
+# Counts of stores created before `store_counts` existed, taken once.
+INITIAL_COUNTS = (
+    ("playlists", "SELECT COUNT(*) FROM playlists WHERE tracks_snapshot_id IS NOT NULL"),
+    ("tracks", "SELECT COUNT(*) FROM tracks"),
+)
+
+SELECT_TRACKS = (
+    "SELECT pt.position, t.id, t.uri, t.name, t.artists, t.album, t.duration_ms, t.popularity, t.isrc "
+    "FROM playlists p JOIN playlist_tracks pt ON pt.playlist_id = p.id "
+    "JOIN tracks t ON t.uri = pt.uri "
+    "WHERE p.id = ? AND p.tracks_snapshot_id = ?"
+)
+
+UPSERT_TRACK = (
+    "INSERT INTO tracks (uri, id, name, artists, album, duration_ms, popularity, isrc) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(uri) DO UPDATE SET id = excluded.id, name = excluded.name, "
+    "artists = excluded.artists, album = excluded.album, duration_ms = excluded.duration_ms, "
+    "popularity = excluded.popularity, isrc = excluded.isrc"
+)
+
+
+class StaleSnapshotError(RuntimeError):
+    """Raised when the stored tracks being read are replaced by a newer snapshot."""
+
+
+def _track(row) -> dict:
+    position, track_id, uri, name, artists, album, duration_ms, popularity, isrc = row
+    return {
+        "position": position,
+        "id": track_id,
+        "uri": uri,
+        "name": name,
+        "artists": json.loads(artists),
+        "album": json.loads(album),
+        "duration_ms": duration_ms,
+        "popularity": popularity,
+        "isrc": isrc,
+    }
+
+
+class TrackWriter:
+    """Store the tracks of one playlist snapshot page by page, as they are downloaded.
+
+    Each page is written in its own short transaction and only its rows are
+    kept until the next page, so storing a playlist takes no more memory than
+    one page. `commit` makes the snapshot readable in one transaction; leaving
+    the `with` block without it drops the pages written so far. Like
+    `put_tracks`, nothing is stored without a snapshot id or when a track has
+    no URI. Pages may be added from different threads, one at a time.
+    """
+
+    def __init__(self, store, playlist_id: str, snapshot_id: str):
+        self.store = store
+        self.playlist_id = playlist_id
+        self.snapshot_id = snapshot_id
+        self.writer = uuid.uuid4().hex
+        self.total = 0
+        self.storable = bool(snapshot_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.discard()
+
+    def add(self, tracks):
+        """Write one page of normalized tracks."""
+        if not self.storable or not tracks:
+            return
+        if any(not track.get("uri") for track in tracks):
+            self.discard()
+            return
+        now = self.store._clock()
+        with self.store._connection() as conn:
+            _upsert_tracks(conn, tracks)
+            conn.executemany(
+                "INSERT INTO pending_tracks (writer, position, uri, written_at) VALUES (?, ?, ?, ?)",
+                ((self.writer, track.get("position", self.total + index), track["uri"], now)
+                 for index, track in enumerate(tracks)),
+            )
+        self.total += len(tracks)
+
+    def commit(self):
+        """Replace the playlist's stored tracks with the pages written."""
+        if not self.storable or not self.total:
+            return
+        now = self.store._clock()
+        with self.store._connection() as conn:
+            conn.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (self.playlist_id,))
+            conn.execute(
+                "INSERT INTO playlist_tracks (playlist_id, position, uri) "
+                "SELECT ?, position, uri FROM pending_tracks WHERE writer = ?",
+                (self.playlist_id, self.writer),
+            )
+            conn.execute("DELETE FROM pending_tracks WHERE writer = ?", (self.writer,))
+            _finish_playlist(conn, self.playlist_id, self.snapshot_id, self.total, now)
+            self.store._sweep(conn, now)
+        self.storable = False
+        self.store._count("writes")
+
+    def discard(self):
+        """Drop the pages written so far; later pages are not stored."""
+        if self.storable and self.total:
+            with self.store._connection() as conn:
+                conn.execute("DELETE FROM pending_tracks WHERE writer = ?", (self.writer,))
+        self.storable = False
+
+
+def _upsert_tracks(conn, tracks):
+    conn.executemany(UPSERT_TRACK, (
+        (track["uri"], track.get("id"), track.get("name"),
+         json.dumps(track.get("artists") or []), json.dumps(track.get("album") or {}),
+         track.get("duration_ms"), track.get("popularity"), track.get("isrc"))
+        for track in {track["uri"]: track for track in tracks}.values()
+    ))
+
+
+def _finish_playlist(conn, playlist_id: str, snapshot_id: str, total: int, now: float):
+    conn.execute(
+        "INSERT INTO playlists (id, total, snapshot_id, tracks_snapshot_id, updated_at) "
+        "VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET total = excluded.total, snapshot_id = excluded.snapshot_id, "
+        "tracks_snapshot_id = excluded.tracks_snapshot_id, updated_at = excluded.updated_at",
+        (playlist_id, total, snapshot_id, snapshot_id, now),
+    )
+
+
+class SQLiteTrackStore:
+    """Normalized tracks and playlist membership in a SQLite file shared by all workers."""
+
+    def __init__(self, path: str, sweep_interval: float = 3600.0, clock=time.time):
+        """Initialize the store and create its tables if needed.
+
+        Args:
+            path (str): Database file path.
+            sweep_interval (float): Minimum seconds between deletions of tracks
+                no stored playlist contains anymore.
+            clock (callable, optional): Time source, for tests.
+        """
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._last_sweep = clock()
+        self._counters_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        with self._connection() as conn:
+            # Creating the triggers and taking the initial counts is one transaction,
+            # so no concurrent write is counted twice or missed.
+            conn.execute("BEGIN IMMEDIATE")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            for name, query in INITIAL_COUNTS:
+                if conn.execute("SELECT 1 FROM store_counts WHERE name = ?", (name,)).fetchone() is None:
+                    conn.execute("INSERT INTO store_counts (name, value) VALUES (?, ?)",
+                                 (name, conn.execute(query).fetchone()[0]))
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads, nor with
+        # the workers a preloading gunicorn master forks after creating the store.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter: str):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_tracks(self, playlist_id: str, snapshot_id: str):
+        """Return the stored normalized tracks of a playlist snapshot in order, or None on a miss."""
+        rows = self._connection().execute(
+            SELECT_TRACKS + " ORDER BY pt.position", (playlist_id, snapshot_id)
+        ).fetchall()
+        if not rows:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return [_track(row) for row in rows]
+
+    def iter_track_pages(self, playlist_id: str, snapshot_id: str, page_size: int = 100):
+        """Yield the stored tracks of a playlist snapshot in order, one page per query.
+
+        Only one page is held in memory, and no cursor stays open between
+        pages, so the pages may be read from different threads. Yields nothing
+        on a miss.
+
+        Raises:
+            StaleSnapshotError: The snapshot was replaced while its pages were read.
+        """
+        stored = self._connection().execute(
+            "SELECT COUNT(*) FROM playlists p JOIN playlist_tracks pt ON pt.playlist_id = p.id "
+            "WHERE p.id = ? AND p.tracks_snapshot_id = ?", (playlist_id, snapshot_id),
+        ).fetchone()[0]
+        if not stored:
+            self._count("misses")
+            return
+        self._count("hits")
+        after = -1
+        while stored > 0:
+            rows = self._connection().execute(
+                SELECT_TRACKS + " AND pt.position > ? ORDER BY pt.position LIMIT ?",
+                (playlist_id, snapshot_id, after, page_size),
+            ).fetchall()
+            if not rows:
+                raise StaleSnapshotError(f"Stored tracks of playlist {playlist_id} were replaced")
+            stored -= len(rows)
+            after = rows[-1][0]
+            yield [_track(row) for row in rows]
+
+    def put_tracks(self, playlist_id: str, snapshot_id: str, tracks):
+        """Store the normalized tracks of a playlist snapshot, replacing its previous tracks.
+
+        Playlists with a track that has no URI are not stored.
+        """
+        if not snapshot_id or not tracks or any(not track.get("uri") for track in tracks):
+            return
+        now = self._clock()
+        with self._connection() as conn:
+            _upsert_tracks(conn, tracks)
+            conn.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+            conn.executemany(
+                "INSERT INTO playlist_tracks (playlist_id, position, uri) VALUES (?, ?, ?)",
+                ((playlist_id, track.get("position", index), track["uri"])
+                 for index, track in enumerate(tracks)),
+            )
+            _finish_playlist(conn, playlist_id, snapshot_id, len(tracks), now)
+            self._sweep(conn, now)
+        self._count("writes")
+
+    def track_writer(self, playlist_id: str, snapshot_id: str) -> TrackWriter:
+        """Return a `TrackWriter` storing a playlist snapshot page by page."""
+        return TrackWriter(self, playlist_id, snapshot_id)
+
+    def put_playlists(self, playlists):
+        """Record the name, size and snapshot of listed playlists.
+
+        The stored tracks of a listed playlist whose snapshot changed since
+        can never be served again and are dropped.
+
+        Args:
+            playlists (list): Playlist objects as returned by `current_user_playlists`.
+        """
+        rows = [(playlist["id"], playlist.get("name"), (playlist.get("tracks") or {}).get("total"),
+                 playlist.get("snapshot_id"))
+                for playlist in playlists if playlist.get("id")]
+        if not rows:
+            return
+        now = self._clock()
+        with self._connection() as conn:
+            conn.executemany(
+                "DELETE FROM playlist_tracks WHERE playlist_id = ? AND EXISTS ("
+                "SELECT 1 FROM playlists WHERE id = ? AND tracks_snapshot_id IS NOT ?)",
+                ((playlist_id, playlist_id, snapshot_id) for playlist_id, _, _, snapshot_id in rows),
+            )
+            conn.executemany(
+                "INSERT INTO playlists (id, name, total, snapshot_id, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, total = excluded.total, "
+                "snapshot_id = excluded.snapshot_id, updated_at = excluded.updated_at, "
+                "tracks_snapshot_id = CASE WHEN tracks_snapshot_id = excluded.snapshot_id "
+                "THEN tracks_snapshot_id END",
+                (row + (now,) for row in rows),
+            )
+            self._sweep(conn, now)
+
+    def _sweep(self, conn, now: float):
+        """Delete the tracks no stored or pending playlist contains, at most once per sweep interval.
+
+        Pages of a download older than the interval belong to a writer that
+        never finished, e.g. in a process that was killed, and are dropped.
+        """
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        conn.execute("DELETE FROM pending_tracks WHERE written_at < ?", (now - self.sweep_interval,))
+        conn.execute(
+            "DELETE FROM tracks WHERE NOT EXISTS ("
+            "SELECT 1 FROM playlist_tracks WHERE playlist_tracks.uri = tracks.uri) AND NOT EXISTS ("
+            "SELECT 1 FROM pending_tracks WHERE pending_tracks.uri = tracks.uri)"
+        )
+        self._last_sweep = now
+
+    def stats(self):
+        """Return this process' hit/miss/write counters and the stored playlists and tracks."""
+        counts = dict(self._connection().execute("SELECT name, value FROM store_counts"))
+        with self._counters_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "playlists": counts.get("playlists", 0),
+                "tracks": counts.get("tracks", 0),
+            }
+
+
+def create_track_store(url: str = ""):
+    """Build a track store from a URL, or return None when `url` is empty.
+
+    Args:
+        url (str): `sqlite:///relative.db` / `sqlite:////absolute.db`, or "" to
+            keep tracks in process memory only.
+
+    Raises:
+        ValueError: If the URL scheme is not supported.
+    """
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteTrackStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported track store URL: {url}")
@@ -0,0 +1,226 @@
+"""Compact, column-oriented storage of the track fields used for sorting.
+
+`get_all_tracks` keeps one dict per track, including the full `artists` and
+`album` objects returned by Spotify. Sorting only needs a handful of scalar
+keys, so `TrackTable` ingests playlist items straight into parallel columns
+and computes every sort key once. Ordering is done by index (argsort), using
+NumPy's `lexsort` when NumPy is installed.
+
+Genres and follower counts are not part of playlist items. Their columns
+stay empty until `add_artist_details` fills them from the first artist of
+every track.
+
+Filling every column costs more than extracting the one key a sort needs:
+with release dates not parsed before, a table of about a thousand tracks is
+slower to build and sort than a list of track dicts, though it needs less
+than half the memory (see benchmarks/track_table_bench.py). From a few
+thousand tracks on, and for playlists cached in the track cache, the table
+is faster as well.
+"""
+from array import array
+from functools import lru_cache
+
+# NumPy is optional and only imported by the first sort large enough to use it,
+# which keeps it out of the app's startup; the pure Python path gives the same order.
+_NOT_LOADED = object()
+np = _NOT_LOADED
+
+# Below this size the NumPy conversion costs more than it saves.
+NUMPY_MIN_ROWS = 256
+
+SORT_COLUMNS = {
+    "artist": "artist_keys",
+    "release": "release_ordinals",
+    "duration": "durations",
+    "popularity": "popularities",
+    "genre": "genres",
+    "artist_followers": "artist_followers",
+}
+# Sort keys whose columns come from the artists' details (see `add_artist_details`).
+ARTIST_SORT_KEYS = ("genre", "artist_followers")
+
+
+def _numpy():
+    """Return the numpy module, or None if it is not installed."""
+    global np
+    if np is _NOT_LOADED:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np
+
+
+# Tracks of one album, and albums of one release day, share a date; parsing each
+# distinct date once makes the release column the cheapest one to fill.
+@lru_cache(maxsize=1 << 16)
+def release_date_ordinal(date_str) -> int:
+    """Turn a YYYY, YYYY-MM or YYYY-MM-DD release date into a sortable integer."""
+    parts = (date_str or "").split('-')
+    year = int(parts[0]) if parts[0].isdigit() else 0
+    month = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+    day = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 1
+    return year * 10000 + month * 100 + day
+
+
+class TrackTable:
+    """Parallel columns of track URIs and precomputed sort keys."""
+
+    __slots__ = ("uris", "artist_keys", "release_ordinals", "durations", "popularities",
+                 "artist_ids", "genres", "artist_followers", "skipped")
+
+    def __init__(self):
+        self.uris = []
+        self.artist_keys = []
+        self.release_ordinals = array("q")
+        self.durations = array("q")
+        self.popularities = array("q")
+        self.artist_ids = []
+        self.genres = None
+        self.artist_followers = None
+        # Live playlist positions of the items without a track, which have no row.
+        self.skipped = array("q")
+
+    def __len__(self):
+        return len(self.uris)
+
+    def append(self, track: dict):
+        """Add one Spotify track object (or a normalized track dict)."""
+        self.extend_from_tracks((track,))
+
+    def extend_from_tracks(self, tracks):
+        """Add Spotify track objects (or normalized track dicts) in order.
+
+        Normalized tracks whose "position" is past the next live position
+        leave the positions in between as skipped items.
+        """
+        add_uri = self.uris.append
+        add_artist = self.artist_keys.append
+        add_release = self.release_ordinals.append
+        add_duration = self.durations.append
+        add_popularity = self.popularities.append
+        add_artist_id = self.artist_ids.append
+        # New rows have no artist details yet.
+        self.genres = self.artist_followers = None
+        skipped = self.skipped
+        for track in tracks:
+            position = track.get("position")
+            if position is not None:
+                while len(self.uris) + len(skipped) < position:
+                    skipped.append(len(self.uris) + len(skipped))
+            artists = track.get("artists") or []
+            album = track.get("album") or {}
+            add_uri(track.get("uri"))
+            add_artist((artists[0].get("name") or "").lower() if artists else "")
+            add_release(release_date_ordinal(album.get("release_date")))
+            add_duration(track.get("duration_ms") or 0)
+            add_popularity(track.get("popularity") or 0)
+            add_artist_id(artists[0].get("id") if artists else None)
+
+    def extend_from_items(self, items):
+        """Add the tracks of one `playlist_items` page, recording the positions of empty entries."""
+        uris = self.uris
+        skipped = self.skipped
+
+        def tracks():
+            # Consumed one track at a time, so `uris` counts the rows before this item.
+            for item in items:
+                track = item.get("track") if item else None
+                if track:
+                    yield track
+                else:
+                    skipped.append(len(uris) + len(skipped))
+
+        self.extend_from_tracks(tracks())
+
+    def current_uris(self):
+        """Return the URIs at their live playlist positions, with None for skipped items."""
+        if not self.skipped:
+            return self.uris
+        uris = iter(self.uris)
+        skipped = set(self.skipped)
+        return [None if position in skipped else next(uris)
+                for position in range(len(self.uris) + len(skipped))]
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        """Build a table from normalized track dicts."""
+        table = cls()
+        table.extend_from_tracks(tracks)
+        return table
+
+    def needs_artist_details(self, keys) -> bool:
+        """Return whether sorting by `(key, reverse)` pairs needs `add_artist_details` first."""
+        return self.genres is None and any(key in ARTIST_SORT_KEYS for key, _ in keys)
+
+    def add_artist_details(self, artists: dict):
+        """Fill the genre and follower columns from the details of every row's first artist.
+
+        Args:
+            artists (dict): `{"genres": ..., "followers": ...}` per artist id,
+                as returned by `fetch_artists`. Unknown artists count as having
+                no genre and no followers.
+        """
+        genres = []
+        followers = array("q")
+        for artist_id in self.artist_ids:
+            details = artists.get(artist_id) or {}
+            # Spotify lists an artist's genres without a ranking; the first one is the key.
+            genres.append((details.get("genres") or ("",))[0].lower())
+            followers.append(details.get("followers") or 0)
+        # `genres` goes last: other threads sorting a cached table check it first.
+        self.artist_followers = followers
+        self.genres = genres
+
+    def column(self, key: str):
+        """Return the column backing a sort key such as "artist" or "release".
+
+        Raises:
+            ValueError: If the key needs artist details the table does not have yet.
+        """
+        values = getattr(self, SORT_COLUMNS[key])
+        if values is None:
+            raise ValueError(f"Sorting by {key} needs the artists' details; call add_artist_details first.")
+        return values
+
+    def argsort(self, keys):
+        """Return the row indices ordered by one or more sort keys.
+
+        The sort is stable: rows with equal keys keep their playlist order,
+        in both ascending and descending directions.
+
+        Args:
+            keys (list): `(key, reverse)` pairs, most significant first.
+
+        Returns:
+            list: Row indices in sorted order.
+        """
+        if len(self) >= NUMPY_MIN_ROWS and _numpy() is not None:
+            return self._argsort_numpy(keys)
+
+        # One stable sort per key, least significant first. A reversed sort
+        # still keeps equal rows in their order, so ties stay in playlist order.
+        order = list(range(len(self)))
+        for key, reverse in reversed(keys):
+            order.sort(key=self.column(key).__getitem__, reverse=reverse)
+        return order
+
+    def _argsort_numpy(self, keys):
+        columns = []
+        # lexsort treats its last key as the primary one.
+        for key, reverse in reversed(keys):
+            values = self.column(key)
+            if isinstance(values, array):
+                ranks = np.frombuffer(values, dtype=np.int64)
+            else:
+                # Ranking the distinct strings in Python beats np.unique on a string array.
+                rank_of = {value: rank for rank, value in enumerate(sorted(set(values)))}
+                ranks = np.fromiter(map(rank_of.__getitem__, values), dtype=np.int64, count=len(values))
+            columns.append(-ranks if reverse else ranks)
+        return np.lexsort(columns).tolist()
+
+    def take_uris(self, order):
+        """Return the URIs of the given rows."""
+        uris = self.uris
+        return [uris[index] for index in order]
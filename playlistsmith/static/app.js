@@ -9,11 +9,15 @@ const sortStatus = document.getElementById('sort-status')
 const playlistCount = document.getElementById('playlist-count')
 const methodButtons = Array.from(document.querySelectorAll('.method-btn'))
 const orderSelect = document.getElementById('sort-direction')
+const tracksPanel = document.getElementById('tracks-panel')
+const tracksList = document.getElementById('tracks')
+const trackCount = document.getElementById('track-count')
 
 const state = {
   authenticated: false,
   selectedPlaylist: null,
-  playlists: []
+  playlists: [],
+  tracksRequest: null
 }
 
 function updateAuthUi() {
@@ -71,12 +75,77 @@ function renderPlaylists(items) {
       state.selectedPlaylist = playlist
       renderPlaylists(state.playlists)
       updateSelectionUi()
+      void loadTracks(playlist.id)
     })
 
     playlistsGrid.appendChild(card)
   })
 }
 
+function formatDuration(ms) {
+  const minutes = Math.floor(ms / 60000)
+  const seconds = Math.floor((ms % 60000) / 1000)
+  return `${minutes}:${String(seconds).padStart(2, '0')}`
+}
+
+function appendTrackRow(track) {
+  const row = document.createElement('li')
+  const title = document.createElement('span')
+  title.textContent = track.name || 'Unknown'
+  const meta = document.createElement('span')
+  meta.className = 'track-meta'
+  meta.textContent = ` — ${track.artists.join(', ')} · ${track.album || 'Unknown'} · ${formatDuration(track.duration_ms || 0)}`
+  row.appendChild(title)
+  row.appendChild(meta)
+  tracksList.appendChild(row)
+}
+
+// Stream the selected playlist's tracks and render each page as soon as it arrives.
+async function loadTracks(playlistId) {
+  state.tracksRequest?.abort()
+  const controller = new AbortController()
+  state.tracksRequest = controller
+
+  tracksPanel?.classList.remove('hidden')
+  tracksList.innerHTML = ''
+  trackCount.textContent = 'Loading…'
+
+  let loaded = 0
+  try {
+    const res = await fetch(`/playlists/${encodeURIComponent(playlistId)}/tracks`, {
+      credentials: 'same-origin',
+      signal: controller.signal
+    })
+    if (!res.ok || !res.body) {
+      trackCount.textContent = 'Unable to load tracks.'
+      return
+    }
+
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) {
+        break
+      }
+      buffer += decoder.decode(value, { stream: true })
+      const lines = buffer.split('\n')
+      buffer = lines.pop()
+      lines.filter(Boolean).forEach((line) => {
+        appendTrackRow(JSON.parse(line))
+        loaded += 1
+      })
+      trackCount.textContent = `${loaded} track${loaded === 1 ? '' : 's'}…`
+    }
+    trackCount.textContent = `${loaded} track${loaded === 1 ? '' : 's'}`
+  } catch (error) {
+    if (error.name !== 'AbortError') {
+      trackCount.textContent = 'Unable to load tracks.'
+    }
+  }
+}
+
 // Load the current user's playlists and show them immediately after login.
 async function listPlaylists() {
   authStatus.textContent = 'Loading playlists...'
@@ -105,29 +174,98 @@ async function listPlaylists() {
   }
 }
 
-// Reorder the selected playlist without deleting any tracks; only the order changes.
-async function sortPlaylist(playlistId, method, direction) {
-  if (!state.authenticated) {
-    alert('Please login first')
-    return
+// Describe the phase of a background job for the status line.
+function describeJob(job) {
+  if (job.phase === 'fetching') {
+    return `Fetching tracks… (${job.pages_fetched} page${job.pages_fetched === 1 ? '' : 's'} loaded)`
+  }
+  if (job.phase === 'sorting') {
+    return 'Computing the new order…'
   }
+  if (job.phase === 'writing') {
+    return `Saving changes… (${job.batches_written} batch${job.batches_written === 1 ? '' : 'es'} written)`
+  }
+  return 'Waiting for a free worker…'
+}
+
+// Poll the job status endpoint until the job is done or failed.
+async function pollJob(statusUrl, onUpdate) {
+  while (true) {
+    const res = await fetch(statusUrl, { credentials: 'same-origin' })
+    if (!res.ok) {
+      return { status: 'failed', error: res.statusText || res.status }
+    }
+    const job = await res.json()
+    onUpdate(job)
+    if (job.status === 'done' || job.status === 'failed') {
+      return job
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000))
+  }
+}
 
-  const res = await fetch('/sort', {
+// Follow a background job, streaming progress when the browser supports it.
+function waitForJob(submitted, onUpdate) {
+  if (!window.EventSource) {
+    return pollJob(submitted.status_url, onUpdate)
+  }
+  return new Promise((resolve) => {
+    const source = new EventSource(submitted.events_url)
+    source.onmessage = (event) => {
+      const job = JSON.parse(event.data)
+      onUpdate(job)
+      if (job.status === 'done' || job.status === 'failed') {
+        source.close()
+        resolve(job)
+      }
+    }
+    source.onerror = () => {
+      source.close()
+      resolve(pollJob(submitted.status_url, onUpdate))
+    }
+  })
+}
+
+// Submit a playlist operation as a background job and report its progress.
+async function runJob(url, body) {
+  const res = await fetch(url, {
     method: 'POST',
     credentials: 'same-origin',
     headers: {
       'Content-Type': 'application/json'
     },
-    body: JSON.stringify({ playlist_id: playlistId, method, direction })
+    body: JSON.stringify({ ...body, background: true })
   })
 
   const data = await res.json().catch(() => null)
   if (!res.ok) {
-    sortStatus.textContent = `Sort failed: ${data?.detail || res.status}`
+    return { status: 'failed', error: data?.detail || res.status }
+  }
+
+  return waitForJob(data, (job) => {
+    sortStatus.textContent = describeJob(job)
+  })
+}
+
+// Reorder the selected playlist without deleting any tracks; only the order changes.
+async function sortPlaylist(playlistId, method, direction) {
+  if (!state.authenticated) {
+    alert('Please login first')
+    return
+  }
+
+  sortStatus.textContent = 'Starting sort…'
+  const job = await runJob('/sort', { playlist_id: playlistId, method, direction })
+  if (job.status !== 'done') {
+    sortStatus.textContent = `Sort failed: ${job.error}`
     return
   }
 
-  sortStatus.textContent = `Reordered ${state.selectedPlaylist?.name || 'the selected playlist'} by ${method} (${direction}). No tracks were removed.`
+  const name = state.selectedPlaylist?.name || 'the selected playlist'
+  sortStatus.textContent = method === 'shuffle'
+    ? `Shuffled ${name} with artists spread out (seed ${job.result?.seed}). No tracks were removed.`
+    : `Reordered ${name} by ${method.replace('_', ' ')} (${direction}). No tracks were removed.`
+  void loadTracks(playlistId)
 }
 
 // Remove duplicate tracks while preserving the first copy of each song.
@@ -137,22 +275,15 @@ async function removeDuplicates(playlistId) {
     return
   }
 
-  const res = await fetch('/remove_duplicates', {
-    method: 'POST',
-    credentials: 'same-origin',
-    headers: {
-      'Content-Type': 'application/json'
-    },
-    body: JSON.stringify({ playlist_id: playlistId })
-  })
-
-  const data = await res.json().catch(() => null)
-  if (!res.ok) {
-    sortStatus.textContent = `Cleanup failed: ${data?.detail || res.status}`
+  sortStatus.textContent = 'Starting cleanup…'
+  const job = await runJob('/remove_duplicates', { playlist_id: playlistId })
+  if (job.status !== 'done') {
+    sortStatus.textContent = `Cleanup failed: ${job.error}`
     return
   }
 
   sortStatus.textContent = `Removed duplicate tracks from ${state.selectedPlaylist?.name || 'the selected playlist'}.`
+  void loadTracks(playlistId)
 }
 
 loginBtn?.addEventListener('click', () => {
@@ -167,6 +298,8 @@ logoutBtn?.addEventListener('click', async () => {
   state.authenticated = false
   state.selectedPlaylist = null
   state.playlists = []
+  state.tracksRequest?.abort()
+  tracksPanel?.classList.add('hidden')
   renderPlaylists([])
   updateAuthUi()
   updateSelectionUi()
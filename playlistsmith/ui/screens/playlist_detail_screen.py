@@ -84,41 +84,69 @@ class PlaylistDetailScreen(customtkinter.CTkFrame):
     def load_songs(self, container):
         """Load and display songs from the playlist using PlaylistSorter.
 
+        Songs are rendered page by page as they arrive from Spotify, so the
+        first rows show up after a single request.
+
         Args:
             container: The parent widget for the songs list.
         """
         try:
-            # Use PlaylistSorter to get all songs
+            # Use PlaylistSorter to stream the songs page by page
             sorter = PlaylistSorter(self.spotify_client, self.playlist['id'])
-            all_tracks = sorter.get_all_tracks()
-
-            # Display the songs
-            # Start at 2 for the header
-            for idx, track in enumerate(all_tracks, start=2):
-                artists = ", ".join([artist["name"]
-                                    for artist in track.get("artists", [])])
-                duration_str = self.format_duration(
-                    track.get("duration_ms", 0))
-
-                data = [
-                    track.get("name", "Unknown"),
-                    artists,
-                    track.get("album", {}).get("name", "Unknown"),
-                    duration_str
-                ]
-
-                for col, value in enumerate(data):
-                    customtkinter.CTkLabel(
-                        container,
-                        text=value,
-                        anchor="w",
-                        font=("Arial", 13),
-                        text_color=("gray50", "gray70") if col != 0 else None,
-                        wraplength=150  # Max for long titles
-                    ).grid(row=idx, column=col, sticky="w", padx=10, pady=(0, 5))
+            pages = sorter.iter_track_pages()
+        except Exception as e:
+            print(f"Error loading songs: {e}")
+            return
+
+        # Start at 2 for the header
+        self._render_next_page(container, pages, 2)
+
+    def _render_next_page(self, container, pages, row):
+        """Render one page of songs and schedule the next one.
 
+        Args:
+            container: The parent widget for the songs list.
+            pages: Iterator over pages of tracks.
+            row (int): Grid row of the first song of this page.
+        """
+        if not container.winfo_exists():
+            pages.close()
+            return
+
+        try:
+            page = next(pages, None)
         except Exception as e:
             print(f"Error loading songs: {e}")
+            return
+        if page is None:
+            return
+
+        # Display the songs
+        for idx, track in enumerate(page, start=row):
+            artists = ", ".join([artist["name"]
+                                for artist in track.get("artists", [])])
+            duration_str = self.format_duration(
+                track.get("duration_ms", 0))
+
+            data = [
+                track.get("name", "Unknown"),
+                artists,
+                track.get("album", {}).get("name", "Unknown"),
+                duration_str
+            ]
+
+            for col, value in enumerate(data):
+                customtkinter.CTkLabel(
+                    container,
+                    text=value,
+                    anchor="w",
+                    font=("Arial", 13),
+                    text_color=("gray50", "gray70") if col != 0 else None,
+                    wraplength=150  # Max for long titles
+                ).grid(row=idx, column=col, sticky="w", padx=10, pady=(0, 5))
+
+        # Let Tk draw this page before fetching the next one
+        self.after(1, self._render_next_page, container, pages, row + len(page))
 
     def show_sort_menu(self):
         """Display the main sorting options menu."""
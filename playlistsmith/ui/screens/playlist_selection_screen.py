@@ -3,6 +3,7 @@ from io import BytesIO
 import os
 from PIL import Image
 import customtkinter
+from playlistsmith.services.playlists import fetch_all_playlists
 
 class PlaylistSelectionScreen(customtkinter.CTkFrame):
     """A screen that displays a grid of the user's Spotify playlists for selection."""
@@ -35,8 +36,8 @@ class PlaylistSelectionScreen(customtkinter.CTkFrame):
         for i in range(3):
             container.columnconfigure(i, weight=1)
 
-        # Get user's playlists
-        playlists = self.spotify_client.current_user_playlists().get('items', [])
+        # Get all of the user's playlists, not just the first page
+        playlists = fetch_all_playlists(self.spotify_client)
 
         # Create a button for each playlist
         for idx, playlist in enumerate(playlists):
@@ -1,12 +1,37 @@
 import os
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
-from starlette.middleware.proxy_headers import ProxyHeadersMiddleware
-from playlistsmith.api import router as api_router
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+from playlistsmith.api import METRICS, close_async_http, router as api_router
+from playlistsmith.services.metrics import MetricsMiddleware
+from playlistsmith.services.tracing import TracingMiddleware
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI(title="PlaylistSmith SaaS", version="0.1.0")
+# Threads available to the synchronous endpoints of each worker (anyio's default is 40).
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "0"))
+# Share of requests traced at random, and where their trace files go.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_DIR = os.getenv("TRACE_DIR") or None
+# Let clients ask for a trace with `X-Trace: 1`; only enable where clients are trusted.
+TRACE_ALLOW_HEADER = os.getenv("TRACE_ALLOW_HEADER", "false").lower() in ("1", "true", "yes")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if THREADPOOL_SIZE > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+    await close_async_http()
+
+
+app = FastAPI(title="PlaylistSmith SaaS", version="0.1.0", lifespan=lifespan)
 app.include_router(api_router)
+app.add_middleware(TracingMiddleware, sample_rate=TRACE_SAMPLE_RATE, trace_dir=TRACE_DIR,
+                   allow_header=TRACE_ALLOW_HEADER)
+app.add_middleware(MetricsMiddleware, registry=METRICS)
 
 # Respect proxy headers (X-Forwarded-For, X-Forwarded-Proto, X-Forwarded-Host)
 # so `request.url_for("callback")` builds correct external URLs behind a reverse proxy.
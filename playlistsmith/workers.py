@@ -0,0 +1,13 @@
+"""gunicorn worker class of the production server profile (`gunicorn.conf.py`)."""
+from uvicorn.workers import UvicornWorker as _UvicornWorker
+
+
+class UvicornWorker(_UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools.
+
+    uvicorn's default ("auto") quietly falls back to asyncio and h11 when the
+    faster implementations are missing; this worker fails to boot instead, so
+    an image without them does not go to production unnoticed.
+    """
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,141 @@
+"""Fakes shared by the tests and the offline benchmarks.
+
+`FakeSpotifyClient` keeps one playlist in memory and implements the spotipy
+calls `PlaylistSorter` makes, with the same paging and reorder semantics as
+the Web API. `AsyncFakeSpotifyClient` serves the same playlist to
+`AsyncPlaylistSorter`, and `FakeClock` stands in for the time source of the
+caches and stores.
+"""
+import asyncio
+import threading
+import time
+
+
+class FakeClock:
+    """A time source that only moves when a test sets `now`."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_track(number, artist, popularity=0):
+    return {
+        "id": str(number),
+        "uri": f"spotify:track:{number}",
+        "name": f"Track {number}",
+        "artists": [{"name": artist}],
+        "album": {"name": "Album", "release_date": "2020-01-01"},
+        "duration_ms": 1000 * number,
+        "popularity": popularity,
+    }
+
+
+class FakeSpotifyClient:
+    """A thread-safe, in-memory playlist that records the calls made to it."""
+
+    def __init__(self, tracks, latency: float = 0.0, artist_lookup=None):
+        """Initialize the fake.
+
+        Args:
+            tracks (list): Spotify track objects in playlist order. None stands
+                for an item without a track, e.g. a song removed from Spotify.
+            latency (float, optional): Seconds every call sleeps before answering.
+            artist_lookup (callable, optional): Returns the Spotify artist object
+                of an id. Defaults to looking the id up in `artist_catalog`.
+        """
+        self.tracks = list(tracks)
+        self.catalog = {track["uri"]: track for track in tracks if track}
+        self.latency = latency
+        self.artist_catalog = {}
+        self.artist_lookup = artist_lookup
+        # Method names in call order.
+        self.calls = []
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _call(self, method: str):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append(method)
+
+    def _snapshot(self):
+        return {"snapshot_id": f"snapshot-{self.version}"}
+
+    def playlist(self, playlist_id, fields=None):
+        self._call("playlist")
+        with self._lock:
+            return self._snapshot()
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self._call("current_user_playlists")
+        with self._lock:
+            playlist = {
+                "id": "playlist",
+                "name": "Playlist",
+                "snapshot_id": self._snapshot()["snapshot_id"],
+                "tracks": {"total": len(self.tracks)},
+                "images": [],
+            }
+        return {"items": [playlist][offset:offset + limit], "next": None, "total": 1}
+
+    def playlist_items(self, playlist_id, limit=100, offset=0, fields=None):
+        self._call("playlist_items")
+        with self._lock:
+            page = self.tracks[offset:offset + limit]
+            total = len(self.tracks)
+        return {
+            "items": [{"track": track} for track in page],
+            "next": "next" if offset + limit < total else None,
+            "total": total,
+        }
+
+    def artists(self, artists):
+        self._call("artists")
+        lookup = self.artist_lookup or self.artist_catalog.get
+        return {"artists": [lookup(artist_id) for artist_id in artists]}
+
+    def playlist_replace_items(self, playlist_id, items):
+        self._call("playlist_replace_items")
+        with self._lock:
+            self.tracks = [self.catalog[uri] for uri in items]
+            self.version += 1
+            return self._snapshot()
+
+    def playlist_add_items(self, playlist_id, items):
+        self._call("playlist_add_items")
+        with self._lock:
+            self.tracks.extend(self.catalog[uri] for uri in items)
+            self.version += 1
+            return self._snapshot()
+
+    def playlist_reorder_items(self, playlist_id, range_start, insert_before,
+                               range_length=1, snapshot_id=None):
+        self._call("playlist_reorder_items")
+        with self._lock:
+            chunk = self.tracks[range_start:range_start + range_length]
+            del self.tracks[range_start:range_start + range_length]
+            if insert_before > range_start:
+                insert_before -= range_length
+            self.tracks[insert_before:insert_before] = chunk
+            self.version += 1
+            return self._snapshot()
+
+
+class AsyncFakeSpotifyClient:
+    """Awaitable view of `FakeSpotifyClient`."""
+
+    def __init__(self, tracks):
+        self.fake = FakeSpotifyClient(tracks)
+
+    def __getattr__(self, name):
+        method = getattr(self.fake, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return call
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from playlistsmith import api
+from playlistsmith.services.playlist_locks import PlaylistLocks
+from playlistsmith.services.track_cache import TrackCache
+from playlistsmith.web_app import app
+from tests.helpers import AsyncFakeSpotifyClient, FakeSpotifyClient, make_track
+
+
+class ApiTestCase(unittest.TestCase):
+    """Calls the app in-process with a logged-in session and fake Spotify clients."""
+
+    def setUp(self):
+        self.fake = FakeSpotifyClient([make_track(number, "CAB"[number % 3]) for number in range(150)])
+        async_client = AsyncFakeSpotifyClient([])
+        # Both client kinds serve the same playlist.
+        async_client.fake = self.fake
+        self.patch("_async_client", lambda session_id, token_info: async_client)
+        self.patch("_scheduled_client", lambda session_id, token_info: self.fake)
+        self.patch("TRACK_CACHE", TrackCache())
+
+        self.session_id = f"session-{id(self)}"
+        api.SESSION_STORE.set(self.session_id, {
+            "access_token": "token",
+            "refresh_token": "refresh",
+            "expires_at": int(time.time()) + 3600,
+        })
+        self.addCleanup(api.SESSION_STORE.delete, self.session_id)
+        self.client = TestClient(app)
+        self.client.cookies.set("session_id", self.session_id)
+
+    def patch(self, name, value):
+        patcher = mock.patch.object(api, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def artists(self):
+        return [track["artists"][0]["name"] for track in self.fake.tracks]
+
+
+class PlaylistListTests(ApiTestCase):
+    def test_unchanged_playlists_are_answered_with_304_until_a_write(self):
+        first = self.client.get("/playlists")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([item["snapshot_id"] for item in first.json()["items"]], ["snapshot-0"])
+        etag = first.headers["etag"]
+
+        unchanged = self.client.get("/playlists", headers={"If-None-Match": etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.headers["etag"], etag)
+
+        self.assertEqual(self.client.post("/sort", json={"playlist_id": "playlist"}).status_code, 200)
+        changed = self.client.get("/playlists", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+
+    def test_requests_without_a_session_are_rejected(self):
+        self.client.cookies.clear()
+
+        self.assertEqual(self.client.get("/playlists").status_code, 401)
+
+
+class TrackStreamTests(ApiTestCase):
+    def test_tracks_are_streamed_as_one_json_line_each_in_playlist_order(self):
+        with self.client.stream("GET", "/playlists/playlist/tracks") as response:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+            rows = [json.loads(line) for line in response.iter_lines() if line]
+
+        self.assertEqual([row["position"] for row in rows], list(range(150)))
+        self.assertEqual([row["uri"] for row in rows], [track["uri"] for track in self.fake.tracks])
+        self.assertEqual(rows[1]["artists"], ["A"])
+        self.assertEqual(self.fake.calls.count("playlist_items"), 2)
+
+
+class DryRunTests(ApiTestCase):
+    WRITES = {"playlist_replace_items", "playlist_add_items", "playlist_reorder_items"}
+
+    def test_dry_run_sort_returns_a_preview_and_writes_nothing(self):
+        before = list(self.fake.tracks)
+
+        response = self.client.post("/sort", json={
+            "playlist_id": "playlist", "method": "artist", "direction": "ascending", "dry_run": True,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        preview = response.json()["preview"]
+        self.assertEqual(preview["tracks_before"], 150)
+        self.assertEqual(preview["tracks_after"], 150)
+        self.assertIn(preview["strategy"], ("moves", "rewrite"))
+        self.assertEqual(self.fake.tracks, before)
+        self.assertFalse(self.WRITES & set(self.fake.calls))
+
+    def test_dry_run_remove_duplicates_previews_the_removed_positions(self):
+        self.fake.tracks.append(self.fake.tracks[0])
+
+        response = self.client.post("/remove_duplicates", json={"playlist_id": "playlist", "dry_run": True})
+
+        self.assertEqual(response.status_code, 200)
+        preview = response.json()["preview"]
+        self.assertEqual((preview["tracks_before"], preview["tracks_after"]), (151, 150))
+        self.assertEqual(preview["removed"], [[150, 1]])
+        self.assertEqual(len(self.fake.tracks), 151)
+        self.assertFalse(self.WRITES & set(self.fake.calls))
+
+
+class BatchTests(ApiTestCase):
+    def test_batches_over_the_item_limit_are_rejected_with_422(self):
+        items = [{"playlist_id": f"playlist-{index}"} for index in range(api.BATCH_MAX_ITEMS + 1)]
+
+        response = self.client.post("/batch", json={"items": items})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertNotIn("playlist_items", self.fake.calls)
+
+    def test_items_of_one_playlist_run_in_request_order(self):
+        self.fake.tracks.append(self.fake.tracks[0])
+
+        response = self.client.post("/batch", json={"items": [
+            {"playlist_id": "playlist", "operation": "remove_duplicates"},
+            {"playlist_id": "playlist", "method": "artist", "direction": "ascending"},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["status"] for item in response.json()["items"]], ["ok", "ok"])
+        self.assertEqual(len(self.fake.tracks), 150)
+        self.assertEqual(self.artists(), sorted(self.artists()))
+
+
+class PlaylistLockTests(ApiTestCase):
+    def test_writes_to_a_playlist_that_stays_locked_answer_409(self):
+        locks = PlaylistLocks(wait_timeout=0.05)
+        self.patch("PLAYLIST_LOCKS", locks)
+        holding, release = threading.Event(), threading.Event()
+
+        def hold():
+            holding.set()
+            release.wait(5)
+
+        holder = threading.Thread(target=locks.run, args=("playlist", hold))
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        holding.wait(5)
+
+        response = self.client.post("/sort", json={"playlist_id": "playlist"})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn("playlist_reorder_items", self.fake.calls)
+        self.assertNotIn("playlist_replace_items", self.fake.calls)
+
+
+class JobTests(ApiTestCase):
+    def test_background_sort_answers_202_and_streams_progress_until_done(self):
+        response = self.client.post("/sort", json={
+            "playlist_id": "playlist", "method": "artist", "direction": "ascending", "background": True,
+        })
+
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job["status_url"], f"/jobs/{job['job_id']}")
+        with self.client.stream("GET", job["events_url"]) as events:
+            self.assertEqual(events.headers["content-type"], "text/event-stream; charset=utf-8")
+            states = [json.loads(line[len("data: "):]) for line in events.iter_lines()
+                      if line.startswith("data: ")]
+        self.assertEqual(states[-1]["status"], "done")
+        self.assertEqual(self.client.get(job["status_url"]).json()["status"], "done")
+        self.assertEqual(self.artists(), sorted(self.artists()))
+
+    def test_jobs_of_other_sessions_are_not_found(self):
+        job = self.client.post("/sort", json={"playlist_id": "playlist", "background": True}).json()
+
+        other = TestClient(app)
+        api.SESSION_STORE.set("other-session", api.SESSION_STORE.get(self.session_id))
+        self.addCleanup(api.SESSION_STORE.delete, "other-session")
+        other.cookies.set("session_id", "other-session")
+
+        self.assertEqual(other.get(job["status_url"]).status_code, 404)
+        self.assertEqual(other.get(job["events_url"]).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
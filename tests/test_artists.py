@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import unittest
+
+from playlistsmith.services.artists import ArtistCache, afetch_artists, fetch_artists
+from tests.helpers import FakeClock
+
+
+class FakeArtistsClient:
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def artists(self, artists):
+        with self._lock:
+            self.batches.append(list(artists))
+        return {"artists": [None if artist_id == "gone" else
+                            {"id": artist_id, "genres": [f"genre of {artist_id}"],
+                             "followers": {"total": len(artist_id)}}
+                            for artist_id in artists]}
+
+
+class AsyncFakeArtistsClient(FakeArtistsClient):
+    async def artists(self, artists):
+        await asyncio.sleep(0)
+        return FakeArtistsClient.artists(self, artists)
+
+
+class ArtistCacheTests(unittest.TestCase):
+    def test_entries_expire_and_evict_least_recently_used(self):
+        clock = FakeClock()
+        cache = ArtistCache(max_artists=2, ttl=10, clock=clock)
+        cache.put_many({"a": {"followers": 1}, "b": {"followers": 2}})
+        cache.get_many(["a"])
+        cache.put_many({"c": {"followers": 3}})
+
+        self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+        clock.now += 11
+        self.assertEqual(cache.get_many(["a", "c"]), {})
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 3, "evictions": 1, "artists": 0})
+
+
+class FetchArtistsTests(unittest.TestCase):
+    def test_distinct_artists_are_fetched_fifty_per_call_and_cached(self):
+        artist_ids = [f"artist{number % 120}" for number in range(5000)] + [None]
+        client = FakeArtistsClient()
+        cache = ArtistCache()
+
+        artists = fetch_artists(client, artist_ids, cache, concurrency=3)
+        again = fetch_artists(client, artist_ids, cache)
+
+        self.assertEqual(sorted(len(batch) for batch in client.batches), [20, 50, 50])
+        self.assertEqual(len(artists), 120)
+        self.assertEqual(artists["artist7"], {"genres": ("genre of artist7",), "followers": 7})
+        self.assertEqual(again, artists)
+
+    def test_unknown_artists_get_empty_details(self):
+        artists = fetch_artists(FakeArtistsClient(), ["gone", "here"])
+
+        self.assertEqual(artists["gone"], {"genres": (), "followers": 0})
+        self.assertEqual(artists["here"]["followers"], 4)
+
+    def test_async_fetch_only_requests_missing_artists(self):
+        client = AsyncFakeArtistsClient()
+        cache = ArtistCache()
+        cache.put_many({"artist0": {"genres": ("cached",), "followers": 0}})
+
+        artists = asyncio.run(afetch_artists(client, [f"artist{number}" for number in range(60)], cache))
+
+        self.assertEqual(artists["artist0"]["genres"], ("cached",))
+        self.assertEqual(sorted(len(batch) for batch in client.batches), [9, 50])
+        self.assertEqual(cache.stats()["artists"], 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
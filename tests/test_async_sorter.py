@@ -0,0 +1,262 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from spotipy.exceptions import SpotifyException
+
+from playlistsmith.services.async_sorter import AsyncPlaylistSorter
+from playlistsmith.services.async_spotify import AsyncHTTPPool, AsyncSpotifyClient
+from playlistsmith.services.playlists import afetch_all_playlists
+from playlistsmith.services.sort_playlist import PlaylistSorter, PlaylistSorterBase
+from playlistsmith.services.track_cache import TrackCache
+from playlistsmith.services.track_store import SQLiteTrackStore
+from tests.helpers import AsyncFakeSpotifyClient, FakeSpotifyClient, make_track
+
+
+class AsyncPlaylistSorterTests(unittest.TestCase):
+    def test_sort_uses_range_moves_like_the_sync_sorter(self):
+        artists = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"] * 15
+        tracks = [make_track(i, artist) for i, artist in enumerate(sorted(artists))]
+        tracks.append(tracks.pop(0))
+        client = AsyncFakeSpotifyClient(tracks)
+
+        stats = asyncio.run(AsyncPlaylistSorter(client, "playlist").sort_by_keys([("artist", False)]))
+
+        self.assertEqual(stats["strategy"], "moves")
+        self.assertEqual(stats["api_calls"], 1)
+        self.assertEqual([t["artists"][0]["name"] for t in client.fake.tracks], sorted(artists))
+
+    def test_shares_the_base_but_not_the_blocking_methods(self):
+        sorter = AsyncPlaylistSorter(AsyncFakeSpotifyClient([]), "playlist")
+
+        self.assertIsInstance(sorter, PlaylistSorterBase)
+        self.assertNotIsInstance(sorter, PlaylistSorter)
+
+    def test_parallel_fetch_keeps_playlist_order(self):
+        client = AsyncFakeSpotifyClient([make_track(i, "A") for i in range(1050)])
+
+        tracks = asyncio.run(AsyncPlaylistSorter(client, "playlist", fetch_concurrency=4).get_all_tracks())
+
+        self.assertEqual([t["id"] for t in tracks], [str(i) for i in range(1050)])
+        self.assertEqual(client.fake.calls.count("playlist_items"), 11)
+
+    def test_remove_duplicates_rewrites_and_invalidates_the_cache(self):
+        track = make_track(1, "A")
+        client = AsyncFakeSpotifyClient([track, make_track(2, "B"), track])
+        cache = TrackCache()
+
+        stats = asyncio.run(AsyncPlaylistSorter(client, "playlist", track_cache=cache).remove_duplicates())
+
+        self.assertEqual(stats["strategy"], "rewrite")
+        self.assertEqual([t["uri"] for t in client.fake.tracks], ["spotify:track:1", "spotify:track:2"])
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_dry_run_previews_without_writing(self):
+        track = make_track(1, "A")
+        client = AsyncFakeSpotifyClient([track, make_track(2, "B"), track, track])
+
+        preview = asyncio.run(AsyncPlaylistSorter(client, "playlist").remove_duplicates(dry_run=True))
+
+        self.assertEqual(preview["removed"], [[2, 2]])
+        self.assertEqual(client.fake.calls, ["playlist_items"])
+
+    def test_streamed_pages_fill_the_track_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = SQLiteTrackStore(os.path.join(directory.name, "tracks.db"))
+        client = AsyncFakeSpotifyClient([make_track(i, "A") for i in range(150)])
+
+        async def stream():
+            return [page async for page in AsyncPlaylistSorter(client, "playlist", track_store=store)
+                    .iter_track_pages()]
+
+        first = asyncio.run(stream())
+        table = asyncio.run(AsyncPlaylistSorter(client, "playlist", track_store=store).get_track_table())
+
+        self.assertEqual(first, asyncio.run(stream()))
+        self.assertEqual(table.uris, [f"spotify:track:{i}" for i in range(150)])
+        self.assertEqual(client.fake.calls.count("playlist_items"), 2)
+
+    def test_shuffle_matches_the_sync_sorter_for_a_seed(self):
+        tracks = [make_track(i, "ABCD"[i % 4]) for i in range(40)]
+        client = AsyncFakeSpotifyClient(tracks)
+        expected = FakeSpotifyClient(tracks)
+
+        stats = asyncio.run(AsyncPlaylistSorter(client, "playlist").shuffle(seed=9, min_gap=3))
+        PlaylistSorter(expected, "playlist").shuffle(seed=9, min_gap=3)
+
+        self.assertEqual((stats["seed"], stats["min_gap"]), (9, 3))
+        self.assertEqual([t["uri"] for t in client.fake.tracks], [t["uri"] for t in expected.tracks])
+
+
+class AsyncSpotifyClientTests(unittest.TestCase):
+    @staticmethod
+    def _client(handler):
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return AsyncSpotifyClient("token", http, api_url="http://stub/v1", backoff_factor=0)
+
+    def test_requests_match_spotipy(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"snapshot_id": "s1"})
+
+        client = self._client(handler)
+
+        async def main():
+            await client.playlist_items("p1", fields="items", limit=100, offset=200)
+            await client.playlist_add_items("p1", ["1", "spotify:track:2"], position=3)
+            return await client.playlist_reorder_items("p1", range_start=5, insert_before=0, snapshot_id="s0")
+
+        self.assertEqual(asyncio.run(main()), {"snapshot_id": "s1"})
+        items, add, reorder = requests
+        self.assertEqual(items.url.path, "/v1/playlists/p1/items")
+        self.assertEqual(items.url.params["offset"], "200")
+        self.assertEqual(items.headers["authorization"], "Bearer token")
+        self.assertEqual(add.url.params["position"], "3")
+        self.assertEqual(json.loads(add.content), ["spotify:track:1", "spotify:track:2"])
+        self.assertEqual(json.loads(reorder.content),
+                         {"range_start": 5, "range_length": 1, "insert_before": 0, "snapshot_id": "s0"})
+
+    def test_retries_server_errors_and_raises_spotify_exceptions(self):
+        statuses = iter([503, 200, 429])
+
+        def handler(request):
+            status = next(statuses)
+            if status == 429:
+                return httpx.Response(429, json={"error": {"status": 429, "message": "slow down"}},
+                                      headers={"Retry-After": "2"})
+            return httpx.Response(status, json={"items": []})
+
+        client = self._client(handler)
+
+        self.assertEqual(asyncio.run(client.current_user_playlists()), {"items": []})
+        with self.assertRaises(SpotifyException) as raised:
+            asyncio.run(client.playlist("p1"))
+        self.assertEqual(raised.exception.http_status, 429)
+        self.assertEqual(raised.exception.headers["Retry-After"], "2")
+
+    def test_server_errors_of_writes_that_may_have_applied_are_not_retried(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request.method)
+            return httpx.Response(502, json={"error": {"status": 502, "message": "bad gateway"}})
+
+        client = self._client(handler)
+
+        for call in (client.playlist_add_items("p1", ["1"]),
+                     client.playlist_reorder_items("p1", range_start=1, insert_before=0)):
+            with self.assertRaises(SpotifyException):
+                asyncio.run(call)
+        self.assertEqual(requests, ["POST", "PUT"])
+
+        requests.clear()
+        with self.assertRaises(SpotifyException):
+            asyncio.run(client.playlist_replace_items("p1", ["1"]))
+        self.assertEqual(requests, ["PUT"] * 4)
+
+    def test_only_failed_connection_attempts_are_retried(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if len(requests) == 1:
+                raise httpx.ConnectError("refused", request=request)
+            raise httpx.ReadTimeout("no response", request=request)
+
+        with self.assertRaises(httpx.ReadTimeout):
+            asyncio.run(self._client(handler).playlist_add_items("p1", ["1"]))
+        # The POST that may have reached Spotify is not sent a third time.
+        self.assertEqual(len(requests), 2)
+
+    def test_playlist_uris_and_urls_are_reduced_to_ids(self):
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.path)
+            return httpx.Response(200, json={"snapshot_id": "s1"})
+
+        client = self._client(handler)
+
+        async def main():
+            await client.playlist("spotify:playlist:p1")
+            await client.playlist_items("https://open.spotify.com/playlist/p2?si=abc")
+            await client.playlist_replace_items("spotify:user:me:playlist:p3",
+                                                ["https://open.spotify.com/track/t1"])
+
+        asyncio.run(main())
+        self.assertEqual(paths, ["/v1/playlists/p1", "/v1/playlists/p2/items", "/v1/playlists/p3/items"])
+        with self.assertRaises(SpotifyException):
+            asyncio.run(client.playlist("spotify:album:a1"))
+
+    def test_artists_sends_ids_in_one_call(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"artists": [{"id": "a1"}, None]})
+
+        response = asyncio.run(self._client(handler).artists(["a1", "spotify:artist:a2"]))
+
+        self.assertEqual(response, {"artists": [{"id": "a1"}, None]})
+        self.assertEqual(requests[0].url.path, "/v1/artists")
+        self.assertEqual(requests[0].url.params["ids"], "a1,a2")
+
+    def test_fetch_all_playlists_awaits_every_page(self):
+        def handler(request):
+            offset = int(request.url.params["offset"])
+            items = [{"id": str(number)} for number in range(offset, min(offset + 50, 120))]
+            return httpx.Response(200, json={"items": items, "total": 120,
+                                             "next": "more" if offset + 50 < 120 else None})
+
+        playlists = asyncio.run(afetch_all_playlists(self._client(handler), concurrency=2))
+
+        self.assertEqual([p["id"] for p in playlists], [str(number) for number in range(120)])
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"items": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AsyncHTTPPoolTests(unittest.TestCase):
+    def test_stats_count_requests_on_reused_connections(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        pool = AsyncHTTPPool(max_connections=4, shard_size=4)
+        client = AsyncSpotifyClient("token", pool.client_for("session"),
+                                    api_url=f"http://127.0.0.1:{server.server_port}/v1")
+
+        async def main():
+            for offset in range(0, 500, 100):
+                await client.playlist_items("p1", limit=100, offset=offset)
+            await pool.aclose()
+
+        asyncio.run(main())
+
+        self.assertEqual(pool.stats(), {
+            "http_requests": 5, "http_connections": 1, "connection_reuse_rate": 0.8,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from playlistsmith.services.batch import arun_batch, run_batch
+
+
+class Item:
+    def __init__(self, playlist_id, name):
+        self.playlist_id = playlist_id
+        self.name = name
+
+
+class RunBatchTests(unittest.TestCase):
+    def test_same_playlist_runs_in_order_and_results_keep_request_order(self):
+        items = [Item("a", "a1"), Item("b", "b1"), Item("a", "a2"), Item("a", "a3")]
+        seen = []
+        lock = threading.Lock()
+
+        def run_item(item):
+            time.sleep(0.01)
+            with lock:
+                seen.append(item.name)
+            return item.name
+
+        report = run_batch(items, run_item, concurrency=4)
+
+        self.assertEqual([entry["result"] for entry in report["items"]], ["a1", "b1", "a2", "a3"])
+        self.assertEqual([name for name in seen if name.startswith("a")], ["a1", "a2", "a3"])
+        self.assertEqual(report["playlists"], 2)
+        self.assertEqual(report["concurrency"], 2)
+
+    def test_playlists_run_concurrently_up_to_limit(self):
+        items = [Item(str(number), number) for number in range(6)]
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def run_item(item):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        report = run_batch(items, run_item, concurrency=3)
+
+        self.assertEqual(report["concurrency"], 3)
+        self.assertEqual(peak, 3)
+
+    def test_errors_are_reported_per_item(self):
+        items = [Item("a", "ok"), Item("b", "boom")]
+        done = []
+
+        def run_item(item):
+            if item.name == "boom":
+                raise ValueError("boom")
+            return "fine"
+
+        report = run_batch(items, run_item, concurrency=2, on_item_done=done.append)
+
+        self.assertEqual(report["items"][0]["status"], "ok")
+        self.assertEqual(report["items"][1], {"playlist_id": "b", "status": "error", "error": "boom",
+                                              "seconds": report["items"][1]["seconds"]})
+        self.assertEqual(sorted(done), [1, 2])
+
+
+class ArunBatchTests(unittest.TestCase):
+    def test_playlists_share_bounded_tasks_and_keep_their_order(self):
+        items = [Item(str(number % 4), number) for number in range(8)]
+        seen = []
+        active = 0
+        peak = 0
+
+        async def run_item(item):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            seen.append(item.name)
+            if item.name == 5:
+                raise ValueError("boom")
+            return item.name
+
+        report = asyncio.run(arun_batch(items, run_item, concurrency=2))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(report["concurrency"], 2)
+        self.assertEqual(report["playlists"], 4)
+        self.assertEqual([entry.get("result") for entry in report["items"]], [0, 1, 2, 3, 4, None, 6, 7])
+        self.assertEqual(report["items"][5]["error"], "boom")
+        for playlist in range(4):
+            self.assertEqual([name for name in seen if name % 4 == playlist], [playlist, playlist + 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from playlistsmith.services.client_pool import SpotifyClientPool, build_spotify_client
+from tests.helpers import FakeClock
+
+
+class FakeHttpSession:
+    def __init__(self):
+        self.closed = False
+        self.adapters = {}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, access_token, pool_size):
+        self.access_token = access_token
+        self.pool_size = pool_size
+        self._session = FakeHttpSession()
+
+
+class SpotifyClientPoolTests(unittest.TestCase):
+    def test_client_is_reused_until_token_changes(self):
+        pool = SpotifyClientPool(pool_size=8, client_factory=FakeClient)
+
+        first = pool.get("sid", "token-1")
+        second = pool.get("sid", "token-1")
+        refreshed = pool.get("sid", "token-2")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, refreshed)
+        self.assertTrue(first._session.closed)
+        self.assertEqual(refreshed.pool_size, 8)
+        self.assertEqual(pool.stats()["client_hits"], 1)
+        self.assertEqual(pool.stats()["client_builds"], 2)
+
+    def test_evict_closes_client(self):
+        pool = SpotifyClientPool(client_factory=FakeClient)
+        client = pool.get("sid", "token")
+
+        pool.evict("sid")
+
+        self.assertTrue(client._session.closed)
+        self.assertEqual(pool.stats()["clients"], 0)
+
+    def test_max_clients_evicts_least_recently_used(self):
+        pool = SpotifyClientPool(max_clients=1, client_factory=FakeClient)
+        first = pool.get("a", "token")
+        pool.get("b", "token")
+
+        self.assertTrue(first._session.closed)
+        self.assertEqual(pool.stats()["clients"], 1)
+
+    def test_clients_unused_for_the_session_ttl_are_closed(self):
+        clock = FakeClock()
+        pool = SpotifyClientPool(client_factory=FakeClient, ttl=60, clock=clock)
+        idle = pool.get("idle", "token")
+        active = pool.get("active", "token")
+        clock.now += 40
+        pool.get("active", "token")
+        clock.now += 30
+
+        stats = pool.stats()
+
+        self.assertTrue(idle._session.closed)
+        self.assertFalse(active._session.closed)
+        self.assertEqual((stats["clients"], stats["client_expired"]), (1, 1))
+        self.assertIs(pool.get("active", "token"), active)
+        self.assertIsNot(pool.get("idle", "token"), idle)
+
+    def test_built_clients_resend_only_idempotent_requests_after_server_errors(self):
+        client = build_spotify_client("token", pool_size=4)
+        retry = client._session.get_adapter("https://api.spotify.com").max_retries
+
+        self.assertTrue(retry.is_retry("GET", 503))
+        self.assertFalse(retry.is_retry("POST", 503))
+        self.assertFalse(retry.is_retry("PUT", 503))
+        self.assertFalse(retry.is_retry("GET", 429))
+        client._session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
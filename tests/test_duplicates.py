@@ -0,0 +1,95 @@
+import time
+import unittest
+
+from playlistsmith.services.duplicates import (
+    find_duplicate_groups,
+    normalize_title,
+    select_unique_tracks,
+)
+
+
+def track(uri, name, artist="Artist", duration_ms=200_000, isrc=None, popularity=0, release_date="2020-01-01"):
+    return {
+        "uri": f"spotify:track:{uri}",
+        "name": name,
+        "artists": [{"name": artist}],
+        "album": {"release_date": release_date},
+        "duration_ms": duration_ms,
+        "popularity": popularity,
+        "isrc": isrc,
+    }
+
+
+class DuplicateDetectionTests(unittest.TestCase):
+    def test_normalize_title_drops_release_suffixes(self):
+        self.assertEqual(normalize_title("Héroes - Remastered 2017"), "heroes")
+        self.assertEqual(normalize_title("Song (Single Version)"), "song")
+        self.assertEqual(normalize_title("Song [feat. Someone]"), "song")
+        self.assertEqual(normalize_title("Song (Live at Wembley)"), "song live at wembley")
+
+    def test_matches_on_isrc_and_on_title_artist_duration(self):
+        tracks = [
+            track(1, "Song", isrc="USAAA0000001"),
+            track(2, "Other title", isrc="usaaa0000001"),
+            track(3, "Song - 2011 Remaster", duration_ms=201_500),
+            track(4, "Song", duration_ms=260_000),
+            track(5, "Song", artist="Someone Else"),
+        ]
+
+        self.assertEqual(find_duplicate_groups(tracks), [[0, 1, 2]])
+        self.assertEqual(find_duplicate_groups(tracks, fuzzy=False), [])
+
+    def test_title_match_never_merges_different_isrcs(self):
+        tracks = [
+            track(1, "Song", isrc="USAAA0000001"),
+            track(2, "Song (Taylor's Version)", isrc="USBBB0000002"),
+            track(3, "Song"),
+            track(4, "Song", isrc="USBBB0000002"),
+        ]
+
+        # Track 3 has no ISRC and matches either recording, but must not join them.
+        self.assertEqual(find_duplicate_groups(tracks), [[0, 2], [1, 3]])
+
+    def test_repeated_uris_are_not_compared_pairwise(self):
+        tracks = [track(1, "Song")] * 20_000 + [track(2, "Song (Remastered)")]
+
+        started = time.perf_counter()
+        groups = find_duplicate_groups(tracks)
+
+        self.assertEqual(groups, [list(range(20_001))])
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+    def test_exact_mode_only_matches_uris(self):
+        tracks = [track(1, "Song"), track(2, "Song"), track(1, "Song")]
+
+        self.assertEqual(find_duplicate_groups(tracks, fuzzy=False), [[0, 2]])
+
+    def test_keep_policies(self):
+        tracks = [
+            track(1, "Song", popularity=10, release_date="2011-05-01"),
+            track(2, "Song (Remastered)", popularity=70, release_date="2021"),
+            track(3, "Song - Single Version", popularity=30, release_date="1999-09"),
+        ]
+
+        def kept(policy):
+            return [t["uri"][-1] for t in select_unique_tracks(tracks, keep=policy)]
+
+        self.assertEqual(kept("first"), ["1"])
+        self.assertEqual(kept("popular"), ["2"])
+        self.assertEqual(kept("earliest"), ["3"])
+        with self.assertRaises(ValueError):
+            select_unique_tracks(tracks, keep="newest")
+
+    def test_blocking_scales_to_large_playlists(self):
+        tracks = [track(i, f"Song {i}", artist=f"Artist {i % 500}", isrc=f"ISRC{i}") for i in range(10_000)]
+        tracks += [track(f"copy{i}", f"Song {i} (Remastered)", artist=f"Artist {i % 500}") for i in range(500)]
+
+        started = time.perf_counter()
+        groups = find_duplicate_groups(tracks)
+
+        self.assertEqual(len(groups), 500)
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from playlistsmith.services.jobs import JobManager, JobQueueFullError, SQLiteJobStore, create_job_store
+
+
+class JobManagerTests(unittest.TestCase):
+    def wait_until_finished(self, manager, job):
+        version = -1
+        while not job.finished:
+            change = manager.wait_for_change(job, version, timeout=5)
+            self.assertIsNotNone(change)
+            _, version = change
+
+    def test_job_reports_progress_and_result(self):
+        manager = JobManager(max_workers=1)
+        phases = []
+
+        def operation(report):
+            report("fetching", pages_fetched=3)
+            phases.append("ran")
+            return {"strategy": "noop"}
+
+        job = manager.submit("sort", operation, owner="session")
+        self.wait_until_finished(manager, job)
+
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.pages_fetched, 3)
+        self.assertEqual(job.result, {"strategy": "noop"})
+        self.assertIs(manager.get(job.id), job)
+
+    def test_failed_job_records_error(self):
+        manager = JobManager(max_workers=1)
+
+        def operation(report):
+            raise RuntimeError("boom")
+
+        job = manager.submit("sort", operation)
+        self.wait_until_finished(manager, job)
+
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "boom")
+
+    def test_rejects_jobs_beyond_pending_limit(self):
+        manager = JobManager(max_workers=1, max_pending=1)
+        release = threading.Event()
+
+        job = manager.submit("sort", lambda report: release.wait(5))
+        with self.assertRaises(JobQueueFullError):
+            manager.submit("sort", lambda report: None)
+        release.set()
+        self.wait_until_finished(manager, job)
+
+    def test_only_the_newest_finished_jobs_are_kept(self):
+        manager = JobManager(max_workers=1, max_finished=2)
+        jobs = []
+        for _ in range(4):
+            jobs.append(manager.submit("sort", lambda report: None))
+            self.wait_until_finished(manager, jobs[-1])
+
+        manager.submit("sort", lambda report: None)
+
+        self.assertEqual([manager.get(job.id) is not None for job in jobs], [False, False, True, True])
+
+
+class SQLiteJobStoreTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_other_workers_follow_a_job_through_the_store(self):
+        running = JobManager(max_workers=1, store=SQLiteJobStore(self.path))
+        # A second manager on the same file stands in for another gunicorn worker.
+        polled = JobManager(store=SQLiteJobStore(self.path))
+        release = threading.Event()
+
+        def operation(report):
+            release.wait(5)
+            report("writing", batches_written=2)
+            return {"strategy": "moves"}
+
+        job = running.submit("sort", operation, owner="session")
+        remote = polled.get(job.id)
+        self.assertEqual((remote.owner, remote.kind), ("session", "sort"))
+        self.assertIsNone(polled.get("unknown"))
+
+        release.set()
+        events = []
+        version = -1
+        while not events or events[-1]["status"] not in ("done", "failed"):
+            change = polled.wait_for_change(remote, version, timeout=5)
+            self.assertIsNotNone(change)
+            data, version = change
+            events.append(data)
+
+        self.assertEqual(events[-1]["result"], {"strategy": "moves"})
+        self.assertEqual(remote.batches_written, 2)
+        self.assertTrue(remote.finished)
+
+    def test_store_keeps_the_newest_finished_jobs(self):
+        store = SQLiteJobStore(self.path)
+        manager = JobManager(max_workers=1, max_finished=1, store=store)
+        reader = JobManager(store=SQLiteJobStore(self.path))
+        first = manager.submit("sort", lambda report: None)
+        JobManagerTests.wait_until_finished(self, reader, reader.get(first.id))
+        second = manager.submit("sort", lambda report: None)
+        JobManagerTests.wait_until_finished(self, reader, reader.get(second.id))
+
+        manager.submit("sort", lambda report: None)
+
+        self.assertIsNone(store.get(first.id))
+        self.assertEqual(store.get(second.id).status, "done")
+
+    def test_create_job_store_from_url(self):
+        self.assertIsNone(create_job_store(""))
+        self.assertIsInstance(create_job_store(f"sqlite:///{self.path}"), SQLiteJobStore)
+        with self.assertRaises(ValueError):
+            create_job_store("redis://localhost")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+
+from playlistsmith.services.metrics import MetricsMiddleware, MetricsRegistry
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def test_counter_and_gauge_render_with_labels(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ("method",))
+        in_flight = registry.gauge("in_flight", "Running.")
+        calls.inc(method="playlist_items")
+        calls.inc(2, method="playlist_items")
+        calls.inc(method='odd"name')
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+
+        text = registry.render()
+
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{method="playlist_items"} 3', text)
+        self.assertIn('calls_total{method="odd\\"name"} 1', text)
+        self.assertIn("in_flight 1", text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, endpoint="/sort")
+
+        text = registry.render()
+
+        self.assertIn('latency_seconds_bucket{endpoint="/sort",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="/sort",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{endpoint="/sort",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{endpoint="/sort"} 4', text)
+        self.assertIn('latency_seconds_sum{endpoint="/sort"} 3.65', text)
+
+    def test_labels_must_match(self):
+        counter = MetricsRegistry().counter("calls_total", "Calls.", ("method",))
+
+        with self.assertRaises(ValueError):
+            counter.inc(kind="x")
+
+    def test_stats_gauges_read_at_scrape_time(self):
+        registry = MetricsRegistry()
+        stats = {"hits": 1, "label": "ignored"}
+        registry.stats_gauges("cache", "Cache", lambda: stats)
+        stats["hits"] = 5
+
+        text = registry.render()
+
+        self.assertIn("cache_hits 5", text)
+        self.assertNotIn("cache_label", text)
+
+
+class MetricsMiddlewareTests(unittest.TestCase):
+    def test_records_route_template_and_status(self):
+        class Route:
+            path = "/playlists/{playlist_id}/tracks"
+
+        async def app(scope, receive, send):
+            scope["route"] = Route()
+            await send({"type": "http.response.start", "status": 404})
+            await send({"type": "http.response.body", "body": b""})
+
+        registry = MetricsRegistry()
+        middleware = MetricsMiddleware(app, registry)
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(middleware({"type": "http", "method": "GET"}, None, send))
+
+        text = registry.render()
+        self.assertEqual(len(sent), 2)
+        self.assertIn('playlistsmith_http_requests_total{method="GET",endpoint="/playlists/{playlist_id}/tracks",'
+                      'status="404"} 1', text)
+        self.assertIn("playlistsmith_http_requests_in_flight 0", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
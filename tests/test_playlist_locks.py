@@ -0,0 +1,254 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import anyio.to_thread
+
+from playlistsmith.services.playlist_locks import PlaylistBusyError, PlaylistLocks, PlaylistSupersededError
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    return thread
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class PlaylistLocksTests(unittest.TestCase):
+    def test_mutations_of_one_playlist_never_overlap_and_run_in_arrival_order(self):
+        locks = PlaylistLocks()
+        release = threading.Event()
+        order = []
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def mutation(name):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+                order.append(name)
+            if name == "first":
+                release.wait(2)
+            with lock:
+                active -= 1
+
+        threads = [start(locks.run, "p1", lambda: mutation("first"))]
+        wait_until(lambda: order == ["first"])
+        for name in ("second", "third"):
+            threads.append(start(locks.run, "p1", lambda name=name: mutation(name)))
+            wait_until(lambda: locks.stats()["queued"] == len(threads) - 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["first", "second", "third"])
+        self.assertEqual(peak, 1)
+        self.assertEqual(locks.stats()["locked_playlists"], 0)
+
+    def test_different_playlists_run_concurrently(self):
+        locks = PlaylistLocks()
+        both_running = threading.Barrier(2, timeout=2)
+
+        threads = [start(locks.run, playlist_id, both_running.wait) for playlist_id in ("p1", "p2")]
+        for thread in threads:
+            thread.join()
+
+        self.assertFalse(both_running.broken)
+
+    def test_identical_requests_share_one_call(self):
+        locks = PlaylistLocks()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def sort():
+            calls.append(1)
+            release.wait(2)
+            return {"api_calls": 3}
+
+        threads = [start(lambda: results.append(locks.run("p1", sort, key="artist"))) for _ in range(3)]
+        wait_until(lambda: locks.stats()["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"api_calls": 3}] * 3)
+
+    def test_coalesced_callers_get_the_error_too(self):
+        locks = PlaylistLocks()
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            release.wait(2)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                locks.run("p1", failing, key="k")
+            except ValueError as exc:
+                errors.append(str(exc))
+
+        threads = [start(call) for _ in range(2)]
+        wait_until(lambda: locks.stats()["coalesced"] == 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, ["boom", "boom"])
+
+    def test_newer_request_of_the_same_owner_supersedes_a_waiting_one(self):
+        locks = PlaylistLocks()
+        release = threading.Event()
+        ran = []
+        outcomes = {}
+
+        def call(name, owner):
+            try:
+                locks.run("p1", lambda: ran.append(name) or release.wait(2), owner=owner)
+                outcomes[name] = "ok"
+            except PlaylistSupersededError:
+                outcomes[name] = "superseded"
+
+        running = start(call, "running", "other-user")
+        wait_until(lambda: ran == ["running"])
+        older = start(call, "older", "user")
+        wait_until(lambda: locks.stats()["queued"] == 1)
+        newer = start(call, "newer", "user")
+        older.join()
+        release.set()
+        running.join()
+        newer.join()
+
+        self.assertEqual(outcomes, {"running": "ok", "older": "superseded", "newer": "ok"})
+        self.assertEqual(ran, ["running", "newer"])
+        self.assertEqual(locks.stats()["superseded"], 1)
+
+    def test_waiting_too_long_raises_busy_and_frees_the_ticket(self):
+        locks = PlaylistLocks(wait_timeout=0.05)
+        release = threading.Event()
+        holder = start(locks.run, "p1", lambda: release.wait(2))
+        wait_until(lambda: locks.stats()["runs"] == 1)
+
+        with self.assertRaises(PlaylistBusyError):
+            locks.run("p1", lambda: None)
+        release.set()
+        holder.join()
+
+        self.assertEqual(locks.run("p1", lambda: "next"), "next")
+        self.assertEqual(locks.stats()["timeouts"], 1)
+
+    def test_non_exclusive_calls_do_not_wait_for_the_lock(self):
+        locks = PlaylistLocks(wait_timeout=0.05)
+        release = threading.Event()
+        holder = start(locks.run, "p1", lambda: release.wait(2))
+        wait_until(lambda: locks.stats()["runs"] == 1)
+
+        self.assertEqual(locks.run("p1", lambda: "preview", key="dry", exclusive=False), "preview")
+        release.set()
+        holder.join()
+
+    def test_arun_coalesces_and_serializes_with_threads(self):
+        locks = PlaylistLocks()
+        release = threading.Event()
+        order = []
+        runs = []
+
+        async def sort():
+            runs.append(1)
+            order.append("async")
+            return "sorted"
+
+        holder = start(locks.run, "p1", lambda: order.append("thread") or release.wait(2))
+        wait_until(lambda: order == ["thread"])
+
+        async def main():
+            calls = [asyncio.ensure_future(locks.arun("p1", sort, key="artist")) for _ in range(2)]
+            await asyncio.sleep(0.02)
+            self.assertEqual(order, ["thread"])
+            release.set()
+            return await asyncio.gather(*calls)
+
+        self.assertEqual(asyncio.run(main()), ["sorted", "sorted"])
+        holder.join()
+        self.assertEqual(order, ["thread", "async"])
+        self.assertEqual(len(runs), 1)
+
+    def test_waiting_coroutines_hold_no_worker_thread(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        # Shorter than any wait a thread-starved holder would cause.
+        locks = PlaylistLocks(wait_timeout=5, lock_dir=lock_dir)
+        # More waiters than the 40 threads of anyio's default limiter.
+        waiters = 60
+        runs = []
+
+        async def write():
+            # The holder needs a worker thread, like the planning and SQLite steps of a sort.
+            await anyio.to_thread.run_sync(time.sleep, 0.001)
+            runs.append(1)
+            return "sorted"
+
+        async def main():
+            distinct = [locks.arun("p1", write, key=number) for number in range(waiters)]
+            identical = [locks.arun("p1", write, key="same") for _ in range(waiters)]
+            return await asyncio.gather(*distinct, *identical)
+
+        started = time.monotonic()
+        results = asyncio.run(main())
+
+        self.assertEqual(results, ["sorted"] * (2 * waiters))
+        self.assertEqual(len(runs), waiters + 1)
+        self.assertLess(time.monotonic() - started, 5)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_workers_sharing_a_lock_dir_never_write_one_playlist_at_once(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        started = os.path.join(lock_dir, "started")
+        finished = os.path.join(lock_dir, "finished")
+
+        def mutation():
+            open(started, "w").close()
+            time.sleep(0.2)
+            open(finished, "w").close()
+
+        async def finished_first():
+            return os.path.exists(finished)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                PlaylistLocks(lock_dir=lock_dir).run("p1", mutation)
+                os._exit(0)
+            except BaseException:
+                os._exit(1)
+        wait_until(lambda: os.path.exists(started))
+
+        with self.assertRaises(PlaylistBusyError):
+            PlaylistLocks(wait_timeout=0.02, lock_dir=lock_dir).run("p1", lambda: None)
+        locks = PlaylistLocks(lock_dir=lock_dir)
+        self.assertEqual(locks.run("p2", lambda: "other playlist"), "other playlist")
+        self.assertTrue(asyncio.run(locks.arun("p1", finished_first)))
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(locks.stats()["process_waits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
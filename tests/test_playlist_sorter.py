@@ -1,6 +1,13 @@
+import gc
+import os
+import tempfile
 import unittest
 
+from playlistsmith.services.artists import ArtistCache
 from playlistsmith.services.sort_playlist import PlaylistSorter
+from playlistsmith.services.track_cache import TrackCache
+from playlistsmith.services.track_store import SQLiteTrackStore
+from tests.helpers import FakeSpotifyClient, make_track
 
 
 class PlaylistSorterTests(unittest.TestCase):
@@ -15,6 +22,244 @@ class PlaylistSorterTests(unittest.TestCase):
 
         self.assertEqual([track["uri"] for track in deduped], ["spotify:track:1", "spotify:track:2"])
 
+    def test_sort_skips_write_when_already_ordered(self):
+        client = FakeSpotifyClient([make_track(1, "A"), make_track(2, "B"), make_track(3, "C")])
+
+        stats = PlaylistSorter(client, "playlist").sort_by_artist()
+
+        self.assertEqual(stats["strategy"], "noop")
+        self.assertEqual(client.calls, ["playlist_items"])
+
+    def test_sort_uses_range_moves_for_few_misplaced_tracks(self):
+        artists = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"] * 15
+        tracks = [make_track(i, artist) for i, artist in enumerate(sorted(artists))]
+        tracks.append(tracks.pop(0))
+        client = FakeSpotifyClient(tracks)
+
+        stats = PlaylistSorter(client, "playlist").sort_by_artist()
+
+        self.assertEqual(stats["strategy"], "moves")
+        self.assertEqual(stats["api_calls"], 1)
+        self.assertEqual(stats["calls_saved"], 1)
+        self.assertEqual([t["artists"][0]["name"] for t in client.tracks], sorted(artists))
+
+    def test_sort_by_spec_orders_by_several_keys_in_one_write(self):
+        tracks = [make_track(1, "B", 5), make_track(2, "A", 1), make_track(3, "B", 9), make_track(4, "A", 7)]
+        client = FakeSpotifyClient(tracks)
+
+        PlaylistSorter(client, "playlist").sort_by_spec(
+            [{"key": "artist"}, {"key": "popularity", "desc": True}])
+
+        self.assertEqual([t["id"] for t in client.tracks], ["4", "2", "3", "1"])
+        self.assertEqual(client.calls.count("playlist_items"), 1)
+
+    def test_items_without_a_track_do_not_shift_the_moves(self):
+        artists = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"] * 15
+        tracks = [make_track(i, artist) for i, artist in enumerate(sorted(artists))]
+        tracks.insert(20, tracks.pop(140))
+        client = FakeSpotifyClient([None] + tracks)
+
+        preview = PlaylistSorter(client, "playlist").sort_by_keys([("artist", False)], dry_run=True)
+        stats = PlaylistSorter(client, "playlist").sort_by_artist()
+
+        self.assertEqual((preview["moves"], preview["removed"]), ([[21, 137, 1]], []))
+        self.assertEqual((preview["removed_without_track"], stats["removed_without_track"]), (0, 0))
+        self.assertEqual(stats["strategy"], "moves")
+        self.assertIsNone(client.tracks[0])
+        self.assertEqual([t["artists"][0]["name"] for t in client.tracks[1:]], sorted(artists))
+
+    def test_dedupe_preview_reports_live_positions(self):
+        track = make_track(1, "A")
+        client = FakeSpotifyClient([track, None, make_track(2, "B"), track])
+
+        preview = PlaylistSorter(client, "playlist").remove_duplicates(dry_run=True)
+
+        self.assertEqual(preview["strategy"], "rewrite")
+        self.assertEqual(preview["removed"], [[1, 1], [3, 1]])
+        self.assertEqual(preview["removed_without_track"], 1)
+
+    def test_sort_falling_back_to_a_rewrite_reports_the_items_without_a_track_it_removes(self):
+        client = FakeSpotifyClient([make_track(i, artist) for i, artist in enumerate("EDCBA")])
+        client.tracks.insert(2, None)
+
+        preview = PlaylistSorter(client, "playlist").sort_by_keys([("artist", False)], dry_run=True)
+        stats = PlaylistSorter(client, "playlist").sort_by_artist()
+
+        self.assertEqual((preview["strategy"], preview["removed"]), ("rewrite", [[2, 1]]))
+        self.assertEqual((stats["strategy"], stats["removed_without_track"]), ("rewrite", 1))
+        self.assertEqual(preview["removed_without_track"], 1)
+        self.assertEqual([t["artists"][0]["name"] for t in client.tracks], list("ABCDE"))
+
+    def test_sort_by_spec_rejects_unknown_keys(self):
+        client = FakeSpotifyClient([make_track(1, "A")])
+
+        with self.assertRaises(ValueError):
+            PlaylistSorter(client, "playlist").sort_by_spec([{"key": "mood"}])
+        self.assertEqual(client.calls, [])
+
+    def test_restarted_worker_reads_an_unchanged_playlist_from_the_track_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "tracks.db")
+        tracks = [make_track(i, "CBA"[i % 3]) for i in range(250)]
+        client = FakeSpotifyClient(tracks)
+        PlaylistSorter(client, "playlist", track_store=SQLiteTrackStore(path)).get_all_tracks()
+
+        # A new store and track cache stand in for a restarted worker.
+        client.calls.clear()
+        sorter = PlaylistSorter(client, "playlist", track_cache=TrackCache(),
+                                track_store=SQLiteTrackStore(path))
+        preview = sorter.sort_by_keys([("artist", False)], dry_run=True)
+        pages = list(sorter.iter_track_pages())
+
+        self.assertEqual(client.calls, ["playlist", "playlist"])
+        self.assertEqual(preview["tracks_after"], 250)
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+
+    def test_pages_written_to_the_track_store_are_not_kept(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = SQLiteTrackStore(os.path.join(directory.name, "tracks.db"))
+        client = FakeSpotifyClient([make_track(i, "A") for i in range(300)])
+        pages = PlaylistSorter(client, "playlist", fetch_concurrency=1, track_store=store).iter_track_pages()
+
+        first_uri = next(pages)[0]["uri"]
+        next(pages)
+        gc.collect()
+        # Normalized tracks carry their position; the raw items of the fake client do not.
+        kept = [obj for obj in gc.get_objects()
+                if isinstance(obj, dict) and "position" in obj and obj.get("uri") == first_uri]
+        list(pages)
+
+        self.assertEqual(kept, [])
+        self.assertEqual(len(store.get_tracks("playlist", "snapshot-0")), 300)
+
+    def test_sort_by_genre_looks_up_each_artist_once(self):
+        genres = {"a": "rock", "b": "ambient", "c": "jazz"}
+        tracks = [make_track(i, "abc"[i % 3]) for i in range(120)]
+        for track in tracks:
+            track["artists"][0]["id"] = track["artists"][0]["name"]
+        client = FakeSpotifyClient(tracks)
+        client.artist_catalog = {artist_id: {"id": artist_id, "genres": [genre], "followers": {"total": 1}}
+                                 for artist_id, genre in genres.items()}
+        cache = ArtistCache()
+
+        PlaylistSorter(client, "playlist", artist_cache=cache).sort_by_genre()
+        PlaylistSorter(client, "playlist", artist_cache=cache).sort_by_genre(reverse=True)
+
+        self.assertEqual(client.calls.count("artists"), 1)
+        self.assertEqual([genres[t["artists"][0]["id"]] for t in client.tracks][::40],
+                         ["rock", "jazz", "ambient"])
+
+    def test_parallel_fetch_keeps_playlist_order(self):
+        client = FakeSpotifyClient([make_track(i, "A") for i in range(1050)])
+
+        tracks = PlaylistSorter(client, "playlist", fetch_concurrency=4).get_all_tracks()
+
+        self.assertEqual([t["id"] for t in tracks], [str(i) for i in range(1050)])
+        self.assertEqual(client.calls.count("playlist_items"), 11)
+
+    def test_serial_fetch_fallback(self):
+        client = FakeSpotifyClient([make_track(i, "A") for i in range(250)])
+
+        tracks = PlaylistSorter(client, "playlist", fetch_concurrency=1).get_all_tracks()
+
+        self.assertEqual(len(tracks), 250)
+        self.assertEqual(client.calls.count("playlist_items"), 3)
+
+    def test_iter_track_pages_only_fetches_ahead_of_consumer(self):
+        client = FakeSpotifyClient([make_track(i, "A") for i in range(2000)])
+        pages = PlaylistSorter(client, "playlist", fetch_concurrency=2).iter_track_pages()
+
+        first = next(pages)
+        pages.close()
+
+        self.assertEqual(len(first), 100)
+        self.assertLessEqual(client.calls.count("playlist_items"), 3)
+
+    def test_track_cache_reuses_unchanged_snapshot(self):
+        client = FakeSpotifyClient([make_track(i, "A") for i in range(150)])
+        cache = TrackCache()
+
+        PlaylistSorter(client, "playlist", track_cache=cache).get_all_tracks()
+        tracks = PlaylistSorter(client, "playlist", track_cache=cache).get_all_tracks()
+
+        self.assertEqual(len(tracks), 150)
+        self.assertEqual(client.calls.count("playlist_items"), 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_remove_duplicates_falls_back_to_rewrite(self):
+        track = make_track(1, "A")
+        client = FakeSpotifyClient([track, make_track(2, "B"), track])
+
+        stats = PlaylistSorter(client, "playlist").remove_duplicates()
+
+        self.assertEqual(stats["strategy"], "rewrite")
+        self.assertEqual([t["uri"] for t in client.tracks], ["spotify:track:1", "spotify:track:2"])
+
+    def test_fuzzy_remove_duplicates_keeps_most_popular_release(self):
+        single = make_track(1, "A", popularity=20)
+        album = dict(make_track(2, "A", popularity=80), external_ids={"isrc": "GBXXX0000001"})
+        single["external_ids"] = {"isrc": "GBXXX0000001"}
+        client = FakeSpotifyClient([single, make_track(3, "B"), album])
+
+        stats = PlaylistSorter(client, "playlist").remove_duplicates(fuzzy=True, keep="popular")
+
+        self.assertEqual(stats["strategy"], "rewrite")
+        self.assertEqual([t["uri"] for t in client.tracks], ["spotify:track:3", "spotify:track:2"])
+
+    def test_dry_run_previews_without_writing(self):
+        artists = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"] * 15
+        tracks = [make_track(i, artist) for i, artist in enumerate(sorted(artists))]
+        tracks.append(tracks.pop(0))
+        client = FakeSpotifyClient(tracks)
+
+        preview = PlaylistSorter(client, "playlist").sort_by_keys([("artist", False)], dry_run=True)
+
+        self.assertEqual(preview["strategy"], "moves")
+        self.assertEqual(preview["moves"], [[149, 14, 1]])
+        self.assertEqual(preview["removed"], [])
+        self.assertEqual(client.calls, ["playlist_items", "playlist_items"])
+
+    def test_remove_duplicates_dry_run_lists_removed_positions(self):
+        track = make_track(1, "A")
+        client = FakeSpotifyClient([track, make_track(2, "B"), track, track])
+
+        preview = PlaylistSorter(client, "playlist").remove_duplicates(dry_run=True)
+
+        self.assertEqual(preview["strategy"], "rewrite")
+        self.assertEqual(preview["api_calls"], 1)
+        self.assertEqual(preview["removed"], [[2, 2]])
+        self.assertEqual((preview["tracks_before"], preview["tracks_after"]), (4, 2))
+        self.assertEqual(client.calls, ["playlist_items"])
+
+    def test_shuffle_spreads_artists_with_one_fetch_and_one_write(self):
+        tracks = [make_track(i, artist) for i, artist in enumerate(sorted("ABCDEFGHIJ" * 12))]
+        client = FakeSpotifyClient(tracks)
+
+        stats = PlaylistSorter(client, "playlist").shuffle(seed=5, min_gap=6)
+
+        artists = [t["artists"][0]["name"] for t in client.tracks]
+        self.assertEqual(sorted(artists), sorted("ABCDEFGHIJ" * 12))
+        self.assertTrue(all(artists[i] != artists[j] for i in range(120) for j in range(i + 1, min(i + 6, 120))))
+        self.assertEqual((stats["seed"], stats["min_gap"], stats["strategy"]), (5, 6, "rewrite"))
+        self.assertEqual(client.calls, ["playlist_items", "playlist_items",
+                                        "playlist_replace_items", "playlist_add_items"])
+
+    def test_shuffle_with_the_same_seed_is_reproducible(self):
+        tracks = [make_track(i, "ABC"[i % 3]) for i in range(30)]
+        orders = []
+        for _ in range(2):
+            client = FakeSpotifyClient(tracks)
+            PlaylistSorter(client, "playlist").shuffle(seed=11)
+            orders.append([t["uri"] for t in client.tracks])
+
+        self.assertEqual(orders[0], orders[1])
+
+        with self.assertRaises(ValueError):
+            PlaylistSorter(FakeSpotifyClient(tracks), "playlist").shuffle(min_gap=0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from playlistsmith.services.playlists import fetch_all_playlists, playlists_etag
+
+
+class FakePlaylistsClient:
+    def __init__(self, count):
+        self.playlists = [{"id": str(i), "snapshot_id": f"s{i}"} for i in range(count)]
+        self.offsets = []
+
+    def current_user_playlists(self, limit=50, offset=0):
+        self.offsets.append(offset)
+        return {
+            "items": self.playlists[offset:offset + limit],
+            "next": "next" if offset + limit < len(self.playlists) else None,
+            "total": len(self.playlists),
+        }
+
+
+class PlaylistsTests(unittest.TestCase):
+    def test_fetches_every_page_in_order(self):
+        client = FakePlaylistsClient(230)
+
+        playlists = fetch_all_playlists(client, concurrency=3)
+
+        self.assertEqual([p["id"] for p in playlists], [str(i) for i in range(230)])
+        self.assertEqual(sorted(client.offsets), [0, 50, 100, 150, 200])
+
+    def test_single_page(self):
+        client = FakePlaylistsClient(10)
+
+        self.assertEqual(len(fetch_all_playlists(client)), 10)
+        self.assertEqual(client.offsets, [0])
+
+    def test_etag_changes_with_snapshot(self):
+        playlists = [{"id": "a", "snapshot_id": "1"}]
+        changed = [{"id": "a", "snapshot_id": "2"}]
+
+        self.assertEqual(playlists_etag(playlists, 0), playlists_etag(list(playlists), 0))
+        self.assertNotEqual(playlists_etag(playlists, 0), playlists_etag(changed, 0))
+        self.assertNotEqual(playlists_etag(playlists, 0), playlists_etag(playlists, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from playlistsmith.services.rate_limiter import RateLimitScheduler, ScheduledSpotifyClient
+
+
+class TooManyRequests(Exception):
+    http_status = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class RateLimitSchedulerTests(unittest.TestCase):
+    def test_retries_after_429_and_records_throttle(self):
+        scheduler = RateLimitScheduler(rate=1000, burst=10)
+        attempts = []
+
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise TooManyRequests(0.05)
+            return "ok"
+
+        self.assertEqual(scheduler.call("sid", flaky), "ok")
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.04)
+        self.assertEqual(scheduler.stats()["throttled_responses"], 1)
+        self.assertGreater(scheduler.stats()["throttle_seconds"], 0)
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = RateLimitScheduler(rate=1000, burst=10, max_retries=1)
+
+        def always_limited():
+            raise TooManyRequests(0)
+
+        with self.assertRaises(TooManyRequests):
+            scheduler.call("sid", always_limited)
+
+    def test_other_errors_are_not_retried(self):
+        scheduler = RateLimitScheduler()
+        attempts = []
+
+        def broken():
+            attempts.append(1)
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            scheduler.call("sid", broken)
+        self.assertEqual(len(attempts), 1)
+
+    def test_permits_alternate_between_sessions(self):
+        scheduler = RateLimitScheduler(rate=50, burst=1)
+        scheduler.call("warmup", lambda: None)
+        order = []
+        threads = [threading.Thread(target=scheduler.call, args=("busy", order.append, "busy"))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.01)
+        quiet = threading.Thread(target=scheduler.call, args=("quiet", order.append, "quiet"))
+        quiet.start()
+        for thread in threads + [quiet]:
+            thread.join(5)
+
+        self.assertLess(order.index("quiet"), 3)
+        self.assertEqual(scheduler.stats()["queue_depth"], 0)
+
+    def test_scheduled_client_proxies_calls(self):
+        class Client:
+            prefix = "https://api.spotify.com/v1/"
+
+            def playlist(self, playlist_id):
+                return {"id": playlist_id}
+
+        scheduler = RateLimitScheduler()
+        client = ScheduledSpotifyClient(Client(), scheduler, "sid")
+
+        self.assertEqual(client.playlist("abc"), {"id": "abc"})
+        self.assertEqual(client.prefix, "https://api.spotify.com/v1/")
+        self.assertEqual(scheduler.stats()["calls"], 1)
+
+    def test_scheduled_client_reports_every_attempt(self):
+        attempts = []
+
+        class Client:
+            def playlist_items(self, playlist_id):
+                attempts.append(playlist_id)
+                if len(attempts) == 1:
+                    raise TooManyRequests(0)
+                return {"items": []}
+
+        observed = []
+        client = ScheduledSpotifyClient(Client(), RateLimitScheduler(rate=1000), "sid",
+                                        observer=lambda method, seconds, error: observed.append((method, error)))
+
+        self.assertEqual(client.playlist_items("abc"), {"items": []})
+        self.assertEqual([method for method, _ in observed], ["playlist_items", "playlist_items"])
+        self.assertIsInstance(observed[0][1], TooManyRequests)
+        self.assertIsNone(observed[1][1])
+
+    def test_acall_retries_after_429_and_shares_the_budget(self):
+        scheduler = RateLimitScheduler(rate=1000, burst=10)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise TooManyRequests(0.01)
+            return "ok"
+
+        self.assertEqual(asyncio.run(scheduler.acall("sid", flaky)), "ok")
+        scheduler.call("sid", lambda: None)
+        self.assertEqual(scheduler.stats()["calls"], 3)
+        self.assertEqual(scheduler.stats()["throttled_responses"], 1)
+
+    def test_cancelled_coroutine_leaves_the_queue(self):
+        scheduler = RateLimitScheduler(rate=1, burst=1)
+        scheduler.call("sid", lambda: None)
+
+        async def main():
+            waiting = asyncio.ensure_future(scheduler.acall("sid", asyncio.sleep, 0))
+            await asyncio.sleep(0.02)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(main())
+        self.assertEqual(scheduler.stats()["queue_depth"], 0)
+
+    def test_scheduled_client_awaits_coroutine_methods(self):
+        class AsyncClient:
+            async def playlist(self, playlist_id):
+                return {"id": playlist_id}
+
+        observed = []
+        client = ScheduledSpotifyClient(AsyncClient(), RateLimitScheduler(), "sid",
+                                        observer=lambda method, seconds, error: observed.append((method, error)))
+
+        self.assertEqual(asyncio.run(client.playlist("abc")), {"id": "abc"})
+        self.assertEqual(observed, [("playlist", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
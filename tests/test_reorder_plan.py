@@ -0,0 +1,85 @@
+import random
+import unittest
+
+from playlistsmith.services.reorder_plan import full_rewrite_calls, plan_reorder_moves, removed_ranges
+
+
+def apply_moves(uris, moves):
+    """Apply moves with the semantics of Spotify's reorder endpoint."""
+    result = list(uris)
+    for range_start, insert_before, range_length in moves:
+        chunk = result[range_start:range_start + range_length]
+        del result[range_start:range_start + range_length]
+        if insert_before > range_start:
+            insert_before -= range_length
+        result[insert_before:insert_before] = chunk
+    return result
+
+
+class ReorderPlanTests(unittest.TestCase):
+    def test_already_ordered_needs_no_moves(self):
+        uris = [f"spotify:track:{i}" for i in range(10)]
+
+        self.assertEqual(plan_reorder_moves(uris, list(uris)), [])
+
+    def test_single_misplaced_track_is_one_move(self):
+        current = ["a", "b", "c", "d", "e"]
+        target = ["a", "c", "d", "e", "b"]
+
+        moves = plan_reorder_moves(current, target)
+
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(apply_moves(current, moves), target)
+
+    def test_contiguous_block_moves_as_one_range(self):
+        current = ["d", "e", "f", "a", "b", "c"]
+        target = ["a", "b", "c", "d", "e", "f"]
+
+        moves = plan_reorder_moves(current, target)
+
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(apply_moves(current, moves), target)
+
+    def test_random_permutations_with_repeats(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            current = [f"spotify:track:{rng.randrange(30)}" for _ in range(60)]
+            target = list(current)
+            rng.shuffle(target)
+
+            moves = plan_reorder_moves(current, target)
+
+            self.assertEqual(apply_moves(current, moves), target)
+
+    def test_items_without_a_track_keep_their_positions(self):
+        current = [None, "c", "a", None, "b"]
+
+        moves = plan_reorder_moves(current, ["a", "b", "c"])
+
+        self.assertEqual(apply_moves(current, moves), [None, "a", "b", None, "c"])
+        self.assertEqual(removed_ranges(current, ["a", "b", "c"]), [(0, 1), (3, 1)])
+
+    def test_non_permutation_is_rejected(self):
+        self.assertIsNone(plan_reorder_moves(["a", "b", "a"], ["a", "b"]))
+        self.assertIsNone(plan_reorder_moves(["a", "b"], ["a", "c"]))
+
+    def test_max_moves_budget(self):
+        current = list(range(10))
+        target = list(reversed(current))
+
+        self.assertIsNone(plan_reorder_moves(current, target, max_moves=2))
+
+    def test_full_rewrite_calls(self):
+        self.assertEqual(full_rewrite_calls(0), 0)
+        self.assertEqual(full_rewrite_calls(100), 1)
+        self.assertEqual(full_rewrite_calls(101), 2)
+
+    def test_removed_ranges_report_later_copies(self):
+        current = ["a", "b", "a", "a", "c", "b"]
+
+        self.assertEqual(removed_ranges(current, ["a", "b", "c"]), [(2, 2), (5, 1)])
+        self.assertEqual(removed_ranges(current, current), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
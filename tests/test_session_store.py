@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+from playlistsmith.services.session_store import (
+    MemorySessionStore,
+    SessionStore,
+    SQLiteSessionStore,
+    create_session_store,
+)
+from tests.helpers import FakeClock
+
+
+class MemorySessionStoreTests(unittest.TestCase):
+    def test_set_get_delete(self):
+        store = MemorySessionStore()
+        store.set("sid", {"access_token": "token"})
+
+        self.assertEqual(store.get("sid"), {"access_token": "token"})
+        store.delete("sid")
+        self.assertIsNone(store.get("sid"))
+
+    def test_expired_sessions_are_swept(self):
+        clock = FakeClock()
+        store = MemorySessionStore(ttl=10, sweep_interval=0, clock=clock)
+        store.set("old", {})
+        clock.now += 11
+        store.set("new", {})
+
+        self.assertIsNone(store.get("old"))
+        self.assertEqual(len(store), 1)
+
+    def test_size_cap_evicts_least_recently_used(self):
+        store = MemorySessionStore(max_sessions=2)
+        store.set("a", {})
+        store.set("b", {})
+        store.get("a")
+        store.set("c", {})
+
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+
+    def test_replace_only_updates_live_sessions(self):
+        clock = FakeClock()
+        store = MemorySessionStore(ttl=10, clock=clock)
+        store.set("sid", {"access_token": "old"})
+        store.set("expired", {})
+        clock.now += 5
+
+        self.assertTrue(store.replace("sid", {"access_token": "new"}))
+        self.assertFalse(store.replace("gone", {"access_token": "new"}))
+        clock.now += 6
+        self.assertEqual(store.get("sid"), {"access_token": "new"})
+        self.assertFalse(store.replace("expired", {}))
+        self.assertIsNone(store.get("gone"))
+
+
+class SQLiteSessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_sessions_are_shared_between_store_instances(self):
+        writer = SQLiteSessionStore(self.path)
+        reader = SQLiteSessionStore(self.path)
+        writer.set("sid", {"access_token": "token"})
+
+        self.assertEqual(reader.get("sid"), {"access_token": "token"})
+        reader.delete("sid")
+        self.assertIsNone(writer.get("sid"))
+
+    def test_expired_sessions_are_hidden(self):
+        clock = FakeClock()
+        store = SQLiteSessionStore(self.path, ttl=10, clock=clock)
+        store.set("sid", {})
+        clock.now += 11
+
+        self.assertIsNone(store.get("sid"))
+        self.assertEqual(len(store), 0)
+
+    def test_replace_only_updates_live_sessions(self):
+        clock = FakeClock()
+        store = SQLiteSessionStore(self.path, ttl=10, clock=clock)
+        store.set("sid", {"access_token": "old"})
+        store.set("expired", {})
+        clock.now += 5
+
+        self.assertTrue(store.replace("sid", {"access_token": "new"}))
+        self.assertFalse(store.replace("gone", {"access_token": "new"}))
+        clock.now += 6
+        self.assertEqual(store.get("sid"), {"access_token": "new"})
+        self.assertFalse(store.replace("expired", {}))
+        self.assertIsNone(store.get("gone"))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_forked_worker_opens_its_own_connection(self):
+        # A preloading gunicorn master creates the store before forking its workers.
+        store = SQLiteSessionStore(self.path)
+        inherited = store._connection()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                store.set("child", {"access_token": "token"})
+                os._exit(0 if store._connection() is not inherited else 1)
+            except BaseException:
+                os._exit(2)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(store.get("child"), {"access_token": "token"})
+
+    def test_create_session_store_from_url(self):
+        self.assertIsInstance(create_session_store("memory://"), MemorySessionStore)
+        self.assertIsInstance(create_session_store(f"sqlite:///{self.path}"), SQLiteSessionStore)
+        with self.assertRaises(ValueError):
+            create_session_store("redis://localhost")
+
+
+
+class SessionStoreTests(unittest.TestCase):
+    def test_backends_must_implement_the_whole_interface(self):
+        class NoReplaceStore(SessionStore):
+            get = MemorySessionStore.get
+            set = MemorySessionStore.set
+            delete = MemorySessionStore.delete
+            __len__ = MemorySessionStore.__len__
+
+        with self.assertRaises(TypeError):
+            SessionStore()
+        with self.assertRaises(TypeError):
+            NoReplaceStore()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+
+from playlistsmith.services.shuffle import artist_spread_order, max_artist_gap
+
+
+def smallest_gap(keys, order):
+    last = {}
+    gap = None
+    for position, row in enumerate(order):
+        key = keys[row]
+        if key in last:
+            gap = position - last[key] if gap is None else min(gap, position - last[key])
+        last[key] = position
+    return gap
+
+
+class ArtistSpreadOrderTests(unittest.TestCase):
+    def test_order_is_a_permutation_that_keeps_the_gap(self):
+        keys = [f"artist{number % 40}" for number in range(1000)]
+
+        order, gap = artist_spread_order(keys, seed=1, min_gap=8)
+
+        self.assertEqual(sorted(order), list(range(1000)))
+        self.assertEqual(gap, 8)
+        self.assertGreaterEqual(smallest_gap(keys, order), 8)
+
+    def test_same_seed_gives_the_same_order(self):
+        keys = [random.Random(3).choice("ABCDEFG") for _ in range(300)]
+
+        first, _ = artist_spread_order(keys, seed=42)
+        again, _ = artist_spread_order(keys, seed=42)
+        other, _ = artist_spread_order(keys, seed=43)
+
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+
+    def test_dominant_artist_lowers_the_gap_to_the_largest_possible(self):
+        # 6 tracks of A among 11 only fit as A x A x A x A x A x A.
+        keys = ["A"] * 6 + ["B", "C", "D", "E", "F"]
+
+        order, gap = artist_spread_order(keys, seed=7, min_gap=5)
+
+        self.assertEqual(gap, max_artist_gap(keys))
+        self.assertEqual(gap, 2)
+        self.assertEqual([keys[row] for row in order][::2], ["A"] * 6)
+
+    def test_gap_is_met_whenever_the_playlist_allows_it(self):
+        rng = random.Random(0)
+        for seed in range(500):
+            weights = [rng.random() ** 3 for _ in range(rng.randint(1, 10))]
+            keys = rng.choices(range(len(weights)), weights, k=rng.randint(1, 60))
+            min_gap = rng.randint(1, 8)
+
+            order, gap = artist_spread_order(keys, seed=seed, min_gap=min_gap)
+
+            self.assertLessEqual(gap, min_gap)
+            self.assertGreaterEqual(smallest_gap(keys, order) or gap, gap, (keys, min_gap))
+
+    def test_empty_and_single_artist_playlists(self):
+        self.assertEqual(artist_spread_order([], seed=1), ([], 5))
+        order, gap = artist_spread_order(["A"] * 4, seed=1)
+        self.assertEqual((sorted(order), gap), ([0, 1, 2, 3], 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+
+from playlistsmith.services.session_store import MemorySessionStore
+from playlistsmith.services.token_refresh import SessionEndedError, TokenRefresher
+from tests.helpers import FakeClock
+
+
+def token(name, expires_at):
+    return {"access_token": name, "refresh_token": "r", "expires_at": expires_at}
+
+
+class TokenRefresherTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = MemorySessionStore()
+
+    def test_valid_token_is_returned_without_refreshing(self):
+        refresher = TokenRefresher(self.store, clock=self.clock)
+
+        current = token("old", 2000)
+        self.assertFalse(refresher.is_due(current))
+        self.assertFalse(refresher.prefetch("sid", current, lambda info: self.fail("refreshed")))
+
+    def test_concurrent_callers_share_one_refresh(self):
+        refresher = TokenRefresher(self.store, clock=self.clock)
+        expiring = token("old", 1030)
+        self.store.set("sid", expiring)
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def refresh(info):
+            calls.append(info["access_token"])
+            release.wait(2)
+            return token("new", 4600)
+
+        threads = [threading.Thread(target=lambda: results.append(refresher.refresh("sid", expiring, refresh)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 2
+        while refresher.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ["old"])
+        self.assertEqual([info["access_token"] for info in results], ["new"] * 4)
+        self.assertEqual(self.store.get("sid")["access_token"], "new")
+
+    def test_token_refreshed_elsewhere_is_reused(self):
+        refresher = TokenRefresher(self.store, clock=self.clock)
+        self.store.set("sid", token("new", 4600))
+
+        info = refresher.refresh("sid", token("old", 1030), lambda info: self.fail("refreshed"))
+
+        self.assertEqual(info["access_token"], "new")
+
+    def test_refresh_errors_reach_the_caller_and_are_not_cached(self):
+        refresher = TokenRefresher(self.store, clock=self.clock)
+        self.store.set("sid", token("old", 1030))
+
+        def failing(info):
+            raise RuntimeError("accounts service down")
+
+        with self.assertRaises(RuntimeError):
+            refresher.refresh("sid", token("old", 1030), failing)
+        info = refresher.refresh("sid", token("old", 1030), lambda info: token("new", 4600))
+
+        self.assertEqual(info["access_token"], "new")
+        self.assertEqual(refresher.stats()["failures"], 1)
+
+    def test_refresh_ahead_returns_the_current_token_and_renews_it_in_the_background(self):
+        refresher = TokenRefresher(self.store, refresh_ahead=300, clock=self.clock)
+        current = token("old", 1200)
+        self.store.set("sid", current)
+        refreshed = threading.Event()
+
+        def refresh(info):
+            refreshed.set()
+            return token("new", 4600)
+
+        self.assertFalse(refresher.is_due(current))
+        self.assertTrue(refresher.prefetch("sid", current, refresh))
+        self.assertTrue(refreshed.wait(2))
+        deadline = time.monotonic() + 2
+        while refresher.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        self.assertEqual(self.store.get("sid")["access_token"], "new")
+        self.assertEqual(refresher.stats()["background"], 1)
+        self.assertFalse(refresher.prefetch("sid", self.store.get("sid"), refresh))
+
+
+    def test_logout_during_a_refresh_is_not_undone(self):
+        refresher = TokenRefresher(self.store, refresh_ahead=300, clock=self.clock)
+        current = token("old", 1200)
+        self.store.set("sid", current)
+        started = threading.Event()
+        release = threading.Event()
+
+        def refresh(info):
+            started.set()
+            release.wait(2)
+            return token("new", 4600)
+
+        self.assertTrue(refresher.prefetch("sid", current, refresh))
+        self.assertTrue(started.wait(2))
+        self.store.delete("sid")
+        release.set()
+        deadline = time.monotonic() + 2
+        while refresher.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        self.assertIsNone(self.store.get("sid"))
+        with self.assertRaises(SessionEndedError):
+            refresher.refresh("sid", token("old", 1030), lambda info: self.fail("refreshed"))
+        self.assertIsNone(self.store.get("sid"))
+        self.assertEqual(refresher.stats()["failures"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
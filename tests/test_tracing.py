@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from playlistsmith.services.tracing import CURRENT_TRACE, Trace, TracingMiddleware, current_trace, span
+
+
+class TraceTests(unittest.TestCase):
+    def test_span_is_a_no_op_without_a_trace(self):
+        with span("fetch"):
+            pass
+
+        self.assertIsNone(current_trace())
+
+    def test_span_records_into_the_current_trace(self):
+        trace = Trace()
+        token = CURRENT_TRACE.set(trace)
+        try:
+            with span("sort", tracks=3):
+                pass
+        finally:
+            CURRENT_TRACE.reset(token)
+
+        self.assertEqual(len(trace.spans), 1)
+        name, _, duration, _, attrs = trace.spans[0]
+        self.assertEqual(name, "sort")
+        self.assertGreaterEqual(duration, 0)
+        self.assertEqual(attrs, {"tracks": 3})
+
+    def test_server_timing_sums_spans_per_name(self):
+        trace = Trace()
+        trace.add("spotify.playlist_items", trace.started, 0.010)
+        trace.add("spotify.playlist_items", trace.started, 0.015)
+        trace.add("sort", trace.started, 0.002)
+
+        header = trace.server_timing()
+
+        self.assertIn('spotify.playlist_items;dur=25.0;desc="2 calls"', header)
+        self.assertIn("sort;dur=2.0", header)
+        self.assertNotIn('sort;dur=2.0;desc', header)
+        self.assertIn("total;dur=", header)
+
+    def test_chrome_trace_has_one_complete_event_per_span(self):
+        trace = Trace()
+        trace.add("write", trace.started + 0.5, 0.25, tracks=100)
+
+        document = trace.to_chrome(path="/sort")
+
+        self.assertEqual(document["otherData"], {"trace_id": trace.id, "path": "/sort"})
+        event = document["traceEvents"][0]
+        self.assertEqual((event["name"], event["ph"], event["ts"], event["dur"]), ("write", "X", 500000.0, 250000.0))
+        self.assertEqual(event["args"], {"tracks": 100})
+
+
+class TracingMiddlewareTests(unittest.TestCase):
+    @staticmethod
+    def _run(middleware, headers=()):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/sort", "headers": list(headers)}
+        asyncio.run(middleware(scope, None, send))
+        return dict(sent[0].get("headers", []))
+
+    @staticmethod
+    async def _app(scope, receive, send):
+        with span("sort"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    def test_untraced_requests_are_left_alone(self):
+        headers = self._run(TracingMiddleware(self._app))
+
+        self.assertNotIn(b"server-timing", headers)
+
+    def test_trace_header_adds_server_timing_when_allowed(self):
+        with tempfile.TemporaryDirectory() as trace_dir:
+            middleware = TracingMiddleware(self._app, trace_dir=trace_dir, allow_header=True)
+            headers = self._run(middleware, [(b"x-trace", b"1")])
+            written = os.listdir(trace_dir)
+
+        self.assertIn(b"sort;dur=", headers[b"server-timing"])
+        self.assertIn(b"x-trace-id", headers)
+        # Clients choose when to send the header, so their traces never reach the disk.
+        self.assertEqual(written, [])
+
+    def test_trace_header_is_ignored_by_default(self):
+        headers = self._run(TracingMiddleware(self._app), [(b"x-trace", b"1")])
+
+        self.assertNotIn(b"server-timing", headers)
+
+    def test_sampled_traces_are_written_to_the_trace_dir(self):
+        with tempfile.TemporaryDirectory() as trace_dir:
+            headers = self._run(TracingMiddleware(self._app, sample_rate=1.0, trace_dir=trace_dir))
+            path = os.path.join(trace_dir, headers[b"x-trace-id"].decode() + ".json")
+            with open(path, encoding="utf-8") as handle:
+                document = json.load(handle)
+
+        self.assertEqual(document["otherData"]["status"], 200)
+        self.assertEqual([event["name"] for event in document["traceEvents"]], ["sort"])
+
+
+if __name__ == "__main__":
+    unittest.main()
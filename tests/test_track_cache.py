@@ -0,0 +1,39 @@
+import unittest
+
+from playlistsmith.services.track_cache import TrackCache
+from tests.helpers import FakeClock
+
+
+class TrackCacheTests(unittest.TestCase):
+    def test_hit_requires_matching_snapshot(self):
+        cache = TrackCache()
+        cache.put("playlist", "snap-1", [{"uri": "a"}])
+
+        self.assertEqual(cache.get("playlist", "snap-1"), [{"uri": "a"}])
+        self.assertIsNone(cache.get("playlist", "snap-2"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used_by_track_count(self):
+        cache = TrackCache(max_tracks=5)
+        cache.put("one", "s", [{}] * 2)
+        cache.put("two", "s", [{}] * 2)
+        cache.get("one", "s")
+        cache.put("three", "s", [{}] * 2)
+
+        self.assertIsNone(cache.get("two", "s"))
+        self.assertIsNotNone(cache.get("one", "s"))
+        self.assertEqual(cache.stats()["tracks"], 4)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock(0.0)
+        cache = TrackCache(ttl=10, clock=clock)
+        cache.put("playlist", "s", [{}])
+        clock.now = 11
+
+        self.assertIsNone(cache.get("playlist", "s"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
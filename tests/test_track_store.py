@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from playlistsmith.services.track_store import SCHEMA, SQLiteTrackStore, StaleSnapshotError, create_track_store
+from tests.helpers import FakeClock
+
+
+def make_track(number, position=None):
+    return {
+        "position": number if position is None else position,
+        "id": str(number),
+        "uri": f"spotify:track:{number}",
+        "name": f"Track {number}",
+        "artists": [{"id": "A", "name": "A"}],
+        "album": {"name": "Album", "release_date": "2020-01-01"},
+        "duration_ms": 1000 * number,
+        "popularity": number % 100,
+        "isrc": f"ISRC{number}",
+    }
+
+
+class SQLiteTrackStoreTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_tracks_are_served_for_their_snapshot_only(self):
+        tracks = [make_track(number) for number in range(250)] + [make_track(7, position=250)]
+        SQLiteTrackStore(self.path).put_tracks("p1", "s1", tracks)
+        # A new instance stands in for another worker or a restarted one.
+        store = SQLiteTrackStore(self.path)
+
+        self.assertEqual(store.get_tracks("p1", "s1"), tracks)
+        self.assertIsNone(store.get_tracks("p1", "s2"))
+        self.assertIsNone(store.get_tracks("p2", "s1"))
+        self.assertEqual(store.stats(), {"hits": 1, "misses": 2, "writes": 0, "playlists": 1, "tracks": 250})
+
+    def test_pages_are_read_one_query_at_a_time(self):
+        tracks = [make_track(number, position=number * 2) for number in range(250)]
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", tracks)
+
+        pages = list(store.iter_track_pages("p1", "s1", page_size=100))
+
+        self.assertEqual([len(page) for page in pages], [100, 100, 50])
+        self.assertEqual([track for page in pages for track in page], tracks)
+        self.assertEqual(list(store.iter_track_pages("p1", "s2")), [])
+        self.assertEqual((store.hits, store.misses), (1, 1))
+
+    def test_writer_stores_a_snapshot_page_by_page(self):
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", [make_track(1)])
+
+        with store.track_writer("p1", "s2") as writer:
+            writer.add([make_track(number) for number in range(100)])
+            writer.add([make_track(number) for number in range(100, 150)])
+            # Until the last page arrived the previous snapshot stays readable.
+            self.assertEqual(store.get_tracks("p1", "s1"), [make_track(1)])
+            writer.commit()
+
+        self.assertIsNone(store.get_tracks("p1", "s1"))
+        self.assertEqual(store.get_tracks("p1", "s2"), [make_track(number) for number in range(150)])
+        self.assertEqual(store.stats()["writes"], 2)
+
+    def test_unfinished_writes_are_dropped(self):
+        clock = FakeClock()
+        store = SQLiteTrackStore(self.path, sweep_interval=60, clock=clock)
+        with store.track_writer("p1", "s1") as writer:
+            writer.add([make_track(1)])
+        with store.track_writer("p2", "s1") as writer:
+            writer.add([make_track(2)])
+            writer.add([make_track(3), {"uri": None, "name": "Unavailable"}])
+            writer.commit()
+        abandoned = store.track_writer("p3", "s1")
+        abandoned.add([make_track(4)])
+
+        self.assertIsNone(store.get_tracks("p1", "s1"))
+        self.assertIsNone(store.get_tracks("p2", "s1"))
+        self.assertEqual(store._connection().execute("SELECT COUNT(*) FROM pending_tracks").fetchone()[0], 1)
+
+        clock.now += 61
+        store.put_playlists([{"id": "p4", "snapshot_id": "s1"}])
+
+        self.assertEqual(store._connection().execute("SELECT COUNT(*) FROM pending_tracks").fetchone()[0], 0)
+        self.assertEqual(store.stats()["tracks"], 0)
+
+    def test_reading_pages_of_a_replaced_snapshot_fails(self):
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", [make_track(number) for number in range(20)])
+        pages = store.iter_track_pages("p1", "s1", page_size=10)
+        next(pages)
+
+        store.put_tracks("p1", "s2", [make_track(1)])
+
+        with self.assertRaises(StaleSnapshotError):
+            next(pages)
+
+    def test_counts_of_a_store_created_before_counters_are_taken_once(self):
+        conn = sqlite3.connect(self.path)
+        # The tables of the first release, without the counters and their triggers.
+        for statement in SCHEMA[:4]:
+            conn.execute(statement)
+        conn.execute("INSERT INTO tracks (uri, artists, album) VALUES ('spotify:track:old', '[]', '{}')")
+        conn.execute("INSERT INTO playlists (id, tracks_snapshot_id, updated_at) VALUES ('old', 's1', 0)")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", [make_track(1), make_track(2)])
+        SQLiteTrackStore(self.path)
+
+        self.assertEqual(store.stats()["playlists"], 2)
+        self.assertEqual(store.stats()["tracks"], 3)
+
+    def test_new_snapshot_replaces_the_playlist_tracks(self):
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", [make_track(1), make_track(2)])
+        store.put_tracks("p1", "s2", [make_track(2)])
+
+        self.assertIsNone(store.get_tracks("p1", "s1"))
+        self.assertEqual(store.get_tracks("p1", "s2"), [make_track(2)])
+
+    def test_listing_drops_the_tracks_of_changed_playlists(self):
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("same", "s1", [make_track(1)])
+        store.put_tracks("changed", "s1", [make_track(2)])
+
+        store.put_playlists([
+            {"id": "same", "name": "Same", "snapshot_id": "s1", "tracks": {"total": 1}},
+            {"id": "changed", "name": "Changed", "snapshot_id": "s2", "tracks": {"total": 1}},
+            {"id": "new", "name": "New", "snapshot_id": "s1", "tracks": {"total": 9}},
+        ])
+
+        self.assertEqual(store.get_tracks("same", "s1"), [make_track(1)])
+        self.assertIsNone(store.get_tracks("changed", "s1"))
+        self.assertEqual(store.stats()["playlists"], 1)
+
+    def test_sweep_deletes_tracks_no_playlist_contains(self):
+        clock = FakeClock()
+        store = SQLiteTrackStore(self.path, sweep_interval=60, clock=clock)
+        store.put_tracks("p1", "s1", [make_track(1), make_track(2)])
+        store.put_tracks("p2", "s1", [make_track(2)])
+        store.put_tracks("p1", "s2", [make_track(3)])
+        self.assertEqual(store.stats()["tracks"], 3)
+
+        clock.now += 61
+        store.put_playlists([{"id": "p2", "snapshot_id": "s2"}])
+
+        self.assertEqual(store.stats()["tracks"], 1)
+        self.assertEqual(store.get_tracks("p1", "s2"), [make_track(3)])
+
+    def test_playlists_with_tracks_without_uri_are_not_stored(self):
+        store = SQLiteTrackStore(self.path)
+        store.put_tracks("p1", "s1", [make_track(1), {"uri": None, "name": "Unavailable"}])
+
+        self.assertIsNone(store.get_tracks("p1", "s1"))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_forked_worker_opens_its_own_connection(self):
+        store = SQLiteTrackStore(self.path)
+        inherited = store._connection()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                store.put_tracks("child", "s1", [make_track(1)])
+                os._exit(0 if store._connection() is not inherited else 1)
+            except BaseException:
+                os._exit(2)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(store.get_tracks("child", "s1"), [make_track(1)])
+
+    def test_create_track_store_from_url(self):
+        self.assertIsNone(create_track_store(""))
+        self.assertIsInstance(create_track_store(f"sqlite:///{self.path}"), SQLiteTrackStore)
+        with self.assertRaises(ValueError):
+            create_track_store("postgres://localhost")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import random
+import unittest
+
+from playlistsmith.services import track_table
+from playlistsmith.services.track_table import TrackTable, release_date_ordinal
+
+
+def make_track(number, artist, release_date, duration_ms, popularity):
+    return {
+        "uri": f"spotify:track:{number}",
+        "artists": [{"name": artist}],
+        "album": {"release_date": release_date},
+        "duration_ms": duration_ms,
+        "popularity": popularity,
+    }
+
+
+class TrackTableTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.tracks = [
+            make_track(
+                i,
+                rng.choice(["abba", "Beck", "Cher", "dido"]),
+                rng.choice(["1999", "2001-05", "2001-05-17", ""]),
+                rng.randrange(5) * 1000,
+                rng.randrange(10),
+            )
+            for i in range(300)
+        ]
+        self.table = TrackTable.from_tracks(self.tracks)
+
+    def expected(self, key, reverse):
+        return [t["uri"] for t in sorted(self.tracks, key=key, reverse=reverse)]
+
+    def test_release_date_ordinal_handles_partial_dates(self):
+        self.assertLess(release_date_ordinal("2001"), release_date_ordinal("2001-01-02"))
+        self.assertEqual(release_date_ordinal("2001"), release_date_ordinal("2001-01-01"))
+        self.assertEqual(release_date_ordinal(""), 101)
+
+    def test_argsort_matches_stable_sorted(self):
+        cases = [
+            ("artist", lambda t: t["artists"][0]["name"].lower()),
+            ("release", lambda t: release_date_ordinal(t["album"]["release_date"])),
+            ("duration", lambda t: t["duration_ms"]),
+            ("popularity", lambda t: t["popularity"]),
+        ]
+        for key, sort_key in cases:
+            for reverse in (False, True):
+                order = self.table.argsort([(key, reverse)])
+                self.assertEqual(self.table.take_uris(order), self.expected(sort_key, reverse))
+
+    def test_pure_python_path_matches(self):
+        numpy = track_table.np
+        track_table.np = None
+        try:
+            order = self.table.argsort([("artist", False), ("popularity", True)])
+        finally:
+            track_table.np = numpy
+
+        expected = sorted(self.tracks, key=lambda t: -t["popularity"])
+        expected.sort(key=lambda t: t["artists"][0]["name"].lower())
+        self.assertEqual(self.table.take_uris(order), [t["uri"] for t in expected])
+
+    def test_numpy_and_python_paths_agree_on_mixed_directions(self):
+        keys = [("release", True), ("artist", False), ("duration", True)]
+        numpy = track_table.np
+        track_table.np = None
+        try:
+            expected = self.table.argsort(keys)
+        finally:
+            track_table.np = numpy
+
+        self.assertEqual(self.table.argsort(keys), expected)
+
+    def test_artist_sort_keys_need_artist_details(self):
+        table = TrackTable.from_tracks([
+            {"uri": "one", "artists": [{"id": "x"}]},
+            {"uri": "two", "artists": [{"id": "y"}]},
+            {"uri": "three", "artists": []},
+        ])
+        keys = [("genre", False), ("artist_followers", True)]
+
+        self.assertTrue(table.needs_artist_details(keys))
+        with self.assertRaises(ValueError):
+            table.argsort(keys)
+        table.add_artist_details({"x": {"genres": ("Rock",), "followers": 5},
+                                  "y": {"genres": ("rock", "pop"), "followers": 9}})
+
+        self.assertFalse(table.needs_artist_details(keys))
+        self.assertEqual(table.genres, ["rock", "rock", ""])
+        self.assertEqual(table.take_uris(table.argsort(keys)), ["three", "two", "one"])
+
+    def test_extend_from_items_skips_missing_tracks(self):
+        table = TrackTable()
+        table.extend_from_items([None, {"track": self.tracks[0]}, {"track": None}])
+        table.extend_from_tracks([{**self.tracks[1], "position": 5}])
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.current_uris(),
+                         [None, self.tracks[0]["uri"], None, None, None, self.tracks[1]["uri"]])
+
+
+if __name__ == "__main__":
+    unittest.main()